@@ -5,18 +5,141 @@ Simple intent classification using keyword matching and basic ML
 import json
 import pickle
 import os
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.naive_bayes import MultinomialNB
+import sys
+import time
+from datetime import datetime
+from sklearn.base import clone
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer
+from sklearn.naive_bayes import MultinomialNB, ComplementNB
+from sklearn.svm import LinearSVC
 from sklearn.pipeline import Pipeline
 import numpy as np
 
-def load_intents():
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils.language import clean_devanagari
+
+# Hashed feature space for the online model; fixed size keeps memory constant
+ONLINE_N_FEATURES = 2 ** 16
+
+# Model selection: the most accurate candidate whose p95 single-message predict
+# latency fits the budget, preferring the fastest among those within tolerance
+LATENCY_BUDGET_MS = float(os.getenv("TRAIN_LATENCY_BUDGET_MS", "2.0"))
+ACCURACY_TOLERANCE = float(os.getenv("TRAIN_ACCURACY_TOLERANCE", "0.01"))
+SEARCH_N_JOBS = int(os.getenv("TRAIN_N_JOBS", "-1"))
+LATENCY_SAMPLES = 200
+
+# sklearn's default token pattern splits Devanagari words at vowel signs, so
+# Hindi/Marathi text is pre-cleaned into space-separated words instead
+DEVANAGARI_TOKEN_PATTERN = r'(?u)\S+'
+
+# Candidate pipelines for GridSearchCV; steps are named 'vectorizer' and 'classifier'
+SEARCH_SPACE = [
+    {
+        'vectorizer': [TfidfVectorizer()],
+        'vectorizer__ngram_range': [(1, 1), (1, 2)],
+        'vectorizer__max_features': [500, 1000, None],
+        'vectorizer__sublinear_tf': [False, True],
+        'classifier': [MultinomialNB(), ComplementNB()],
+        'classifier__alpha': [0.01, 0.1, 0.5, 1.0]
+    },
+    {
+        'vectorizer': [TfidfVectorizer()],
+        'vectorizer__ngram_range': [(1, 1), (1, 2)],
+        'vectorizer__max_features': [1000, None],
+        'classifier': [LinearSVC()],
+        'classifier__C': [0.1, 1.0, 10.0]
+    },
+    # Character n-grams tolerate typos but cost more per prediction
+    {
+        'vectorizer': [TfidfVectorizer(analyzer='char_wb')],
+        'vectorizer__ngram_range': [(2, 4)],
+        'vectorizer__max_features': [2000, None],
+        'classifier': [MultinomialNB()],
+        'classifier__alpha': [0.1, 0.5]
+    },
+    {
+        'vectorizer': [TfidfVectorizer(analyzer='char_wb')],
+        'vectorizer__ngram_range': [(2, 4)],
+        'vectorizer__max_features': [2000, None],
+        'classifier': [LinearSVC()]
+    },
+    # No fitted vocabulary: smaller artifact, nothing to look up per token
+    {
+        'vectorizer': [HashingVectorizer(alternate_sign=False)],
+        'vectorizer__n_features': [2 ** 12, 2 ** 16],
+        'vectorizer__ngram_range': [(1, 2)],
+        'classifier': [MultinomialNB()],
+        'classifier__alpha': [0.01, 0.1, 0.5]
+    },
+]
+
+class OnlineIntentModel:
+    """
+    Intent classifier over a stateless hashed feature space.
+
+    Unlike the TF-IDF pipeline there is no fitted vocabulary, so new text
+    (including words never seen in intents.json) can be folded in with
+    partial_fit without rebuilding the model. Exposes predict() like the
+    Pipeline so it is a drop-in replacement for chatbot_model.
+    """
+
+    def __init__(self, classes, n_features=ONLINE_N_FEATURES, alpha=0.1):
+        self.classes = list(classes)
+        self.vectorizer = HashingVectorizer(
+            n_features=n_features,
+            ngram_range=(1, 2),
+            alternate_sign=False,
+            norm='l2'
+        )
+        self.classifier = MultinomialNB(alpha=alpha)
+        self.samples_seen = 0
+
+    def partial_fit(self, X, y):
+        """Update the model with a mini-batch; labels outside `classes` are skipped"""
+        known = [(text, label) for text, label in zip(X, y) if label in self.classes]
+        if not known:
+            return 0
+        texts, labels = zip(*known)
+        self.classifier.partial_fit(self.vectorizer.transform(texts), labels, classes=self.classes)
+        self.samples_seen += len(known)
+        return len(known)
+
+    def fit(self, X, y):
+        self.classifier = MultinomialNB(alpha=self.classifier.alpha)
+        self.samples_seen = 0
+        self.partial_fit(X, y)
+        return self
+
+    def predict(self, X):
+        return self.classifier.predict(self.vectorizer.transform(X))
+
+def intents_file(language='en'):
+    """Training/intents.json for English, Training/intents_<language>.json otherwise"""
+    name = 'intents.json' if language == 'en' else f'intents_{language}.json'
+    return os.path.join(os.path.dirname(__file__), name)
+
+def available_languages():
+    """Languages with an intents file, English first"""
+    others = sorted(
+        name[len('intents_'):-len('.json')]
+        for name in os.listdir(os.path.dirname(__file__))
+        if name.startswith('intents_') and name.endswith('.json')
+    )
+    return ['en'] + others
+
+def model_files(language='en'):
+    """Model and intents pickle names for a language (English keeps the original names)"""
+    if language == 'en':
+        return 'chatbot_model.pkl', 'intents.pkl'
+    return f'chatbot_model_{language}.pkl', f'intents_{language}.pkl'
+
+def load_intents(language='en'):
     """Load intents from JSON file"""
-    intents_path = os.path.join(os.path.dirname(__file__), 'intents.json')
-    with open(intents_path, 'r', encoding='utf-8') as f:
+    with open(intents_file(language), 'r', encoding='utf-8') as f:
         return json.load(f)
 
-def prepare_training_data(intents_data):
+def prepare_training_data(intents_data, language='en'):
     """Prepare training data from intents"""
     X = []
     y = []
@@ -26,39 +149,190 @@ def prepare_training_data(intents_data):
         patterns = intent['patterns']
         
         for pattern in patterns:
-            X.append(pattern.lower())
+            X.append(pattern.lower() if language == 'en' else clean_devanagari(pattern, language))
             y.append(tag)
     
     return X, y
 
-def train_chatbot_model():
-    """Train the chatbot intent classification model"""
-    print("Loading intents...")
-    intents_data = load_intents()
-    
-    print("Preparing training data...")
-    X, y = prepare_training_data(intents_data)
-    
-    print(f"Training on {len(X)} samples...")
-    
-    # Create pipeline with TF-IDF vectorizer and Naive Bayes classifier
-    model = Pipeline([
-        ('tfidf', TfidfVectorizer(max_features=1000, ngram_range=(1, 2))),
+def token_pattern(language='en'):
+    """Word token pattern for a language's vectorizers (None keeps sklearn's default)"""
+    return None if language == 'en' else DEVANAGARI_TOKEN_PATTERN
+
+def default_pipeline(language='en'):
+    """The original hand-picked pipeline, used when model selection is skipped"""
+    vectorizer = TfidfVectorizer(max_features=1000, ngram_range=(1, 2))
+    if token_pattern(language):
+        vectorizer.set_params(token_pattern=token_pattern(language))
+    return Pipeline([
+        ('vectorizer', vectorizer),
         ('classifier', MultinomialNB(alpha=0.1))
     ])
+
+def _describe_params(params):
+    """JSON-friendly view of a candidate's parameters"""
+    return {
+        name: repr(value) if hasattr(value, 'get_params') else
+              (list(value) if isinstance(value, tuple) else value)
+        for name, value in params.items()
+    }
+
+def measure_predict_latency(model, texts, samples=LATENCY_SAMPLES):
+    """
+    Time single-message predictions, the way the chat endpoint calls the model.
+
+    Returns:
+        Tuple of (median, p95) latency in milliseconds
+    """
+    model.predict(texts[:1])
+    timings = []
+    for i in range(samples):
+        started = time.perf_counter()
+        model.predict([texts[i % len(texts)]])
+        timings.append((time.perf_counter() - started) * 1000)
+    return float(np.median(timings)), float(np.percentile(timings, 95))
+
+def select_model(X, y, latency_budget_ms=LATENCY_BUDGET_MS, accuracy_tolerance=ACCURACY_TOLERANCE,
+                 n_jobs=SEARCH_N_JOBS, language='en'):
+    """
+    Cross-validated search over SEARCH_SPACE, then selection under a latency budget.
+
+    Cross-validation runs in parallel across n_jobs cores; predict latency is
+    measured afterwards one candidate at a time so the timings don't compete
+    for CPU. Among candidates within the budget, those within
+    `accuracy_tolerance` of the best accuracy qualify and the fastest wins.
+
+    Candidates are refitted and timed in order of accuracy, stopping at the
+    first one too inaccurate to qualify, so most of the grid is never timed.
+
+    Returns:
+        Tuple of (fitted Pipeline, evaluation report dict)
+    """
+    from sklearn.model_selection import GridSearchCV, StratifiedKFold
+
+    search_space = SEARCH_SPACE
+    if token_pattern(language):
+        # Only word analyzers use the token pattern
+        search_space = [
+            {**grid, 'vectorizer__token_pattern': [token_pattern(language)]}
+            if grid['vectorizer'][0].get_params().get('analyzer') == 'word' else grid
+            for grid in SEARCH_SPACE
+        ]
+
+    n_splits = min(5, int(np.min(np.unique(y, return_counts=True)[1])))
+    search = GridSearchCV(
+        Pipeline([('vectorizer', TfidfVectorizer()), ('classifier', MultinomialNB())]),
+        search_space,
+        cv=StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=42),
+        scoring='accuracy',
+        n_jobs=n_jobs,
+        refit=False
+    )
+    started = time.perf_counter()
+    search.fit(X, y)
+    search_seconds = time.perf_counter() - started
+
+    results = search.cv_results_
+    ranked = sorted(range(len(results['params'])), key=lambda k: -results['mean_test_score'][k])
+    candidates = []
+    accuracy_floor = None
+    for k in ranked:
+        # Everything from here on is below the best in-budget accuracy minus the tolerance
+        if accuracy_floor is not None and results['mean_test_score'][k] < accuracy_floor:
+            break
+        params = results['params'][k]
+        model = clone(search.estimator).set_params(**clone(params, safe=False)).fit(X, y)
+        latency_p50, latency_p95 = measure_predict_latency(model, X)
+        if accuracy_floor is None and latency_p95 <= latency_budget_ms:
+            accuracy_floor = results['mean_test_score'][k] - accuracy_tolerance
+        candidates.append({
+            'params': params,
+            'model': model,
+            'cv_accuracy': float(results['mean_test_score'][k]),
+            'cv_accuracy_std': float(results['std_test_score'][k]),
+            'fit_seconds': float(results['mean_fit_time'][k]),
+            'latency_p50_ms': latency_p50,
+            'latency_p95_ms': latency_p95,
+            'artifact_bytes': len(pickle.dumps(model))
+        })
+
+    within_budget = [c for c in candidates if c['latency_p95_ms'] <= latency_budget_ms]
+    if not within_budget:
+        print(f"Warning: no candidate predicts within {latency_budget_ms}ms (p95); ignoring the budget")
+        within_budget = candidates
+    best_accuracy = max(c['cv_accuracy'] for c in within_budget)
+    qualified = [c for c in within_budget if c['cv_accuracy'] >= best_accuracy - accuracy_tolerance]
+    winner = min(qualified, key=lambda c: (c['latency_p50_ms'], -c['cv_accuracy']))
+
+    def row(candidate):
+        return {
+            'params': _describe_params(candidate['params']),
+            'cv_accuracy': round(candidate['cv_accuracy'], 4),
+            'cv_accuracy_std': round(candidate['cv_accuracy_std'], 4),
+            'latency_p50_ms': round(candidate['latency_p50_ms'], 4),
+            'latency_p95_ms': round(candidate['latency_p95_ms'], 4),
+            'fit_seconds': round(candidate['fit_seconds'], 4),
+            'artifact_bytes': candidate['artifact_bytes']
+        }
+
+    report = {
+        'trained_at': datetime.now().isoformat(),
+        'language': language,
+        'samples': len(X),
+        'classes': len(set(y)),
+        'cv_folds': n_splits,
+        'candidates': len(ranked),
+        'timed_candidates': len(candidates),
+        'search_seconds': round(search_seconds, 2),
+        'latency_budget_ms': latency_budget_ms,
+        'accuracy_tolerance': accuracy_tolerance,
+        'selected': {**row(winner), 'model': repr(winner['model'])},
+        'leaderboard': [row(c) for c in sorted(candidates, key=lambda c: (-c['cv_accuracy'], c['latency_p50_ms']))]
+    }
+    return winner['model'], report
+
+def train_chatbot_model(search=True, latency_budget_ms=LATENCY_BUDGET_MS, language='en'):
+    """
+    Train the chatbot intent classification model.
+
+    Args:
+        search: Select the pipeline by cross-validated search (default_pipeline() otherwise)
+        latency_budget_ms: p95 single-message predict latency a model must meet
+        language: Intents language to train ('en', 'hi', 'mr', ...)
+    """
+    print(f"Loading intents ({language})...")
+    intents_data = load_intents(language)
     
-    model.fit(X, y)
+    print("Preparing training data...")
+    X, y = prepare_training_data(intents_data, language)
     
-    # Save model
     models_dir = os.path.join(os.path.dirname(__file__), '..', 'Models')
     os.makedirs(models_dir, exist_ok=True)
     
-    model_path = os.path.join(models_dir, 'chatbot_model.pkl')
+    if search:
+        print(f"Selecting a model on {len(X)} samples...")
+        model, report = select_model(X, y, latency_budget_ms=latency_budget_ms, language=language)
+        selected = report['selected']
+        print(f"Selected {selected['params']} from {report['candidates']} candidates: "
+              f"cv accuracy={selected['cv_accuracy']}, p95 predict latency={selected['latency_p95_ms']}ms")
+        
+        report_name = 'chatbot_model_report.json' if language == 'en' else f'chatbot_model_report_{language}.json'
+        report_path = os.path.join(models_dir, report_name)
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Evaluation report saved to {report_path}")
+    else:
+        print(f"Training on {len(X)} samples...")
+        model = default_pipeline(language).fit(X, y)
+    
+    model_name, intents_name = model_files(language)
+    
+    # Save model
+    model_path = os.path.join(models_dir, model_name)
     with open(model_path, 'wb') as f:
         pickle.dump(model, f)
     
     # Save intents for reference
-    intents_path = os.path.join(models_dir, 'intents.pkl')
+    intents_path = os.path.join(models_dir, intents_name)
     with open(intents_path, 'wb') as f:
         pickle.dump(intents_data, f)
     
@@ -67,6 +341,45 @@ def train_chatbot_model():
     
     return model, intents_data
 
+def train_online_model(intents_data=None):
+    """Seed the hashed, incrementally trainable intent model from intents.json"""
+    intents_data = intents_data or load_intents()
+    X, y = prepare_training_data(intents_data)
+    classes = [intent['tag'] for intent in intents_data['intents']]
+
+    model = OnlineIntentModel(classes)
+    model.partial_fit(X, y)
+
+    save_online_model(model)
+    print(f"Online model seeded with {model.samples_seen} samples")
+    return model
+
+def online_model_path():
+    return os.path.join(os.path.dirname(__file__), '..', 'Models', 'chatbot_model_online.pkl')
+
+def save_online_model(model):
+    """Atomically replace the online model so a serving process never reads a partial file"""
+    path = online_model_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(model, f)
+    os.replace(tmp_path, path)
+    return path
+
 if __name__ == "__main__":
-    train_chatbot_model()
+    import argparse
+    parser = argparse.ArgumentParser(description="Train the intent models")
+    parser.add_argument('--no-search', action='store_true',
+                        help="Train the default pipeline instead of running model selection")
+    parser.add_argument('--latency-budget-ms', type=float, default=LATENCY_BUDGET_MS)
+    parser.add_argument('--language', action='append',
+                        help="Language to train (repeatable); defaults to every intents file")
+    args = parser.parse_args()
+
+    # Import through the package so the pickled OnlineIntentModel resolves as Training.botmodel
+    from Training.botmodel import train_chatbot_model, train_online_model, available_languages
+    for language in args.language or available_languages():
+        train_chatbot_model(search=not args.no_search, latency_budget_ms=args.latency_budget_ms, language=language)
+    train_online_model()
 
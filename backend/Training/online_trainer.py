@@ -0,0 +1,168 @@
+"""
+Incremental Intent Model Trainer
+Streams labelled chat messages from the database into the online intent model
+"""
+import argparse
+import os
+import pickle
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+from sklearn.model_selection import train_test_split
+
+from sqlalchemy import update
+
+from database.database import SessionLocal
+from database.models import ChatMessage
+from Training.botmodel import (
+    OnlineIntentModel, load_intents, prepare_training_data, default_pipeline,
+    online_model_path, save_online_model, train_online_model
+)
+
+BATCH_SIZE = int(os.getenv("ONLINE_TRAIN_BATCH_SIZE", "256"))
+
+
+def stream_labelled_messages(db, batch_size=BATCH_SIZE):
+    """
+    Yield mini-batches of (texts, labels, ids) of confirmed messages not yet trained.
+
+    Only confirmed labels are learned: predicted intents are the model's own
+    output, and training on them would reinforce its mistakes.
+
+    Selection is by the intent_trained flag rather than a high-water mark, so
+    a label confirmed after newer messages were trained is still picked up.
+    Uses keyset pagination on the primary key, so only one batch is ever held
+    in memory.
+    """
+    after_id = 0
+    while True:
+        query = db.query(ChatMessage.id, ChatMessage.message, ChatMessage.intent).filter(
+            ChatMessage.id > after_id,
+            ChatMessage.sender == 'user',
+            ChatMessage.intent.isnot(None),
+            ChatMessage.intent_confirmed.is_(True),
+            ChatMessage.intent_trained.isnot(True)
+        )
+        rows = query.order_by(ChatMessage.id).limit(batch_size).all()
+
+        if not rows:
+            return
+
+        after_id = rows[-1].id
+        yield [row.message.lower() for row in rows], [row.intent for row in rows], [row.id for row in rows]
+
+        if len(rows) < batch_size:
+            return
+
+
+def load_online_model():
+    """Load the online model, seeding it from intents.json on first use"""
+    path = online_model_path()
+    if not os.path.exists(path):
+        return train_online_model()
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def _mark_trained(db, ids):
+    if ids:
+        db.execute(update(ChatMessage).where(ChatMessage.id.in_(ids)).values(intent_trained=True))
+        db.commit()
+
+
+def train_incremental(batch_size=BATCH_SIZE, save_every=20):
+    """
+    Fold confirmed chat messages not yet learned into the online model in place.
+
+    Each message is learned once: after the model is saved, the messages it
+    learned are flagged intent_trained. Confirming a label later (or
+    relabelling) clears the flag, so the message is picked up on the next run
+    whatever its id. Reads go to the primary, since flags written here must be
+    visible to the next batch query. A server running CHATBOT_MODEL=online
+    picks up the saved model without a restart.
+
+    Returns:
+        Number of samples learned in this run
+    """
+    model = load_online_model()
+    db = SessionLocal()
+    learned = 0
+    batches = 0
+    pending = []
+
+    try:
+        for texts, labels, ids in stream_labelled_messages(db, batch_size):
+            learned += model.partial_fit(texts, labels)
+            pending.extend(ids)
+            batches += 1
+            if batches % save_every == 0:
+                save_online_model(model)
+                _mark_trained(db, pending)
+                pending = []
+
+        save_online_model(model)
+        _mark_trained(db, pending)
+    finally:
+        db.close()
+
+    print(f"Learned {learned} samples in {batches} batches (total seen: {model.samples_seen})")
+    return learned
+
+
+def _measure_latency(model, texts, repeats=200):
+    """Median single-message predict latency in milliseconds"""
+    timings = []
+    for i in range(repeats):
+        started = time.perf_counter()
+        model.predict([texts[i % len(texts)]])
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(float(np.median(timings)), 4)
+
+
+def evaluate_models(test_size=0.3, random_state=42):
+    """
+    Compare the online hashed model with the TF-IDF pipeline on a held-out split.
+
+    Returns:
+        Dictionary of accuracy and median predict latency per model
+    """
+    intents_data = load_intents()
+    X, y = prepare_training_data(intents_data)
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=test_size, random_state=random_state, stratify=y
+    )
+
+    pipeline = default_pipeline().fit(X_train, y_train)
+
+    online = OnlineIntentModel([intent['tag'] for intent in intents_data['intents']])
+    # Feed the online model in mini-batches, as the trainer does
+    for start in range(0, len(X_train), 8):
+        online.partial_fit(X_train[start:start + 8], y_train[start:start + 8])
+
+    report = {}
+    for name, model in (('tfidf_pipeline', pipeline), ('online_hashed', online)):
+        predictions = model.predict(X_test)
+        report[name] = {
+            'accuracy': round(float(np.mean(np.array(predictions) == np.array(y_test))), 4),
+            'predict_latency_ms': _measure_latency(model, X_test)
+        }
+
+    for name, metrics in report.items():
+        print(f"{name}: accuracy={metrics['accuracy']}, median predict latency={metrics['predict_latency_ms']}ms")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally train the online intent model")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--evaluate', action='store_true',
+                        help="Compare against the TF-IDF pipeline instead of training")
+    args = parser.parse_args()
+
+    if args.evaluate:
+        evaluate_models()
+    else:
+        train_incremental(batch_size=args.batch_size)
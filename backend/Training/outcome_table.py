@@ -0,0 +1,312 @@
+"""
+Precomputed Assessment Outcomes
+Enumerates every answer combination once so scoring becomes a single array lookup
+"""
+import os
+import threading
+import numpy as np
+
+from Training.questionnaire import load_questionnaire, UNANSWERED, SECONDARY_THRESHOLD
+from Training.prakritimodel import summarize_scores
+from Training.panchakarma_model import get_panchakarma_recommendations
+
+USE_OUTCOME_TABLE = os.getenv("USE_OUTCOME_TABLE", "1") == "1"
+OUTCOME_TABLE_DIR = os.getenv(
+    "OUTCOME_TABLE_DIR", os.path.join(os.path.dirname(__file__), '..', 'Models')
+)
+# Tables above this many entries are not built (the answer space grows multiplicatively)
+OUTCOME_TABLE_MAX_ENTRIES = int(os.getenv("OUTCOME_TABLE_MAX_ENTRIES", str(16 * 1024 * 1024)))
+
+
+def _slots(questionnaire):
+    """
+    Per question, the table digit of each answer code.
+
+    Digit 0 is "unanswered" and digits 1.. are the codes a respondent can
+    pick. Scored codes no option offers have no digit (-1); answers using
+    them are scored directly instead.
+    """
+    offered = [sorted(set(codes)) for codes in questionnaire.option_codes]
+    slots = []
+    for i, codes in enumerate(offered):
+        slot = np.full(len(questionnaire.codes[i]) + 1, -1, dtype=np.int64)
+        slot[UNANSWERED] = 0  # the last entry, so code -1 indexes it directly
+        slot[codes] = np.arange(1, len(codes) + 1)
+        slots.append(slot)
+    return offered, slots
+
+
+def outcome_keys(doshas):
+    """Every (dominant, secondary, secondary above threshold) outcome, indexed by outcome id"""
+    return [(dominant, secondary, above) for dominant in doshas for secondary in doshas
+            if secondary != dominant for above in (False, True)]
+
+
+def build_outcome_table(questionnaire):
+    """
+    Score every combination of answers (including unanswered questions).
+
+    Unanswered digits multiply the table size (v1: 52,488 complete
+    combinations, 983,040 with unanswered questions, 6.9 MB), but adaptive
+    assessments end early and imports may be partial, so without them most
+    adaptive results would miss the table. The file is memory-mapped, so
+    only the pages that are read take memory.
+
+    The table is built one question at a time by broadcasting each
+    question's score rows across the combinations so far, so the first
+    question is the most significant digit of the index. Outcomes come from
+    summarize_scores over the distinct score triples, so they are exactly
+    what the per-request path would report.
+
+    Returns:
+        Structured array with 'scores' (int16 per dosha) and 'outcome' (uint8 id)
+    """
+    offered, _ = _slots(questionnaire)
+    n = len(questionnaire.doshas)
+    scores = np.zeros((1, n), dtype=np.int16)
+    for i, codes in enumerate(offered):
+        rows = np.zeros((len(codes) + 1, n), dtype=np.int16)
+        rows[1:] = questionnaire.score_table[i, codes]
+        scores = (scores[:, None, :] + rows[None, :, :]).reshape(-1, n)
+
+    keys = {key: k for k, key in enumerate(outcome_keys(questionnaire.doshas))}
+    distinct, inverse = np.unique(scores, axis=0, return_inverse=True)
+    distinct_outcomes = np.empty(len(distinct), dtype=np.uint8)
+    for k, row in enumerate(distinct):
+        results = summarize_scores(dict(zip(questionnaire.doshas, map(int, row))))
+        secondary = results['secondary_dosha']
+        above = results['percentages'][secondary] > SECONDARY_THRESHOLD
+        distinct_outcomes[k] = keys[(results['dominant_dosha'], secondary, above)]
+
+    table = np.empty(len(scores), dtype=[('scores', np.int16, (n,)), ('outcome', np.uint8)])
+    table['scores'] = scores
+    table['outcome'] = distinct_outcomes[inverse.reshape(-1)]
+    return table
+
+
+class OutcomeTable:
+    """
+    Score and outcome of every answer vector of one questionnaire.
+
+    An answer vector maps to a mixed-radix index (per question: unanswered
+    or one of its offered codes), so looking up an assessment is one index
+    computation and one array read. The array is memory-mapped from
+    OUTCOME_TABLE_DIR when present; the file name carries the weights
+    version, so a table built for other weights is never used.
+    Recommendations are precomputed per outcome and dosha results memoized
+    per score triple; both are shared between callers and must not be
+    mutated.
+    """
+
+    def __init__(self, questionnaire, table):
+        self.questionnaire = questionnaire
+        self.table = table
+        self.offered, self.slots = _slots(questionnaire)
+        radices = np.array([len(codes) + 1 for codes in self.offered], dtype=np.int64)
+        # Place value of each question's digit (first question most significant)
+        self.place = np.append(np.cumprod(radices[::-1])[::-1][1:], 1).astype(np.int64)
+        # Plain lists for the single-lookup path (numpy scalar indexing is slower)
+        self._slot_lists = [slot.tolist() for slot in self.slots]
+        self._place_list = self.place.tolist()
+        self._summaries = {}
+        self.outcomes = outcome_keys(questionnaire.doshas)
+        self.recommendations = [
+            get_panchakarma_recommendations({
+                'dominant_dosha': dominant,
+                'secondary_dosha': secondary,
+                'percentages': {secondary: 100 if above else 0}
+            })
+            for dominant, secondary, above in self.outcomes
+        ]
+
+    def index(self, answers):
+        """Table index of an integer answer vector, or None if it uses an unoffered code"""
+        index = 0
+        for slot, place, j in zip(self._slot_lists, self._place_list, answers):
+            digit = slot[j]
+            if digit < 0:
+                return None
+            index += digit * place
+        return index
+
+    def index_batch(self, answers):
+        """Vectorized index over (rows, questions); rows with unoffered codes get -1"""
+        answers = np.asarray(answers, dtype=np.int64).reshape(-1, self.questionnaire.size)
+        digits = np.stack([slot[answers[:, i]] for i, slot in enumerate(self.slots)], axis=1)
+        indexes = digits @ self.place
+        indexes[(digits < 0).any(axis=1)] = -1
+        return indexes
+
+    def lookup(self, answers):
+        """
+        Dosha results and recommendations for an integer answer vector.
+
+        Returns:
+            (dosha_results, panchakarma_recs), or None if the answers are
+            outside the table (then score them directly)
+        """
+        index = self.index(answers)
+        if index is None:
+            return None
+        scores, outcome = self.table[index]
+        scores = tuple(scores.tolist())
+        dosha_results = self._summaries.get(scores)
+        if dosha_results is None:
+            dosha_results = self._summaries[scores] = summarize_scores(dict(zip(self.questionnaire.doshas, scores)))
+        return dosha_results, self.recommendations[outcome]
+
+    def recommendations_for(self, dosha_results):
+        """Precomputed recommendations for already summarized dosha results"""
+        secondary = dosha_results.get('secondary_dosha')
+        above = (dosha_results.get('percentages') or {}).get(secondary, 0) > SECONDARY_THRESHOLD
+        try:
+            return self.recommendations[self.outcomes.index((dosha_results['dominant_dosha'], secondary, above))]
+        except (KeyError, ValueError):
+            return get_panchakarma_recommendations(dosha_results)
+
+    def distribution(self, complete_only=True):
+        """
+        Outcome frequencies over the answer space, each combination counted once.
+
+        This is the distribution if every combination of answers were equally
+        likely, independent of who has taken the assessment.
+
+        Args:
+            complete_only: Count only combinations with every question answered
+
+        Returns:
+            Dictionary with the combinations counted and, per outcome and per
+            dominant dosha, the count and share
+        """
+        if complete_only:
+            # Digit 0 (unanswered) excluded for every question
+            index = np.zeros(1, dtype=np.int64)
+            for codes, place in zip(self.offered, self.place):
+                index = (index[:, None] + np.arange(1, len(codes) + 1, dtype=np.int64)[None, :] * place).reshape(-1)
+            outcomes = self.table['outcome'][index]
+        else:
+            outcomes = self.table['outcome']
+        counts = np.bincount(outcomes, minlength=len(self.outcomes))
+        total = int(counts.sum())
+
+        by_outcome = []
+        by_dominant = {dosha: 0 for dosha in self.questionnaire.doshas}
+        for (dominant, secondary, above), count in zip(self.outcomes, counts):
+            by_dominant[dominant] += int(count)
+            if count:
+                by_outcome.append({
+                    'dominant_dosha': dominant,
+                    'secondary_dosha': secondary,
+                    'secondary_above_threshold': above,
+                    'combinations': int(count),
+                    'share': round(int(count) / total, 6)
+                })
+        by_outcome.sort(key=lambda item: -item['combinations'])
+        return {
+            'questionnaire_version': self.questionnaire.version,
+            'weights_version': self.questionnaire.weights_version,
+            'complete_only': complete_only,
+            'combinations': total,
+            'dominant_dosha': {
+                dosha: {'combinations': count, 'share': round(count / total, 6)}
+                for dosha, count in by_dominant.items()
+            },
+            'outcomes': by_outcome
+        }
+
+
+def table_size(questionnaire):
+    offered, _ = _slots(questionnaire)
+    return int(np.prod([len(codes) + 1 for codes in offered], dtype=np.float64))
+
+
+def outcome_table_path(questionnaire, directory=None):
+    weights = questionnaire.weights_version.replace(':', '-')
+    return os.path.join(directory or OUTCOME_TABLE_DIR, f"outcomes-{weights}.npy")
+
+
+def save_outcome_table(questionnaire_version=None, directory=None):
+    """Build a questionnaire's outcome table and write it as .npy; returns the path"""
+    questionnaire = load_questionnaire(questionnaire_version)
+    path = outcome_table_path(questionnaire, directory)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = build_outcome_table(questionnaire)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, table)
+    os.replace(tmp_path, path)
+    print(f"Outcome table ({len(table)} entries, {table.nbytes / 1e6:.1f} MB) saved to {path}")
+    return path
+
+
+_tables = {}
+_tables_lock = threading.Lock()
+_missing = set()  # weights versions already warned about
+
+
+def load_outcome_table(questionnaire_version=None):
+    """
+    Outcome table for a questionnaire (cached per weights version), or None.
+
+    The table saved by run_training.py (or `python -m Training.outcome_table`)
+    is memory-mapped; the server never builds one. Returns None, so callers
+    score directly, when USE_OUTCOME_TABLE is off, the answer space exceeds
+    OUTCOME_TABLE_MAX_ENTRIES, or no table has been saved for the current
+    weights yet (one saved later is picked up on the next call).
+    """
+    if not USE_OUTCOME_TABLE:
+        return None
+    questionnaire = load_questionnaire(questionnaire_version)
+    key = questionnaire.weights_version
+    if key in _tables:
+        return _tables[key]
+
+    with _tables_lock:
+        if key not in _tables:
+            if table_size(questionnaire) > OUTCOME_TABLE_MAX_ENTRIES:
+                _tables[key] = None
+                return None
+            path = outcome_table_path(questionnaire)
+            try:
+                array = np.load(path, mmap_mode='r')
+            except (OSError, ValueError) as e:
+                if key not in _missing:
+                    _missing.add(key)
+                    print(f"Warning: no usable outcome table at {path} ({e}); scoring directly. "
+                          f"Build it with `python -m Training.outcome_table`")
+                return None
+            _tables[key] = OutcomeTable(questionnaire, array)
+    return _tables[key]
+
+
+def score_assessment(assessment_data, questionnaire_version=None):
+    """
+    Dosha results and recommendations for an {question_id: answer code} dict.
+
+    Uses the outcome table when the answers are inside it, and otherwise
+    scores directly; both give identical results.
+
+    Returns:
+        (dosha_results, panchakarma_recs)
+    """
+    questionnaire = load_questionnaire(questionnaire_version)
+    answers = questionnaire.encode_answers(assessment_data)
+    table = load_outcome_table(questionnaire.version)
+    result = table.lookup(answers) if table else None
+    if result is None:
+        dosha_results = summarize_scores(questionnaire.score(answers))
+        result = dosha_results, get_panchakarma_recommendations(dosha_results)
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Build the precomputed outcome table")
+    parser.add_argument('--questionnaire', help="Questionnaire version (default: QUESTIONNAIRE_VERSION)")
+    parser.add_argument('--report', action='store_true', help="Print the outcome distribution")
+    args = parser.parse_args()
+    save_outcome_table(args.questionnaire)
+    if args.report:
+        print(json.dumps(load_outcome_table(args.questionnaire).distribution(), indent=2))
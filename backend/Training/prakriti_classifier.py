@@ -0,0 +1,350 @@
+"""
+Data-Driven Prakriti Classifier
+Learns dosha classification out-of-core from practitioner-confirmed assessments
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+from sqlalchemy import select
+
+from database.answer_codes import questionnaire_rows
+from database.database import read_session
+from database.models import Assessment
+from Training.prakritimodel import calculate_dosha_scores_batch
+from Training.questionnaire import load_questionnaire, UNANSWERED
+
+PRAKRITI_CLASSIFIER_DIR = os.getenv(
+    "PRAKRITI_CLASSIFIER_DIR", os.path.join(os.path.dirname(__file__), '..', 'Models')
+)
+PRAKRITI_TRAIN_CHUNK_SIZE = int(os.getenv("PRAKRITI_TRAIN_CHUNK_SIZE", "5000"))
+PRAKRITI_TRAIN_EPOCHS = int(os.getenv("PRAKRITI_TRAIN_EPOCHS", "5"))
+PRAKRITI_TRAIN_N_JOBS = int(os.getenv("PRAKRITI_TRAIN_N_JOBS", "-1"))
+# Rows whose id is a multiple of this are held out for evaluation
+PRAKRITI_HOLDOUT_MODULUS = int(os.getenv("PRAKRITI_HOLDOUT_MODULUS", "10"))
+
+assessments = Assessment.__table__
+
+
+def feature_layout(questionnaire):
+    """
+    Column offset and width of each question's one-hot block.
+
+    Each question gets one column per scored answer code plus a last column
+    for "unanswered".
+    """
+    widths = [len(codes) + 1 for codes in questionnaire.codes]
+    offsets = np.concatenate([[0], np.cumsum(widths)[:-1]]).astype(np.int64)
+    return offsets, np.array(widths, dtype=np.int64)
+
+
+def encode_features(questionnaire, answers):
+    """One-hot float32 features of shape (rows, columns) for integer answer vectors"""
+    answers = np.asarray(answers, dtype=np.int64).reshape(-1, questionnaire.size)
+    offsets, widths = feature_layout(questionnaire)
+    columns = offsets + np.where(answers == UNANSWERED, widths - 1, answers)
+    features = np.zeros((len(answers), int(widths.sum())), dtype=np.float32)
+    features[np.arange(len(answers))[:, None], columns] = 1
+    return features
+
+
+def stream_confirmed_assessments(db, questionnaire, holdout=False, chunk_size=PRAKRITI_TRAIN_CHUNK_SIZE):
+    """
+    Yield (answers, labels) chunks of assessments with a confirmed dosha.
+
+    Uses keyset pagination on the primary key, so only one chunk is held in
+    memory. Rows whose id is a multiple of PRAKRITI_HOLDOUT_MODULUS form the
+    holdout set and are yielded only when `holdout` is set.
+
+    Returns:
+        Iterator of (int16 answers of shape (rows, questions), label index array)
+    """
+    label_index = {dosha: d for d, dosha in enumerate(questionnaire.doshas)}
+    held_out = (assessments.c.id % PRAKRITI_HOLDOUT_MODULUS) == 0
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(assessments.c.id, assessments.c.assessment_data, assessments.c.confirmed_dosha)
+            .where(questionnaire_rows(questionnaire),
+                   assessments.c.confirmed_dosha.in_(questionnaire.doshas),
+                   held_out if holdout else ~held_out,
+                   assessments.c.id > last_id)
+            .order_by(assessments.c.id).limit(chunk_size)
+        ).all()
+        if not rows:
+            return
+
+        last_id = rows[-1].id
+        usable = [row for row in rows if isinstance(row.assessment_data, dict)]
+        if usable:
+            answers = np.array([questionnaire.encode_answers(row.assessment_data) for row in usable], dtype=np.int16)
+            yield answers, np.array([label_index[row.confirmed_dosha] for row in usable], dtype=np.int64)
+
+        if len(rows) < chunk_size:
+            return
+
+
+def _prefetched(chunks):
+    """Read the next chunk on a worker thread while the current one is being fitted"""
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pending = executor.submit(next, chunks, None)
+        while True:
+            chunk = pending.result()
+            if chunk is None:
+                return
+            pending = executor.submit(next, chunks, None)
+            yield chunk
+
+
+class PrakritiClassifier:
+    """
+    Linear dosha classifier exported from the trained model.
+
+    With one-hot features a linear model's logits are a sum of one weight
+    row per answered question, so the weights are folded into a
+    (question, answer code, dosha) table laid out like the questionnaire's
+    score table. Inference is then one gather and one softmax per batch, with
+    no sklearn at serving time. Results have the shape of the rule-based
+    scorer's, with class probabilities as percentages.
+    """
+
+    def __init__(self, questionnaire, coef, intercept, metadata):
+        self.questionnaire = questionnaire
+        self.coef = np.asarray(coef, dtype=np.float32)
+        self.intercept = np.asarray(intercept, dtype=np.float32)
+        self.metadata = metadata
+        self.model_version = metadata['model_version']
+
+        offsets, widths = feature_layout(questionnaire)
+        max_codes = int(widths.max()) - 1
+        # Unanswered goes in the last slot, so code -1 indexes it directly
+        self.table = np.zeros((questionnaire.size, max_codes + 1, len(questionnaire.doshas)), dtype=np.float64)
+        for i, (offset, width) in enumerate(zip(offsets, widths)):
+            self.table[i, :width - 1] = self.coef[:, offset:offset + width - 1].T
+            self.table[i, -1] = self.coef[:, offset + width - 1]
+        self._question_ids = np.arange(questionnaire.size)
+
+    def probabilities(self, answers):
+        """Class probabilities of shape (rows, doshas) for integer answer vectors"""
+        answers = np.asarray(answers, dtype=np.int64).reshape(-1, self.questionnaire.size)
+        logits = self.table[self._question_ids, answers].sum(axis=1) + self.intercept
+        logits -= logits.max(axis=1, keepdims=True)
+        np.exp(logits, out=logits)
+        return logits / logits.sum(axis=1, keepdims=True)
+
+    def classify_batch(self, answers):
+        """
+        Dosha results for many integer answer vectors.
+
+        Returns:
+            List of dictionaries with percentages, dominant and secondary dosha
+        """
+        if len(answers) == 0:
+            return []
+        probabilities = self.probabilities(answers)
+        ranks = np.argsort(-probabilities, axis=1, kind='stable')
+        doshas = self.questionnaire.doshas
+        return [
+            {
+                'percentages': dict(zip(doshas, percentages)),
+                'dominant_dosha': doshas[order[0]],
+                'secondary_dosha': doshas[order[1]] if len(order) > 1 else None,
+                'model_version': self.model_version
+            }
+            for percentages, order in zip(np.round(probabilities * 100, 2).tolist(), ranks.tolist())
+        ]
+
+    def classify(self, assessment_data):
+        """Dosha results for an {question_id: answer code} dict"""
+        return self.classify_batch([self.questionnaire.encode_answers(assessment_data)])[0]
+
+
+def classifier_path(questionnaire_version=None, directory=None):
+    questionnaire = load_questionnaire(questionnaire_version)
+    return os.path.join(directory or PRAKRITI_CLASSIFIER_DIR, f"prakriti-classifier-{questionnaire.version}.npz")
+
+
+def save_classifier(path, questionnaire, coef, intercept, metadata):
+    """Write the compact inference artifact (weights plus JSON metadata) atomically"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _, widths = feature_layout(questionnaire)
+    tmp_path = path + '.tmp.npz'
+    np.savez_compressed(
+        tmp_path,
+        coef=np.asarray(coef, dtype=np.float32),
+        intercept=np.asarray(intercept, dtype=np.float32),
+        layout=widths,
+        metadata=np.array(json.dumps(metadata))
+    )
+    os.replace(tmp_path, path)
+    print(f"Prakriti classifier ({os.path.getsize(path)} bytes) saved to {path}")
+
+
+_classifiers = {}
+_classifiers_lock = threading.Lock()
+
+
+def load_prakriti_classifier(questionnaire_version=None):
+    """
+    Trained classifier for a questionnaire, or None if there is none.
+
+    Cached per questionnaire and reloaded when the artifact file changes, so
+    a retrained model is picked up without a restart. An artifact whose
+    answer layout no longer matches the questionnaire is ignored.
+    """
+    questionnaire = load_questionnaire(questionnaire_version)
+    path = classifier_path(questionnaire.version)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    cached = _classifiers.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with _classifiers_lock:
+        with np.load(path, allow_pickle=False) as artifact:
+            metadata = json.loads(str(artifact['metadata']))
+            _, widths = feature_layout(questionnaire)
+            if not np.array_equal(artifact['layout'], widths):
+                print(f"Warning: {path} was trained for a different answer layout; ignoring it")
+                classifier = None
+            else:
+                classifier = PrakritiClassifier(questionnaire, artifact['coef'], artifact['intercept'], metadata)
+        _classifiers[path] = (mtime, classifier)
+    return classifier
+
+
+def _evaluate(db, questionnaire, classifier):
+    """Holdout accuracy of the classifier and of the rule-based scorer, and their agreement, streamed"""
+    total = correct = rules_correct = agree = 0
+    for answers, labels in stream_confirmed_assessments(db, questionnaire, holdout=True):
+        predicted = classifier.probabilities(answers).argmax(axis=1)
+        rules = np.array([questionnaire.doshas.index(result['dominant_dosha'])
+                          for result in calculate_dosha_scores_batch(answers, questionnaire.version)])
+        total += len(labels)
+        correct += int((predicted == labels).sum())
+        rules_correct += int((rules == labels).sum())
+        agree += int((predicted == rules).sum())
+    if not total:
+        return {'holdout_rows': 0}
+    return {
+        'holdout_rows': total,
+        'holdout_accuracy': round(correct / total, 4),
+        'rules_holdout_accuracy': round(rules_correct / total, 4),
+        'rule_agreement': round(agree / total, 4)
+    }
+
+
+def measure_batch_latency(classifier, rows=10000, repeats=5, seed=0):
+    """
+    Per-row batched inference time of the classifier and the rule-based scorer.
+
+    Both score the same random answer vectors (offered codes, some
+    unanswered) into result dictionaries.
+
+    Returns:
+        Dictionary of best-of-`repeats` microseconds per row for each scorer
+    """
+    questionnaire = classifier.questionnaire
+    rng = np.random.default_rng(seed)
+    answers = np.stack([
+        rng.choice(np.array(codes + [UNANSWERED]), size=rows) for codes in questionnaire.option_codes
+    ], axis=1)
+
+    def best(score):
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            score(answers)
+            timings.append(time.perf_counter() - started)
+        return round(min(timings) / rows * 1e6, 3)
+
+    return {
+        'classifier_us_per_row': best(classifier.classify_batch),
+        'rules_us_per_row': best(lambda batch: calculate_dosha_scores_batch(batch, questionnaire.version))
+    }
+
+
+def train_prakriti_classifier(questionnaire_version=None, epochs=PRAKRITI_TRAIN_EPOCHS,
+                              chunk_size=PRAKRITI_TRAIN_CHUNK_SIZE, n_jobs=PRAKRITI_TRAIN_N_JOBS,
+                              alpha=1e-4, seed=42):
+    """
+    Train the prakriti classifier on confirmed assessments without loading them all.
+
+    Each epoch streams the training rows chunk by chunk (the next chunk is
+    read while the current one is fitted) into an averaged logistic-loss
+    SGDClassifier via partial_fit; its one-vs-rest binary problems are
+    fitted in parallel over `n_jobs` cores. The holdout rows are then
+    streamed once for evaluation.
+
+    Returns:
+        The PrakritiClassifier that was saved, or None if there are no
+        confirmed assessments to learn from
+    """
+    # Serving only needs the exported weights, so sklearn is imported for training alone
+    from sklearn.linear_model import SGDClassifier
+
+    questionnaire = load_questionnaire(questionnaire_version)
+    classes = np.arange(len(questionnaire.doshas))
+    # Averaging the SGD iterates settles noisy labels far better than the last iterate alone
+    model = SGDClassifier(loss='log_loss', alpha=alpha, average=True, n_jobs=n_jobs, random_state=seed)
+    rng = np.random.default_rng(seed)
+    samples = 0
+    started = time.perf_counter()
+
+    db = read_session()
+    try:
+        for epoch in range(epochs):
+            for answers, labels in _prefetched(
+                    stream_confirmed_assessments(db, questionnaire, chunk_size=chunk_size)):
+                # Rows arrive in id (roughly time) order; shuffle within the chunk
+                order = rng.permutation(len(labels))
+                model.partial_fit(encode_features(questionnaire, answers[order]), labels[order], classes=classes)
+                if epoch == 0:
+                    samples += len(labels)
+            if not samples:
+                print(f"No confirmed assessments for questionnaire {questionnaire.version}; classifier not trained")
+                return None
+
+        coef = model.coef_.astype(np.float32)
+        intercept = model.intercept_.astype(np.float32)
+        digest = hashlib.sha256(coef.tobytes() + intercept.tobytes()).hexdigest()[:12]
+        metadata = {
+            'model_version': f"{questionnaire.version}:clf-{digest}",
+            'questionnaire_version': questionnaire.version,
+            'doshas': questionnaire.doshas,
+            'training_rows': samples,
+            'epochs': epochs,
+            'trained_at': datetime.now(timezone.utc).isoformat(),
+            'training_seconds': round(time.perf_counter() - started, 3)
+        }
+        classifier = PrakritiClassifier(questionnaire, coef, intercept, metadata)
+        metadata.update(_evaluate(db, questionnaire, classifier))
+    finally:
+        db.close()
+
+    metadata.update(measure_batch_latency(classifier))
+    save_classifier(classifier_path(questionnaire.version), questionnaire, coef, intercept, metadata)
+    print(f"Trained on {samples} assessments: {json.dumps(metadata)}")
+    return classifier
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the prakriti classifier on confirmed assessments")
+    parser.add_argument('--questionnaire', help="Questionnaire version (default: QUESTIONNAIRE_VERSION)")
+    parser.add_argument('--epochs', type=int, default=PRAKRITI_TRAIN_EPOCHS)
+    parser.add_argument('--chunk-size', type=int, default=PRAKRITI_TRAIN_CHUNK_SIZE)
+    parser.add_argument('--n-jobs', type=int, default=PRAKRITI_TRAIN_N_JOBS)
+    parser.add_argument('--alpha', type=float, default=1e-4, help="L2 regularization strength")
+    args = parser.parse_args()
+    train_prakriti_classifier(args.questionnaire, args.epochs, args.chunk_size, args.n_jobs, args.alpha)
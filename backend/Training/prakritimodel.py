@@ -4,72 +4,26 @@ Determines Vata, Pitta, Kapha scores based on assessment responses
 """
 import pickle
 import os
-import numpy as np
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import StandardScaler
+import sys
+from functools import lru_cache
 
-# Dosha assessment question weights
-DOSHA_QUESTIONS = {
-    'vata': {
-        'body_frame': {'thin': 3, 'medium': 1, 'heavy': 0},
-        'skin_type': {'dry': 3, 'rough': 2, 'normal': 1, 'oily': 0},
-        'hair_texture': {'thin': 2, 'dry': 2, 'normal': 1, 'thick': 0},
-        'appetite': {'irregular': 3, 'variable': 2, 'regular': 0},
-        'digestion': {'irregular': 3, 'variable': 2, 'regular': 0},
-        'energy_level': {'variable': 3, 'irregular': 2, 'consistent': 0},
-        'sleep': {'light': 3, 'interrupted': 2, 'deep': 0},
-        'temperament': {'anxious': 3, 'creative': 2, 'quick': 2, 'calm': 0},
-        'stress_response': {'worried': 3, 'anxious': 2, 'calm': 0},
-        'weather_preference': {'warm': 3, 'hot': 2, 'cold': 0}
-    },
-    'pitta': {
-        'body_frame': {'medium': 3, 'thin': 1, 'heavy': 1},
-        'skin_type': {'oily': 3, 'sensitive': 2, 'normal': 1, 'dry': 0},
-        'hair_texture': {'fine': 2, 'oily': 2, 'normal': 1, 'thick': 0},
-        'appetite': {'strong': 3, 'regular': 2, 'irregular': 0},
-        'digestion': {'strong': 3, 'regular': 2, 'irregular': 0},
-        'energy_level': {'high': 3, 'moderate': 2, 'low': 0},
-        'sleep': {'moderate': 2, 'light': 1, 'deep': 1},
-        'temperament': {'intense': 3, 'ambitious': 2, 'irritable': 2, 'calm': 0},
-        'stress_response': {'irritable': 3, 'angry': 2, 'calm': 0},
-        'weather_preference': {'cool': 3, 'moderate': 1, 'hot': 0}
-    },
-    'kapha': {
-        'body_frame': {'heavy': 3, 'large': 2, 'medium': 1, 'thin': 0},
-        'skin_type': {'oily': 3, 'smooth': 2, 'normal': 1, 'dry': 0},
-        'hair_texture': {'thick': 3, 'oily': 2, 'normal': 1, 'thin': 0},
-        'appetite': {'regular': 3, 'moderate': 2, 'irregular': 0},
-        'digestion': {'slow': 3, 'moderate': 2, 'fast': 0},
-        'energy_level': {'low': 3, 'moderate': 2, 'high': 0},
-        'sleep': {'deep': 3, 'sound': 2, 'light': 0},
-        'temperament': {'calm': 3, 'stable': 2, 'grounded': 2, 'anxious': 0},
-        'stress_response': {'calm': 3, 'peaceful': 2, 'anxious': 0},
-        'weather_preference': {'warm': 3, 'hot': 2, 'cold': 0}
-    }
-}
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Training.questionnaire import load_questionnaire
 
-def calculate_dosha_scores(assessment_data):
+# Dosha assessment question weights, derived from the default questionnaire definition
+DOSHA_QUESTIONS = load_questionnaire().to_legacy_weights()
+
+def summarize_scores(scores):
     """
-    Calculate Vata, Pitta, Kapha scores based on assessment responses
-    
+    Turn raw dosha scores into percentages and dominant/secondary doshas
+
     Args:
-        assessment_data: Dictionary with question-answer pairs
-        
+        scores: Dictionary with raw vata, pitta and kapha scores
+
     Returns:
         Dictionary with dosha scores and percentages
     """
-    scores = {'vata': 0, 'pitta': 0, 'kapha': 0}
-    total_weight = {'vata': 0, 'pitta': 0, 'kapha': 0}
-    
-    for question, answer in assessment_data.items():
-        for dosha, questions in DOSHA_QUESTIONS.items():
-            if question in questions:
-                weights = questions[question]
-                if answer in weights:
-                    score = weights[answer]
-                    scores[dosha] += score
-                    total_weight[dosha] += 3  # Max possible score per question
-    
     # Normalize scores to percentages
     total_score = sum(scores.values())
     if total_score > 0:
@@ -93,10 +47,50 @@ def calculate_dosha_scores(assessment_data):
         'secondary_dosha': secondary_dosha
     }
 
+def calculate_dosha_scores(assessment_data, questionnaire_version=None):
+    """
+    Calculate Vata, Pitta, Kapha scores based on assessment responses
+    
+    Args:
+        assessment_data: Dictionary with question-answer pairs
+        questionnaire_version: Questionnaire whose weights to use (default if None)
+        
+    Returns:
+        Dictionary with dosha scores and percentages
+    """
+    questionnaire = load_questionnaire(questionnaire_version)
+    return summarize_scores(questionnaire.score(questionnaire.encode_answers(assessment_data)))
+
+@lru_cache(maxsize=4096)
+def _summarize_score_tuple(vata, pitta, kapha):
+    return summarize_scores({'vata': vata, 'pitta': pitta, 'kapha': kapha})
+
+def calculate_dosha_scores_batch(answers, questionnaire_version=None):
+    """
+    Vectorized calculate_dosha_scores over many integer answer vectors
+    
+    Scores are summed with one table gather; percentages come from the same
+    summarize_scores, memoized per distinct score triple, so each result is
+    identical to the single-row function. Returned dicts are shared between
+    rows with equal scores and must not be mutated.
+    
+    Args:
+        answers: Sequence of integer answer vectors (see CompiledQuestionnaire.encode_answers)
+        questionnaire_version: Questionnaire whose weights to use (default if None)
+        
+    Returns:
+        List of dosha result dictionaries, one per row
+    """
+    questionnaire = load_questionnaire(questionnaire_version)
+    if len(answers) == 0:
+        return []
+    scores = questionnaire.score_batch(answers)
+    return [_summarize_score_tuple(*map(int, row)) for row in scores]
+
 def train_prakriti_model():
     """Train a model for dosha prediction (optional enhancement)"""
-    # For now, we use rule-based calculation
-    # This can be enhanced with ML if we have training data
+    # The rule-based calculation is the default scorer; the data-driven
+    # classifier is trained from confirmed assessments in prakriti_classifier.py
     print("Prakriti model uses rule-based calculation from Ayurvedic principles.")
     print("Model logic implemented in calculate_dosha_scores() function.")
     
@@ -0,0 +1,522 @@
+"""
+Questionnaire Definitions
+Compiles versioned questionnaire files into dense lookup and scoring tables
+"""
+import hashlib
+import json
+import os
+import threading
+from functools import cached_property
+
+QUESTIONNAIRE_DIR = os.path.join(os.path.dirname(__file__), 'questionnaires')
+DEFAULT_QUESTIONNAIRE_VERSION = os.getenv("QUESTIONNAIRE_VERSION", "v1")
+
+# Sentinel for "not answered" in integer answer vectors
+UNANSWERED = -1
+
+# Recommendations add the secondary dosha's therapies above this share (percent)
+SECONDARY_THRESHOLD = 30
+
+# Packed answer codes are stored in a signed 64-bit integer column
+ANSWER_CODE_MAX_BITS = 63
+
+
+class QuestionnaireError(ValueError):
+    """Raised when a questionnaire definition is inconsistent"""
+
+
+class CompiledQuestionnaire:
+    """
+    A questionnaire definition compiled for O(1) lookups.
+
+    Each question i has a list of answer codes; option labels resolve to an
+    integer code index j through a dict, and scores live in a dense
+    (questions x codes x doshas) table, so scoring an answer is one row lookup.
+    The state-transition table `next_question` gives the question asked after
+    each question (-1 when the assessment is complete). The numpy tables used
+    for batch scoring and early termination are built on first use, so
+    compiling a questionnaire doesn't import numpy.
+    """
+
+    def __init__(self, definition):
+        self.version = definition['version']
+        self.description = definition.get('description', '')
+        self.doshas = list(definition['doshas'])
+        self.size = len(definition['questions'])
+
+        self.questions = []
+        self.question_index = {}
+        self.codes = []
+        self.code_index = []
+        self.option_labels = []
+        self.option_index = []
+        self.option_codes = []
+        self.answer_lookup = []
+
+        self.score_rows = []
+
+        for i, question in enumerate(definition['questions']):
+            question_id = question['id']
+            codes = list(question['scores'])
+            code_index = {code: j for j, code in enumerate(codes)}
+            labels = [option['label'] for option in question['options']]
+
+            self.questions.append({
+                'id': question_id,
+                'question': question['question'],
+                'options': labels,
+                'context': question.get('context', '')
+            })
+            self.question_index[question_id] = i
+            self.codes.append(codes)
+            self.code_index.append(code_index)
+            self.option_labels.append(labels)
+            self.option_index.append({label: k for k, label in enumerate(labels)})
+            self.option_codes.append([code_index[option['code']] for option in question['options']])
+            # Case-insensitive option labels and option codes, for validating keyed-in answers
+            lookup = {option['code'].lower(): code_index[option['code']] for option in question['options']}
+            lookup.update({option['label'].lower(): code_index[option['code']] for option in question['options']})
+            self.answer_lookup.append(lookup)
+
+            self.score_rows.append([
+                tuple(question['scores'][code][dosha] for dosha in self.doshas) for code in codes
+            ])
+
+        # Changes whenever any score changes; stored with each assessment so stale scores can be found
+        weights = json.dumps([self.doshas, [[q['id'], codes, rows] for q, codes, rows in
+                                            zip(self.questions, self.codes, self.score_rows)]])
+        self.weights_version = f"{self.version}:{hashlib.sha256(weights.encode('utf-8')).hexdigest()[:12]}"
+
+        self.next_question = list(range(1, self.size)) + [-1]
+        self._compile_answer_layout()
+
+        # Serialized once so clients can cache the manifest by ETag
+        self.manifest_json = json.dumps(self.manifest(), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.manifest_etag = f'"{hashlib.sha256(self.manifest_json).hexdigest()[:32]}"'
+
+    @cached_property
+    def score_table(self):
+        """Dense int16 (questions x codes x doshas) score table for vectorized scoring"""
+        import numpy as np
+        max_codes = max(len(rows) for rows in self.score_rows)
+        table = np.zeros((self.size, max_codes, len(self.doshas)), dtype=np.int16)
+        for i, rows in enumerate(self.score_rows):
+            table[i, :len(rows)] = rows
+        return table
+
+    @cached_property
+    def max_scores(self):
+        """Highest score each question can still add per dosha (for early termination)"""
+        return self.score_table.max(axis=1)
+
+    @cached_property
+    def _bound_tables(self):
+        """
+        Per-question bounds used to decide an assessment before every answer is in.
+
+        Questions are independent, so the least (or most) a set of remaining
+        questions can add to any linear function of the scores is the sum of
+        each question's own minimum (or maximum) over its option codes.
+
+        Returns:
+            (pair_min, pair_range, share_above_min, share_below_max, total_min)
+        """
+        import numpy as np
+        n = len(self.doshas)
+        pair_min = np.zeros((self.size, n, n), dtype=np.int32)   # min of score[a] - score[b]
+        pair_range = np.zeros((self.size, n, n), dtype=np.int32)  # max - min of that difference
+        share_above_min = np.zeros((self.size, n), dtype=np.int64)
+        share_below_max = np.zeros((self.size, n), dtype=np.int64)
+        total_min = np.zeros(self.size, dtype=np.int32)
+        for i, rows in enumerate(self.score_rows):
+            # Only codes a respondent can pick (not the table's padding or unoffered codes)
+            rows = np.asarray([rows[j] for j in sorted(set(self.option_codes[i]))], dtype=np.int64)
+            diffs = rows[:, :, None] - rows[:, None, :]
+            pair_min[i] = diffs.min(axis=0)
+            pair_range[i] = diffs.max(axis=0) - diffs.min(axis=0)
+            totals = rows.sum(axis=1, keepdims=True)
+            # share > threshold + 0.01 (survives rounding to 2 decimals) and share <= threshold
+            share_above_min[i] = (10000 * rows - (100 * SECONDARY_THRESHOLD + 1) * totals).min(axis=0)
+            share_below_max[i] = (100 * rows - SECONDARY_THRESHOLD * totals).max(axis=0)
+            total_min[i] = totals.min()
+        return pair_min, pair_range, share_above_min, share_below_max, total_min
+
+    def _compile_answer_layout(self):
+        """
+        Bit layout packing a whole answer vector into one integer.
+
+        Each question gets a field just wide enough for its codes plus
+        "unanswered" (stored as 0, code j as j + 1). The first question takes
+        the most significant field, so fixing leading questions narrows the
+        packed values to one contiguous range.
+        """
+        self.answer_bits = [max(1, len(codes).bit_length()) for codes in self.codes]
+        self.answer_code_bits = sum(self.answer_bits)
+        self.answer_shifts = []
+        shift = self.answer_code_bits
+        for bits in self.answer_bits:
+            shift -= bits
+            self.answer_shifts.append(shift)
+        self.packs_answers = self.answer_code_bits <= ANSWER_CODE_MAX_BITS
+
+    def pack_answers(self, answers):
+        """
+        Pack an integer answer vector into one integer (see _compile_answer_layout).
+
+        Returns:
+            The packed code, or None if this questionnaire has too many fields for 64 bits
+        """
+        if not self.packs_answers:
+            return None
+        packed = 0
+        for j, shift in zip(answers, self.answer_shifts):
+            packed |= (j + 1) << shift
+        return packed
+
+    def pack_answers_batch(self, answers):
+        """Vectorized pack_answers over an array of shape (rows, questions); returns int64 codes"""
+        import numpy as np
+        if not self.packs_answers:
+            return None
+        answers = np.asarray(answers, dtype=np.int64).reshape(-1, self.size)
+        return ((answers + 1) << np.array(self.answer_shifts, dtype=np.int64)).sum(axis=1)
+
+    def unpack_answers(self, packed):
+        """Inverse of pack_answers: the integer answer vector"""
+        return [((packed >> shift) & ((1 << bits) - 1)) - 1
+                for shift, bits in zip(self.answer_shifts, self.answer_bits)]
+
+    def answer_mask(self, answers):
+        """
+        Bitmask test for packed codes that have all the given answers.
+
+        A packed code c matches when c & mask == value, which also bounds it
+        to value <= c <= value | ~mask for an index range scan.
+
+        Args:
+            answers: {question_index: integer answer code}
+
+        Returns:
+            (mask, value, low, high)
+        """
+        mask = value = 0
+        for i, j in answers.items():
+            field = ((1 << self.answer_bits[i]) - 1) << self.answer_shifts[i]
+            mask |= field
+            value |= (j + 1) << self.answer_shifts[i]
+        full = (1 << self.answer_code_bits) - 1
+        return mask, value, value, value | (full & ~mask)
+
+    def _bounds(self, answers, totals=None):
+        import numpy as np
+        if totals is None:
+            totals = list(self.score(answers).values())
+        totals = np.array(totals, dtype=np.int64)
+        remaining = np.array([i for i, j in enumerate(answers) if j == UNANSWERED], dtype=np.intp)
+        pair_min = self._bound_tables[0]
+        margins = totals[:, None] - totals[None, :] + pair_min[remaining].sum(axis=0)
+        return totals, remaining, margins
+
+    @staticmethod
+    def _ranks_before(margins, a, b):
+        """Whether dosha a finishes ahead of b for any remaining answers (ties keep dosha order)"""
+        return margins[a, b] > 0 or (margins[a, b] == 0 and a < b)
+
+    def decided_outcome(self, answers, totals=None):
+        """
+        The result of an assessment if the remaining answers can no longer change it.
+
+        The outcome is the dominant and secondary dosha and whether the
+        secondary share is above SECONDARY_THRESHOLD, which together decide
+        the recommendations. Ranking follows summarize_scores: higher score
+        first, ties in dosha order.
+
+        Args:
+            answers: Integer answer vector
+            totals: Running scores of `answers` in dosha order (summed if None)
+
+        Returns:
+            (dominant, secondary, secondary_above_threshold), or None while
+            some combination of remaining answers would change it
+        """
+        totals, remaining, margins = self._bounds(answers, totals)
+        _, _, share_above_min, share_below_max, total_min = self._bound_tables
+        n = len(self.doshas)
+        dominant = next((d for d in range(n)
+                         if all(self._ranks_before(margins, d, e) for e in range(n) if e != d)), None)
+        if dominant is None:
+            return None
+        secondary = next((s for s in range(n) if s != dominant and all(
+            self._ranks_before(margins, s, e) for e in range(n) if e not in (dominant, s))), None)
+        if secondary is None:
+            return None
+
+        # A total of zero reports equal shares, which the linear bounds don't cover
+        if totals.sum() + total_min[remaining].sum() == 0:
+            if len(remaining):
+                return None
+            return self.doshas[dominant], self.doshas[secondary], 100 / n > SECONDARY_THRESHOLD
+        total = totals.sum()
+        if 10000 * totals[secondary] - (100 * SECONDARY_THRESHOLD + 1) * total \
+                + share_above_min[remaining, secondary].sum() > 0:
+            above = True
+        elif 100 * totals[secondary] - SECONDARY_THRESHOLD * total \
+                + share_below_max[remaining, secondary].sum() <= 0:
+            above = False
+        else:
+            return None
+        return self.doshas[dominant], self.doshas[secondary], above
+
+    def most_informative_question(self, answers, totals=None):
+        """
+        The unanswered question that can move the undecided rankings the most.
+
+        Each question is weighted by how far its answers can swing the score
+        difference of every pair of doshas whose order is still open; ties
+        keep questionnaire order.
+
+        Returns:
+            Question index, or None if every question is answered
+        """
+        import numpy as np
+        _, remaining, margins = self._bounds(answers, totals)
+        if not len(remaining):
+            return None
+        n = len(self.doshas)
+        open_pairs = [(a, b) for a in range(n) for b in range(a + 1, n)
+                      if not (self._ranks_before(margins, a, b) or self._ranks_before(margins, b, a))]
+        if not open_pairs:
+            return int(remaining[0])
+        pair_range = self._bound_tables[1]
+        swing = sum(pair_range[remaining, a, b] for a, b in open_pairs)
+        return int(remaining[int(np.argmax(swing))])
+
+    def option_code(self, question_id, label):
+        """Integer answer code for an option label, or None if it isn't an option"""
+        i = self.question_index.get(question_id)
+        if i is None:
+            return None
+        k = self.option_index[i].get(label)
+        return None if k is None else self.option_codes[i][k]
+
+    def encode_answers(self, assessment_data):
+        """
+        Convert {question_id: answer code string} into an integer answer vector.
+
+        Unknown questions are ignored and unknown answers are left UNANSWERED,
+        matching how the rule-based scorer ignores them.
+        """
+        answers = [UNANSWERED] * self.size
+        for question_id, answer in assessment_data.items():
+            i = self.question_index.get(question_id)
+            if i is not None:
+                answers[i] = self.code_index[i].get(answer, UNANSWERED)
+        return answers
+
+    def decode_answers(self, answers):
+        """Convert an integer answer vector back into {question_id: answer code string}"""
+        return {
+            self.questions[i]['id']: self.codes[i][j]
+            for i, j in enumerate(answers) if j != UNANSWERED
+        }
+
+    def score(self, answers):
+        """Sum the score rows of an integer answer vector into {dosha: score}"""
+        totals = [0] * len(self.doshas)
+        for i, j in enumerate(answers):
+            if j != UNANSWERED:
+                row = self.score_rows[i][j]
+                for d in range(len(totals)):
+                    totals[d] += row[d]
+        return dict(zip(self.doshas, totals))
+
+    def apply_answer(self, totals, question_index, code, previous=UNANSWERED):
+        """
+        Update running scores in place for one answer, in O(doshas).
+
+        Changing an answer subtracts the previous code's row and adds the new
+        one, so `totals` always equals score() of the current answer vector.
+
+        Args:
+            totals: List of raw scores in dosha order
+            question_index: Question being answered
+            code: New integer answer code (UNANSWERED to clear it)
+            previous: Code the question had before (UNANSWERED if none)
+
+        Returns:
+            totals
+        """
+        if previous != UNANSWERED:
+            row = self.score_rows[question_index][previous]
+            for d in range(len(totals)):
+                totals[d] -= row[d]
+        if code != UNANSWERED:
+            row = self.score_rows[question_index][code]
+            for d in range(len(totals)):
+                totals[d] += row[d]
+        return totals
+
+    def parse_answer(self, question_index, answer):
+        """
+        Validate a keyed-in answer (option label or option code, any case).
+
+        Returns:
+            Integer answer code, or None if the answer is not one of the options
+        """
+        if not isinstance(answer, str):
+            return None
+        return self.answer_lookup[question_index].get(answer.strip().lower())
+
+    def score_batch(self, answers):
+        """
+        Score many integer answer vectors at once.
+
+        Args:
+            answers: Array-like of shape (rows, questions) with UNANSWERED gaps
+
+        Returns:
+            int32 array of shape (rows, doshas) with raw dosha scores
+        """
+        import numpy as np
+        answers = np.asarray(answers, dtype=np.int16)
+        answered = answers != UNANSWERED
+        question_ids = np.broadcast_to(np.arange(self.size), answers.shape)
+        rows = self.score_table[question_ids, np.where(answered, answers, 0)]
+        rows[~answered] = 0
+        return rows.sum(axis=1, dtype=np.int32)
+
+    def to_legacy_weights(self):
+        """Return weights in the {dosha: {question_id: {code: weight}}} DOSHA_QUESTIONS shape"""
+        return {
+            dosha: {
+                question['id']: {code: self.score_rows[i][j][d] for j, code in enumerate(self.codes[i])}
+                for i, question in enumerate(self.questions)
+            }
+            for d, dosha in enumerate(self.doshas)
+        }
+
+    def option_mapping(self):
+        """Return {question_id: {option label: answer code string}}"""
+        return {
+            question['id']: {
+                label: self.codes[i][self.option_codes[i][k]]
+                for k, label in enumerate(self.option_labels[i])
+            }
+            for i, question in enumerate(self.questions)
+        }
+
+    def manifest(self):
+        """Client-facing description of the questionnaire (no scores)"""
+        return {
+            'version': self.version,
+            'questions': self.questions
+        }
+
+
+def validate_definition(definition):
+    """
+    Check a questionnaire definition before compiling it.
+
+    Every option must map to a scored code, and every scored code must carry
+    an explicit score for every dosha, so no answer silently scores nothing.
+    """
+    errors = []
+    doshas = definition.get('doshas') or []
+    if not definition.get('version'):
+        errors.append("missing 'version'")
+    if not doshas:
+        errors.append("missing 'doshas'")
+    if not definition.get('questions'):
+        errors.append("no questions defined")
+
+    seen_ids = set()
+    for question in definition.get('questions', []):
+        question_id = question.get('id')
+        if question_id in seen_ids:
+            errors.append(f"duplicate question id '{question_id}'")
+        seen_ids.add(question_id)
+
+        scores = question.get('scores', {})
+        labels = [option.get('label') for option in question.get('options', [])]
+        if not labels:
+            errors.append(f"{question_id}: no options")
+        if len(labels) != len(set(labels)):
+            errors.append(f"{question_id}: duplicate option labels")
+
+        for option in question.get('options', []):
+            if option.get('code') not in scores:
+                errors.append(f"{question_id}: option '{option.get('label')}' maps to unscored code '{option.get('code')}'")
+
+        for code, row in scores.items():
+            missing = [dosha for dosha in doshas if dosha not in row]
+            if missing:
+                errors.append(f"{question_id}: code '{code}' has no score for {', '.join(missing)}")
+            for dosha, value in row.items():
+                if not isinstance(value, int) or value < 0:
+                    errors.append(f"{question_id}: code '{code}' has invalid {dosha} score {value!r}")
+
+    if errors:
+        raise QuestionnaireError(
+            f"Invalid questionnaire {definition.get('version')!r}: " + '; '.join(errors)
+        )
+
+
+_compiled = {}
+_compiled_lock = threading.Lock()
+
+
+def weights_questionnaire_version(weights_version):
+    """Questionnaire version a stored weights version belongs to (None for legacy rows: the default)"""
+    return weights_version.split(':', 1)[0] if weights_version else None
+
+
+def available_versions():
+    """List questionnaire versions present in QUESTIONNAIRE_DIR"""
+    return sorted(
+        name[:-len('.json')] for name in os.listdir(QUESTIONNAIRE_DIR) if name.endswith('.json')
+    )
+
+
+def load_questionnaire(version=None):
+    """
+    Load, validate and compile a questionnaire version (cached per process).
+
+    Versions come from clients, so only the names of files in
+    QUESTIONNAIRE_DIR are accepted, never a path.
+
+    Args:
+        version: Questionnaire version; defaults to QUESTIONNAIRE_VERSION
+
+    Returns:
+        CompiledQuestionnaire
+
+    Raises:
+        QuestionnaireError: Unknown version, or a file that doesn't hold a valid definition
+    """
+    version = version or DEFAULT_QUESTIONNAIRE_VERSION
+    compiled = _compiled.get(version)
+    if compiled is not None:
+        return compiled
+
+    if not isinstance(version, str) or version not in available_versions():
+        raise QuestionnaireError(f"Unknown questionnaire version {version!r}")
+
+    with _compiled_lock:
+        if version not in _compiled:
+            path = os.path.join(QUESTIONNAIRE_DIR, f"{version}.json")
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    definition = json.load(f)
+            except (OSError, ValueError) as e:
+                raise QuestionnaireError(f"Cannot read questionnaire {version!r}: {e}") from None
+            if not isinstance(definition, dict):
+                raise QuestionnaireError(f"Questionnaire {version!r} is not a JSON object")
+            try:
+                validate_definition(definition)
+                if definition['version'] != version:
+                    raise QuestionnaireError(f"{path} declares version {definition['version']!r}")
+                compiled = CompiledQuestionnaire(definition)
+            except (KeyError, TypeError, AttributeError) as e:
+                raise QuestionnaireError(f"Invalid questionnaire {version!r}: {e!r}") from None
+            _compiled[version] = compiled
+    return _compiled[version]
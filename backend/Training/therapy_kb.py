@@ -0,0 +1,271 @@
+"""
+Therapy Knowledge Base
+Compiles the Panchakarma therapy catalogue into integer ids and bitset indexes
+"""
+import json
+import os
+import threading
+
+THERAPY_KB_PATH = os.getenv(
+    "THERAPY_KB_PATH",
+    os.path.join(os.path.dirname(__file__), 'therapies.json')
+)
+
+
+class KnowledgeBaseError(ValueError):
+    """Raised when a therapy knowledge base is inconsistent"""
+
+
+def _bits(ids):
+    mask = 0
+    for i in ids:
+        mask |= 1 << i
+    return mask
+
+
+def _set_bits(mask):
+    """Ids set in mask, lowest first, in O(set bits)"""
+    ids = []
+    while mask:
+        low = mask & -mask
+        ids.append(low.bit_length() - 1)
+        mask ^= low
+    return ids
+
+
+def _ordered(mask, orders, limit=None):
+    """Up to `limit` ids set in mask, following the given id sequences (first occurrence wins)"""
+    result = []
+    for order in orders:
+        for i in order:
+            if not mask or len(result) == limit:
+                return result
+            bit = 1 << i
+            if mask & bit:
+                result.append(i)
+                mask ^= bit
+    return result
+
+
+class TherapyKnowledgeBase:
+    """
+    A therapy catalogue compiled for bitwise queries.
+
+    Therapies and conditions get integer ids in file order. Each dosha has
+    primary and secondary indication bitsets plus a contraindication bitset,
+    and each condition has the bitset of therapies it rules out, so a dosha
+    mix is an OR of indications masked by the OR of contraindications.
+    Python ints serve as bitsets of any width. Per-dosha id sequences keep
+    the listed priority order for the therapies that survive the mask.
+    """
+
+    def __init__(self, definition):
+        self.version = definition['version']
+        self.description = definition.get('description', '')
+
+        self.therapies = [therapy['name'] for therapy in definition['therapies']]
+        self.therapy_ids = {name: i for i, name in enumerate(self.therapies)}
+        self.details = [
+            {key: value for key, value in therapy.items() if key not in ('name', 'contraindicated_conditions')}
+            for therapy in definition['therapies']
+        ]
+
+        self.conditions = list(definition.get('conditions', {}))
+        self.condition_ids = {name: i for i, name in enumerate(self.conditions)}
+        self.condition_labels = dict(definition.get('conditions', {}))
+        self.condition_contraindications = [0] * len(self.conditions)
+        for i, therapy in enumerate(definition['therapies']):
+            for condition in therapy.get('contraindicated_conditions', []):
+                self.condition_contraindications[self.condition_ids[condition]] |= 1 << i
+
+        self.doshas = list(definition['doshas'])
+        self.dosha_ids = {name: i for i, name in enumerate(self.doshas)}
+        self.primary_order = []
+        self.secondary_order = []
+        self.primary = []
+        self.secondary = []
+        self.contraindications = []
+        self.qualifiers = []  # per dosha: {therapy id: qualifier text}
+        self.profiles = []
+        for dosha in self.doshas:
+            entry = definition['doshas'][dosha]
+            primary = tuple(self.therapy_ids[name] for name in entry['primary'])
+            secondary = tuple(self.therapy_ids[name] for name in entry['secondary'])
+            contraindicated = {
+                self.therapy_ids[item['therapy']]: item.get('qualifier') for item in entry.get('contraindications', [])
+            }
+            self.primary_order.append(primary)
+            self.secondary_order.append(secondary)
+            self.primary.append(_bits(primary))
+            self.secondary.append(_bits(secondary))
+            self.contraindications.append(_bits(contraindicated))
+            self.qualifiers.append(contraindicated)
+            self.profiles.append({key: entry[key] for key in ('description', 'dietary', 'lifestyle') if key in entry})
+
+    def _dosha_ids(self, doshas):
+        try:
+            return [self.dosha_ids[dosha] for dosha in doshas]
+        except KeyError as e:
+            raise KnowledgeBaseError(f"Unknown dosha {e.args[0]!r}") from None
+
+    def _condition_ids(self, conditions):
+        try:
+            return [self.condition_ids[condition] for condition in conditions]
+        except KeyError as e:
+            raise KnowledgeBaseError(f"Unknown condition {e.args[0]!r}") from None
+
+    def names(self, ids):
+        return [self.therapies[i] for i in ids]
+
+    def contraindication_label(self, dosha_id, therapy_id):
+        """Display form of a dosha contraindication, e.g. 'Vamana (in excess)'"""
+        qualifier = self.qualifiers[dosha_id][therapy_id]
+        name = self.therapies[therapy_id]
+        return f"{name} ({qualifier})" if qualifier else name
+
+    def query(self, doshas, conditions=(), limit=None):
+        """
+        Therapies for a mix of doshas, minus everything contraindicated.
+
+        A contraindication applies to the therapy whatever its qualifier, so
+        'Vamana (in excess)' rules out Vamana.
+
+        Args:
+            doshas: Dosha names in priority order (dominant first)
+            conditions: Condition names the person has
+            limit: Keep at most this many primary and secondary therapies
+
+        Returns:
+            Dict with 'primary' and 'secondary' therapy names, and 'excluded'
+            listing each indicated therapy that was ruled out (in catalogue
+            order) with its reasons
+        """
+        dosha_ids = self._dosha_ids(doshas)
+        condition_ids = self._condition_ids(conditions)
+
+        primary = secondary = blocked = 0
+        for d in dosha_ids:
+            primary |= self.primary[d]
+            secondary |= self.secondary[d]
+            blocked |= self.contraindications[d]
+        for c in condition_ids:
+            blocked |= self.condition_contraindications[c]
+
+        primary_ids = _ordered(primary & ~blocked, [self.primary_order[d] for d in dosha_ids], limit)
+        secondary_ids = _ordered(secondary & ~blocked, [self.secondary_order[d] for d in dosha_ids], limit)
+        excluded_ids = _set_bits((primary | secondary) & blocked)
+        return {
+            'primary': self.names(primary_ids),
+            'secondary': self.names(secondary_ids),
+            'excluded': [
+                {'therapy': self.therapies[i], 'reasons': self.reasons(i, dosha_ids, condition_ids)}
+                for i in excluded_ids
+            ]
+        }
+
+    def reasons(self, therapy_id, dosha_ids, condition_ids):
+        """Why a therapy is contraindicated for the given doshas and conditions"""
+        bit = 1 << therapy_id
+        reasons = []
+        for d in dosha_ids:
+            if self.contraindications[d] & bit:
+                reason = {'dosha': self.doshas[d]}
+                if self.qualifiers[d][therapy_id]:
+                    reason['qualifier'] = self.qualifiers[d][therapy_id]
+                reasons.append(reason)
+        for c in condition_ids:
+            if self.condition_contraindications[c] & bit:
+                reasons.append({'condition': self.conditions[c], 'label': self.condition_labels[self.conditions[c]]})
+        return reasons
+
+    def therapy_details(self, name):
+        """Catalogue entry for a therapy with its name, or None if unknown"""
+        i = self.therapy_ids.get(name)
+        if i is None:
+            return None
+        return {**self.details[i], 'name': name}
+
+    def to_legacy_recommendations(self):
+        """Return the catalogue in the {dosha: {...}} PANCHAKARMA_RECOMMENDATIONS shape"""
+        return {
+            dosha: {
+                'primary': self.names(self.primary_order[d]),
+                'secondary': self.names(self.secondary_order[d]),
+                'contraindications': [self.contraindication_label(d, i) for i in self.qualifiers[d]],
+                **self.profiles[d]
+            }
+            for d, dosha in enumerate(self.doshas)
+        }
+
+    def catalogue(self):
+        """Therapies and conditions for clients building filters"""
+        return {
+            'version': self.version,
+            'therapies': [self.therapy_details(name) for name in self.therapies],
+            'conditions': [{'id': name, 'label': self.condition_labels[name]} for name in self.conditions],
+            'doshas': self.doshas
+        }
+
+
+def validate_definition(definition):
+    """Check a knowledge base definition for dangling references; raises KnowledgeBaseError"""
+    errors = []
+    if not definition.get('version'):
+        errors.append("missing 'version'")
+
+    names = [therapy.get('name') for therapy in definition.get('therapies', [])]
+    if not names:
+        errors.append("no therapies defined")
+    if len(names) != len(set(names)):
+        errors.append("duplicate therapy names")
+    known = set(names)
+
+    conditions = definition.get('conditions', {})
+    for therapy in definition.get('therapies', []):
+        for condition in therapy.get('contraindicated_conditions', []):
+            if condition not in conditions:
+                errors.append(f"{therapy.get('name')}: unknown condition '{condition}'")
+
+    if not definition.get('doshas'):
+        errors.append("missing 'doshas'")
+    for dosha, entry in definition.get('doshas', {}).items():
+        for key in ('primary', 'secondary'):
+            for name in entry.get(key, []):
+                if name not in known:
+                    errors.append(f"{dosha}: {key} therapy '{name}' is not in the catalogue")
+        for item in entry.get('contraindications', []):
+            if item.get('therapy') not in known:
+                errors.append(f"{dosha}: contraindicated therapy '{item.get('therapy')}' is not in the catalogue")
+
+    if errors:
+        raise KnowledgeBaseError(
+            f"Invalid therapy knowledge base {definition.get('version')!r}: " + '; '.join(errors)
+        )
+
+
+_compiled = {}
+_compiled_lock = threading.Lock()
+
+
+def load_knowledge_base(path=None):
+    """
+    Load, validate and compile a therapy knowledge base (cached per process).
+
+    Args:
+        path: Knowledge base JSON file; defaults to THERAPY_KB_PATH
+
+    Returns:
+        TherapyKnowledgeBase
+    """
+    path = path or THERAPY_KB_PATH
+    compiled = _compiled.get(path)
+    if compiled is not None:
+        return compiled
+
+    with _compiled_lock:
+        if path not in _compiled:
+            with open(path, 'r', encoding='utf-8') as f:
+                definition = json.load(f)
+            validate_definition(definition)
+            _compiled[path] = TherapyKnowledgeBase(definition)
+    return _compiled[path]
@@ -2,23 +2,93 @@
 AyurSutra - Main FastAPI Application
 Ayurvedic Dosha Detection & Panchakarma Recommendation Chatbot
 """
+import time
+
+IMPORT_STARTED = time.perf_counter()
+
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from database.database import engine, Base
-from routes import chat, assessment, pdf
+from database.database import engine, Base, replicas, DATABASE_REPLICA_SYNC_SECONDS
+from database.migrations import ensure_columns
+from database.search import ensure_search_index
+from database.retention import retention_loop, RETENTION_INTERVAL_HOURS
+from database.rescore import RESCORE_ON_STARTUP
+from routes import chat, assessment, pdf, messages, questionnaire, ingest, export, admin, therapies
+from utils.nlp_processor import load_nlp_resources
+from utils.startup import StartupState
+from utils.profiling import request_profiling_enabled, profile_request_middleware
+from utils.static_assets import FrontendAssets, SERVE_FRONTEND
+import asyncio
 import sys
 import os
 
 # Add backend directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+startup_state = StartupState(started_at=IMPORT_STARTED)
+
+# The built frontend is served from this process when SERVE_FRONTEND=1
+frontend = FrontendAssets() if SERVE_FRONTEND else None
+if frontend and not frontend.available():
+    print(f"Warning: SERVE_FRONTEND is set but {frontend.directory} has no index.html. Run `npm run build` first.")
+    frontend = None
+
+
+def load_outcome_table():
+    # Imported here so numpy loads during warmup rather than with the app
+    from Training.outcome_table import load_outcome_table
+    return load_outcome_table()
+
+
+def create_tables():
+    Base.metadata.create_all(bind=engine)
+    ensure_columns(engine, Base.metadata)
+    ensure_search_index(engine)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Independent resources warm up in parallel worker threads
+    steps = [
+        startup_state.run_step('database', create_tables),
+        startup_state.run_step('chatbot_model', chat.load_chatbot_models),
+        startup_state.run_step('nlp', load_nlp_resources),
+        startup_state.run_step('outcome_table', load_outcome_table),
+    ]
+    if frontend:
+        steps.append(startup_state.run_step('frontend', frontend.prepare))
+    await asyncio.gather(*steps)
+    if 'chatbot_model' not in startup_state.errors:
+        await startup_state.run_step('warmup_prediction', chat.warmup_prediction)
+    startup_state.mark_ready()
+
+    # Periodic archival and compaction is opt-in via RETENTION_INTERVAL_HOURS
+    background_tasks = []
+    if RETENTION_INTERVAL_HOURS > 0:
+        background_tasks.append(asyncio.create_task(retention_loop()))
+    # Local replica copies are refreshed and remote replica lag is measured periodically
+    if replicas.replicas:
+        background_tasks.append(asyncio.create_task(replicas.maintain(DATABASE_REPLICA_SYNC_SECONDS)))
+    # One timer-wheel task sends heartbeats and reaps dead or idle WebSockets
+    if chat.WS_HEARTBEAT_INTERVAL > 0:
+        background_tasks.append(asyncio.create_task(chat.manager.run_heartbeats()))
+    # Stored assessments scored with older weights are rescored once the app is serving
+    if RESCORE_ON_STARTUP:
+        background_tasks.append(admin.start_rescore())
+
+    yield
+
+    for task in background_tasks:
+        task.cancel()
+
 
 app = FastAPI(
     title="AyurSutra API",
     description="Ayurvedic Dosha Detection & Panchakarma Recommendation Chatbot",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -34,15 +104,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request profiling is opt-in (ADMIN_TOKEN and PROFILE_SAMPLE_RATE > 0)
+if request_profiling_enabled():
+    app.middleware("http")(profile_request_middleware)
+
 # Include routers
 app.include_router(chat.router)
 app.include_router(assessment.router)
 app.include_router(pdf.router)
+app.include_router(messages.router)
+app.include_router(questionnaire.router)
+app.include_router(therapies.router)
+app.include_router(ingest.router)
+app.include_router(export.router)
+app.include_router(admin.router)
 
 # ❌ REMOVE STATIC REPORTS DIRECTORY (NOT ALLOWED ON RENDER)
 # No app.mount("/reports") because we now store PDFs only in /tmp
 
-@app.get("/")
 async def root():
     return {
         "message": "Namaste! Welcome to AyurSutra API",
@@ -54,11 +133,32 @@ async def root():
         }
     }
 
+# With the frontend served, "/" belongs to the app
+if frontend is None:
+    app.get("/")(root)
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "websockets": chat.manager.connection_stats(),
+        "chatbot_models": chat.model_cache.stats()
+    }
+
+@app.get("/ready")
+async def readiness_check():
+    """Ready only once models are loaded and a warm-up prediction has run"""
+    report = startup_state.report()
+    if not startup_state.ready:
+        return JSONResponse(status_code=503, content={"status": "starting", **report})
+    return {"status": "ready", **report}
+
+# Mounted last so API routes take precedence over the SPA fallback
+if frontend:
+    app.mount("/", frontend, name="frontend")
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="127.0.0.1", port=8000)
+    # permessage-deflate is used whenever the client negotiates it
+    uvicorn.run(app, host="127.0.0.1", port=8000, ws_per_message_deflate=True)
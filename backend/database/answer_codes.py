@@ -0,0 +1,146 @@
+"""
+Packed Answer Codes
+Backfills and queries the bit-packed answer vector stored with each assessment
+"""
+import os
+import time
+
+from sqlalchemy import select, update, func, or_, and_, bindparam
+from database.database import engine as default_engine
+from database.models import Assessment
+from Training.questionnaire import (
+    load_questionnaire, weights_questionnaire_version, QuestionnaireError, DEFAULT_QUESTIONNAIRE_VERSION
+)
+
+ANSWER_CODE_CHUNK_SIZE = int(os.getenv("ANSWER_CODE_CHUNK_SIZE", "5000"))
+ANSWER_CODE_CHUNK_PAUSE = float(os.getenv("ANSWER_CODE_CHUNK_PAUSE", "0.05"))
+
+assessments = Assessment.__table__
+
+
+def questionnaire_rows(questionnaire):
+    """Rows scored with this questionnaire (legacy unstamped rows belong to the default one)"""
+    prefix = f"{questionnaire.version}:"
+    stamped = func.substr(assessments.c.weights_version, 1, len(prefix)) == prefix
+    if questionnaire.version == DEFAULT_QUESTIONNAIRE_VERSION:
+        return or_(assessments.c.weights_version.is_(None), stamped)
+    return stamped
+
+
+def parse_answer_filters(questionnaire, filters):
+    """
+    Resolve answer filters to integer codes.
+
+    Args:
+        filters: {question_id: answer label or code}
+
+    Returns:
+        {question_index: integer answer code}
+
+    Raises:
+        ValueError: For unknown questions or answers
+    """
+    answers = {}
+    for question_id, answer in filters.items():
+        i = questionnaire.question_index.get(question_id)
+        if i is None:
+            raise ValueError(f"unknown question '{question_id}'")
+        code = questionnaire.parse_answer(i, answer)
+        if code is None:
+            raise ValueError(f"invalid answer {answer!r} for '{question_id}'")
+        answers[i] = code
+    return answers
+
+
+def answer_filter(questionnaire, answers):
+    """
+    SQL condition for assessments that have all the given answers.
+
+    The packed code is tested with one bitmask, bounded by a range on the
+    indexed answer_code column; the range is tight when the filtered
+    questions come first in the questionnaire. Rows not yet backfilled
+    (answer_code NULL) do not match.
+
+    Args:
+        answers: {question_index: integer answer code}
+    """
+    if not questionnaire.packs_answers:
+        raise ValueError(f"Questionnaire {questionnaire.version!r} is too large for packed answer codes")
+    mask, value, low, high = questionnaire.answer_mask(answers)
+    column = assessments.c.answer_code
+    return and_(
+        questionnaire_rows(questionnaire),
+        column.between(low, high),
+        column.op('&')(mask) == value
+    )
+
+
+def backfill_answer_codes(chunk_size=None, pause=None, bind=None, max_chunks=None):
+    """
+    Fill answer_code for rows stored before it existed.
+
+    Rows are walked in primary-key order in chunks; each chunk is packed with
+    one vectorized call per questionnaire and written in a short transaction,
+    with a pause between chunks. Only rows still NULL are touched, so an
+    interrupted run simply continues on the next call.
+
+    Returns:
+        Dictionary with rows updated and rows skipped (no usable assessment_data)
+    """
+    chunk_size = chunk_size or ANSWER_CODE_CHUNK_SIZE
+    pause = ANSWER_CODE_CHUNK_PAUSE if pause is None else pause
+    bind = bind or default_engine
+
+    write = update(assessments).where(assessments.c.id == bindparam('row_id')).values(
+        answer_code=bindparam('answer_code')
+    )
+    counts = {'updated': 0, 'skipped': 0}
+    last_id = 0
+    chunks = 0
+    while max_chunks is None or chunks < max_chunks:
+        with bind.connect() as conn:
+            rows = conn.execute(
+                select(assessments.c.id, assessments.c.assessment_data, assessments.c.weights_version)
+                .where(assessments.c.answer_code.is_(None), assessments.c.id > last_id)
+                .order_by(assessments.c.id).limit(chunk_size)
+            ).mappings().all()
+        if not rows:
+            break
+
+        by_version = {}
+        for row in rows:
+            if isinstance(row['assessment_data'], dict):
+                by_version.setdefault(weights_questionnaire_version(row['weights_version']), []).append(row)
+            else:
+                counts['skipped'] += 1
+        params = []
+        for version, version_rows in by_version.items():
+            try:
+                questionnaire = load_questionnaire(version)
+            except QuestionnaireError:
+                questionnaire = None
+            if questionnaire is None or not questionnaire.packs_answers:
+                counts['skipped'] += len(version_rows)
+                continue
+            codes = questionnaire.pack_answers_batch(
+                [questionnaire.encode_answers(row['assessment_data']) for row in version_rows]
+            )
+            params.extend({'row_id': row['id'], 'answer_code': int(code)} for row, code in zip(version_rows, codes))
+        if params:
+            with bind.begin() as conn:
+                conn.execute(write, params)
+
+        counts['updated'] += len(params)
+        last_id = rows[-1]['id']
+        chunks += 1
+        if len(rows) < chunk_size:
+            break
+        if pause:
+            time.sleep(pause)
+
+    print(f"Answer code backfill: {counts}")
+    return counts
+
+
+if __name__ == "__main__":
+    backfill_answer_codes()
@@ -3,19 +3,41 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 from dotenv import load_dotenv
+from database.routing import RoutingSession, ReplicaSet
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./ayursutra.db")
 
+# Comma-separated read replica URLs; SQLite replicas of a SQLite primary are local
+# copies refreshed every DATABASE_REPLICA_SYNC_SECONDS
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+DATABASE_REPLICA_MAX_LAG = float(os.getenv("DATABASE_REPLICA_MAX_LAG", "2"))
+DATABASE_REPLICA_SYNC_SECONDS = float(os.getenv("DATABASE_REPLICA_SYNC_SECONDS", "10"))
+
 engine = create_engine(
     DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine)
+
+replicas = ReplicaSet(engine, SessionLocal, DATABASE_REPLICA_URLS, max_lag=DATABASE_REPLICA_MAX_LAG)
 
 Base = declarative_base()
 
+def read_session(consistency_key=None):
+    """
+    Session for read-only queries, served by a replica when one is caught up.
+
+    Args:
+        consistency_key: Session id whose own recent writes must be visible
+    """
+    return replicas.read_session(consistency_key)
+
+def record_write(consistency_key):
+    """Note a committed write so that key's reads stay on the primary until replicas catch up"""
+    replicas.record_write(consistency_key)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -23,3 +45,9 @@ def get_db():
     finally:
         db.close()
 
+def get_read_db():
+    db = read_session()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,41 @@
+"""
+Lightweight Schema Migrations
+Adds columns introduced after a database file was first created
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
+
+
+def ensure_columns(bind, metadata):
+    """
+    Add any model columns missing from existing tables.
+
+    `create_all` only creates missing tables, so databases created by an older
+    release keep their old column set. New columns are always nullable or
+    defaulted, so ALTER TABLE ADD COLUMN is enough.
+
+    Returns:
+        List of "table.column" names that were added
+    """
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+
+    with bind.begin() as conn:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_ddl = CreateColumn(column).compile(dialect=bind.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}"))
+                added.append(f"{table.name}.{column.name}")
+
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+    if added:
+        print(f"Added columns: {', '.join(added)}")
+    return added
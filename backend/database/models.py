@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, JSON
-from sqlalchemy.sql import func
+from sqlalchemy import Column, Index, Integer, BigInteger, String, Float, DateTime, Text, JSON, Boolean
+from sqlalchemy.sql import func, expression
 from database.database import Base
 
 class UserSession(Base):
@@ -21,7 +21,15 @@ class Assessment(Base):
     dominant_dosha = Column(String)
     secondary_dosha = Column(String)
     assessment_data = Column(JSON)
+    weights_version = Column(String, nullable=True, index=True)  # questionnaire version and score-table hash
+    answer_code = Column(BigInteger, nullable=True)  # answers bit-packed by the questionnaire layout
+    scorer = Column(String, nullable=True)  # classifier model version; NULL for the rule-based scorer
+    confirmed_dosha = Column(String, nullable=True)  # practitioner-confirmed prakriti, for classifier training
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())  # rescores and confirmations
+
+    # Covers answer filters, which also check the row's questionnaire
+    __table_args__ = (Index('ix_assessments_answer_code', 'answer_code', 'weights_version'),)
     
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
@@ -30,5 +38,8 @@ class ChatMessage(Base):
     session_id = Column(String, index=True)
     message = Column(Text)
     sender = Column(String)  # 'user' or 'bot'
+    intent = Column(String, nullable=True)  # predicted or confirmed intent tag
+    intent_confirmed = Column(Boolean, server_default=expression.false(), default=False)
+    intent_trained = Column(Boolean, server_default=expression.false(), default=False)  # learned by the online model
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
 
@@ -0,0 +1,253 @@
+"""
+Assessment Rescoring
+Recomputes stored assessment scores in the background after scoring weights change
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import select, update, func, or_, and_, bindparam
+from database.answer_codes import questionnaire_rows
+from database.database import engine as default_engine
+from database.models import Assessment
+from Training.prakritimodel import calculate_dosha_scores_batch
+from Training.questionnaire import load_questionnaire
+
+RESCORE_CHUNK_SIZE = int(os.getenv("RESCORE_CHUNK_SIZE", "5000"))
+# Fraction of wall time the job may spend working; it sleeps for the rest
+RESCORE_DUTY_CYCLE = float(os.getenv("RESCORE_DUTY_CYCLE", "0.5"))
+RESCORE_CHUNK_PAUSE = float(os.getenv("RESCORE_CHUNK_PAUSE", "0.05"))
+RESCORE_CHECKPOINT_DIR = os.getenv(
+    "RESCORE_CHECKPOINT_DIR", os.path.join(os.path.dirname(__file__), '..', 'checkpoints')
+)
+RESCORE_ON_STARTUP = os.getenv("RESCORE_ON_STARTUP", "0") == "1"
+
+assessments = Assessment.__table__
+
+# Progress of the current (or last) run in this process, for the admin endpoint
+rescore_status = {'state': 'idle'}
+_run_lock = threading.Lock()
+
+
+class RescoreRunning(RuntimeError):
+    """Raised when a rescore is started while another one is running"""
+
+
+def _stale_filter(questionnaire):
+    """
+    Rule-scored rows of this questionnaire scored with other weights.
+
+    Legacy unstamped rows belong to the default questionnaire; rows scored by
+    the prakriti classifier do not depend on the weights.
+    """
+    return and_(
+        questionnaire_rows(questionnaire),
+        assessments.c.scorer.is_(None),
+        or_(assessments.c.weights_version.is_(None),
+            assessments.c.weights_version != questionnaire.weights_version)
+    )
+
+
+def _checkpoint_path(checkpoint_dir, questionnaire):
+    return os.path.join(checkpoint_dir, f"rescore-{questionnaire.version}.json")
+
+
+def _read_checkpoint(path, weights_version):
+    """Resume state left by an interrupted run towards the same weights, or None"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return checkpoint if checkpoint.get('weights_version') == weights_version else None
+
+
+def _write_checkpoint(path, checkpoint):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def _rescore_chunk(questionnaire, rows):
+    """
+    Score a chunk of rows with one vectorized call.
+
+    Returns:
+        (updates, skipped) where updates are (row, dosha_results, answer_code) triples
+    """
+    scorable = [row for row in rows if isinstance(row['assessment_data'], dict)]
+    answers = [questionnaire.encode_answers(row['assessment_data']) for row in scorable]
+    results = calculate_dosha_scores_batch(answers, questionnaire.version)
+    # A weights change can also change the codes, and so the packed layout
+    codes = questionnaire.pack_answers_batch(answers) if scorable else None
+    codes = [None] * len(scorable) if codes is None else [int(code) for code in codes]
+    return list(zip(scorable, results, codes)), len(rows) - len(scorable)
+
+
+def rescore_assessments(questionnaire_version=None, dry_run=False, chunk_size=None, duty_cycle=None,
+                        pause=None, checkpoint_dir=None, bind=None, max_chunks=None, on_rescored=None):
+    """
+    Rescore stored assessments whose weights version is not the current one.
+
+    Rows are walked in primary-key order in chunks of `chunk_size`; each chunk
+    is read, scored in one vectorized batch, and written back with the new
+    weights version in a short transaction. After every chunk the last id and
+    running counts go to a checkpoint file, so an interrupted run resumes
+    where it stopped; the checkpoint is removed once the run completes. The
+    job sleeps between chunks so it works at most `duty_cycle` of the time.
+
+    A dry run writes nothing (and keeps no checkpoint) and reports how many
+    rows and distinct sessions would get a different dominant dosha.
+
+    Args:
+        questionnaire_version: Questionnaire whose rows to rescore (default if None)
+        dry_run: Only report what would change
+        chunk_size: Rows per chunk (defaults to RESCORE_CHUNK_SIZE)
+        duty_cycle: Fraction of time spent working (defaults to RESCORE_DUTY_CYCLE)
+        pause: Minimum seconds to sleep between chunks (defaults to RESCORE_CHUNK_PAUSE)
+        checkpoint_dir: Directory for checkpoint files (defaults to RESCORE_CHECKPOINT_DIR)
+        bind: SQLAlchemy engine (defaults to the application engine)
+        max_chunks: Optional cap on chunks processed in this call
+        on_rescored: Optional callable given the session ids of each chunk
+            written, e.g. to drop their cached responses (called from this thread)
+
+    Returns:
+        Dictionary with the final progress and counts
+    """
+    if not _run_lock.acquire(blocking=False):
+        raise RescoreRunning("A rescore is already running")
+    try:
+        return _rescore(questionnaire_version, dry_run, chunk_size, duty_cycle, pause,
+                        checkpoint_dir, bind, max_chunks, on_rescored)
+    except Exception as e:
+        rescore_status.update(state='failed', error=str(e))
+        raise
+    finally:
+        _run_lock.release()
+
+
+def _rescore(questionnaire_version, dry_run, chunk_size, duty_cycle, pause, checkpoint_dir, bind, max_chunks,
+             on_rescored):
+    questionnaire = load_questionnaire(questionnaire_version)
+    chunk_size = chunk_size or RESCORE_CHUNK_SIZE
+    duty_cycle = min(max(RESCORE_DUTY_CYCLE if duty_cycle is None else duty_cycle, 0.01), 1.0)
+    pause = RESCORE_CHUNK_PAUSE if pause is None else pause
+    bind = bind or default_engine
+    checkpoint_path = _checkpoint_path(checkpoint_dir or RESCORE_CHECKPOINT_DIR, questionnaire)
+    stale = _stale_filter(questionnaire)
+
+    checkpoint = None if dry_run else _read_checkpoint(checkpoint_path, questionnaire.weights_version)
+    counts = {'processed': 0, 'updated': 0, 'skipped': 0, 'dominant_changed': 0}
+    last_id = 0
+    if checkpoint:
+        last_id = checkpoint['last_id']
+        counts.update(checkpoint['counts'])
+    changed_sessions = set()
+    transitions = {}
+
+    with bind.connect() as conn:
+        remaining = conn.execute(
+            select(func.count()).select_from(assessments).where(stale, assessments.c.id > last_id)
+        ).scalar()
+    started = time.monotonic()
+    rescore_status.clear()
+    rescore_status.update(
+        state='running', dry_run=dry_run, questionnaire_version=questionnaire.version,
+        weights_version=questionnaire.weights_version, resumed_from_id=last_id or None,
+        total=counts['processed'] + remaining, last_id=last_id,
+        started_at=datetime.now(timezone.utc).isoformat(), **counts
+    )
+    print(f"Rescoring {remaining} assessments to {questionnaire.weights_version}"
+          + (" (dry run)" if dry_run else "") + (f", resuming after id {last_id}" if last_id else ""))
+
+    columns = (assessments.c.id, assessments.c.session_id, assessments.c.assessment_data,
+               assessments.c.dominant_dosha)
+    write = update(assessments).where(assessments.c.id == bindparam('row_id')).values(
+        vata_score=bindparam('vata_score'), pitta_score=bindparam('pitta_score'),
+        kapha_score=bindparam('kapha_score'), dominant_dosha=bindparam('dominant_dosha'),
+        secondary_dosha=bindparam('secondary_dosha'), weights_version=bindparam('weights_version'),
+        answer_code=bindparam('answer_code')
+    )
+
+    chunks = 0
+    while max_chunks is None or chunks < max_chunks:
+        chunk_started = time.monotonic()
+        with bind.connect() as conn:
+            rows = conn.execute(
+                select(*columns).where(stale, assessments.c.id > last_id)
+                .order_by(assessments.c.id).limit(chunk_size)
+            ).mappings().all()
+        if not rows:
+            break
+
+        updates, skipped = _rescore_chunk(questionnaire, rows)
+        params = []
+        for row, results, answer_code in updates:
+            if results['dominant_dosha'] != row['dominant_dosha']:
+                counts['dominant_changed'] += 1
+                changed_sessions.add(row['session_id'])
+                key = f"{row['dominant_dosha']}->{results['dominant_dosha']}"
+                transitions[key] = transitions.get(key, 0) + 1
+            params.append({
+                'row_id': row['id'],
+                'vata_score': results['percentages']['vata'],
+                'pitta_score': results['percentages']['pitta'],
+                'kapha_score': results['percentages']['kapha'],
+                'dominant_dosha': results['dominant_dosha'],
+                'secondary_dosha': results['secondary_dosha'],
+                'weights_version': questionnaire.weights_version,
+                'answer_code': answer_code
+            })
+        if params and not dry_run:
+            with bind.begin() as conn:
+                conn.execute(write, params)
+            if on_rescored:
+                on_rescored({row['session_id'] for row, _, _ in updates})
+
+        last_id = rows[-1]['id']
+        counts['processed'] += len(rows)
+        counts['skipped'] += skipped
+        if not dry_run:
+            counts['updated'] += len(params)
+            _write_checkpoint(checkpoint_path, {
+                'weights_version': questionnaire.weights_version, 'last_id': last_id, 'counts': counts
+            })
+
+        chunks += 1
+        elapsed = time.monotonic() - started
+        rescore_status.update(
+            last_id=last_id, rows_per_second=round(counts['processed'] / elapsed, 1) if elapsed else None,
+            changed_sessions=len(changed_sessions), transitions=dict(transitions), **counts
+        )
+        if len(rows) < chunk_size:
+            break
+        # Throttle to the duty cycle so live queries keep the database most of the time
+        work = time.monotonic() - chunk_started
+        time.sleep(max(pause, work * (1 - duty_cycle) / duty_cycle))
+
+    finished = max_chunks is None or chunks < max_chunks
+    if finished and not dry_run and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    rescore_status.update(
+        state='done' if finished else 'paused',
+        finished_at=datetime.now(timezone.utc).isoformat(),
+        seconds=round(time.monotonic() - started, 3)
+    )
+    print(f"Rescore {rescore_status['state']}: {counts}, {len(changed_sessions)} sessions changed dominant dosha")
+    return dict(rescore_status)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rescore stored assessments with the current weights")
+    parser.add_argument('--questionnaire', help="Questionnaire version (default: QUESTIONNAIRE_VERSION)")
+    parser.add_argument('--dry-run', action='store_true', help="Report changes without writing")
+    parser.add_argument('--chunk-size', type=int, default=None)
+    parser.add_argument('--duty-cycle', type=float, default=None)
+    args = parser.parse_args()
+    report = rescore_assessments(args.questionnaire, args.dry_run, args.chunk_size, args.duty_cycle)
+    print(json.dumps(report, indent=2))
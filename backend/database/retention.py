@@ -0,0 +1,354 @@
+"""
+Retention, Archival and Compaction
+Moves aged assessments and chat messages out of the live database into
+compressed, month-partitioned NDJSON archives and keeps the live tables compact
+"""
+import asyncio
+import bisect
+import gzip
+import io
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, delete, text
+from database.database import engine as default_engine
+from database.models import Assessment, ChatMessage
+from database.search import optimize_search_index
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, gzip is always available
+    zstandard = None
+
+RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", "365"))
+RETENTION_CHUNK_SIZE = int(os.getenv("RETENTION_CHUNK_SIZE", "500"))
+RETENTION_CHUNK_PAUSE = float(os.getenv("RETENTION_CHUNK_PAUSE", "0.05"))
+RETENTION_INTERVAL_HOURS = float(os.getenv("RETENTION_INTERVAL_HOURS", "0"))
+RETENTION_FULL_VACUUM_RATIO = float(os.getenv("RETENTION_FULL_VACUUM_RATIO", "0.25"))
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", os.path.join(os.path.dirname(__file__), '..', 'archive'))
+
+# Archived tables and the column that decides a row's age
+ARCHIVED_TABLES = {
+    'assessments': (Assessment.__table__, Assessment.__table__.c.created_at),
+    'chat_messages': (ChatMessage.__table__, ChatMessage.__table__.c.timestamp),
+}
+
+
+def _serialize(value):
+    """JSON encoder fallback for datetimes stored in archived rows"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _archive_extension():
+    return '.ndjson.zst' if zstandard else '.ndjson.gz'
+
+
+def _open_for_read(path):
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError(f"zstandard is required to read {path}")
+        raw = open(path, 'rb')
+        reader = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=True)
+        return io.TextIOWrapper(reader, encoding='utf-8')
+    return gzip.open(path, 'rt', encoding='utf-8')
+
+
+def _append_rows(archive_dir, table_name, rows_by_month):
+    """Append serialized rows to their month partitions and fsync them"""
+    table_dir = os.path.join(archive_dir, table_name)
+    os.makedirs(table_dir, exist_ok=True)
+
+    for month, lines in rows_by_month.items():
+        path = os.path.join(table_dir, f"{month}{_archive_extension()}")
+        payload = ''.join(lines).encode('utf-8')
+        if path.endswith('.zst'):
+            with open(path, 'ab') as raw:
+                raw.write(zstandard.ZstdCompressor(level=10).compress(payload))
+                raw.flush()
+                os.fsync(raw.fileno())
+        else:
+            with open(path, 'ab') as raw:
+                with gzip.GzipFile(fileobj=raw, mode='ab', compresslevel=6) as gz:
+                    gz.write(payload)
+                raw.flush()
+                os.fsync(raw.fileno())
+
+
+def _cutoff(days):
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    # SQLite stores naive UTC timestamps from func.now()
+    return cutoff.replace(tzinfo=None)
+
+
+def archive_table(table_name, days=None, chunk_size=None, archive_dir=None,
+                  bind=None, pause=None, max_chunks=None):
+    """
+    Move rows older than `days` from a live table into its archive.
+
+    Rows are processed in chunks of `chunk_size` rows: the chunk is read and
+    the read transaction ends, then it is compressed, appended and fsynced to
+    the archive, and finally deleted by primary key in a short transaction.
+    No transaction is open while archiving, so writers are only held off by
+    the delete of one chunk, and the loop sleeps
+    `pause` seconds between chunks so live inserts are not starved. A crash
+    between the append and the delete can only duplicate rows in the archive,
+    which ArchiveReader drops by id.
+
+    Args:
+        table_name: One of ARCHIVED_TABLES
+        days: Age threshold in days (defaults to RETENTION_DAYS)
+        chunk_size: Rows per transaction (defaults to RETENTION_CHUNK_SIZE)
+        archive_dir: Archive root directory (defaults to ARCHIVE_DIR)
+        bind: SQLAlchemy engine (defaults to the application engine)
+        pause: Seconds to sleep between chunks
+        max_chunks: Optional cap on chunks processed in this call
+
+    Returns:
+        Number of rows archived
+    """
+    table, age_column = ARCHIVED_TABLES[table_name]
+    days = RETENTION_DAYS if days is None else days
+    chunk_size = chunk_size or RETENTION_CHUNK_SIZE
+    archive_dir = archive_dir or ARCHIVE_DIR
+    bind = bind or default_engine
+    pause = RETENTION_CHUNK_PAUSE if pause is None else pause
+
+    cutoff = _cutoff(days)
+    archived = 0
+    chunks = 0
+
+    while max_chunks is None or chunks < max_chunks:
+        with bind.connect() as conn:
+            rows = conn.execute(
+                select(table)
+                .where(age_column < cutoff)
+                .order_by(table.c.id)
+                .limit(chunk_size)
+            ).mappings().all()
+
+        if not rows:
+            break
+
+        rows_by_month = {}
+        for row in rows:
+            record = dict(row)
+            stamp = record[age_column.name]
+            month = stamp.strftime('%Y-%m') if stamp else 'undated'
+            rows_by_month.setdefault(month, []).append(
+                json.dumps(record, default=_serialize, ensure_ascii=False) + '\n'
+            )
+
+        _append_rows(archive_dir, table_name, rows_by_month)
+
+        ids = [row['id'] for row in rows]
+        with bind.begin() as conn:
+            conn.execute(delete(table).where(table.c.id.in_(ids)))
+
+        archived += len(rows)
+        chunks += 1
+        if len(rows) < chunk_size:
+            break
+        if pause:
+            time.sleep(pause)
+
+    return archived
+
+
+def compact_database(bind=None, full_vacuum_ratio=None):
+    """
+    Refresh planner statistics and reclaim free pages in the live database.
+
+    On SQLite, ANALYZE always runs. Free pages are released with
+    `PRAGMA incremental_vacuum` when the file uses incremental auto-vacuum;
+    otherwise a full VACUUM (which takes an exclusive lock) only runs once the
+    free-page ratio exceeds `full_vacuum_ratio`. PostgreSQL gets
+    `VACUUM ANALYZE` and MySQL `OPTIMIZE TABLE` per archived table; other
+    databases are left to their own maintenance.
+
+    Returns:
+        Dictionary describing the work done
+    """
+    bind = bind or default_engine
+    full_vacuum_ratio = RETENTION_FULL_VACUUM_RATIO if full_vacuum_ratio is None else full_vacuum_ratio
+    report = {'analyzed': False, 'vacuum': None, 'search_index_optimized': False}
+
+    dialect = bind.dialect.name
+    if dialect != 'sqlite':
+        statements = {'postgresql': ('VACUUM ANALYZE', 'vacuum_analyze'),
+                      'mysql': ('OPTIMIZE TABLE', 'optimize_table'),
+                      'mariadb': ('OPTIMIZE TABLE', 'optimize_table')}
+        if dialect not in statements:
+            print(f"Warning: no compaction for {dialect} databases; skipping")
+            return report
+        statement, vacuum = statements[dialect]
+        with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            for table_name in ARCHIVED_TABLES:
+                conn.execute(text(f"{statement} {table_name}"))
+        report.update(analyzed=True, vacuum=vacuum)
+        return report
+
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("ANALYZE"))
+        report['analyzed'] = True
+        report['search_index_optimized'] = optimize_search_index(conn)
+
+        page_count = conn.execute(text("PRAGMA page_count")).scalar() or 0
+        freelist = conn.execute(text("PRAGMA freelist_count")).scalar() or 0
+        auto_vacuum = conn.execute(text("PRAGMA auto_vacuum")).scalar()
+        report['free_pages'] = freelist
+        report['page_count'] = page_count
+
+        if not freelist:
+            return report
+
+        if auto_vacuum == 2:
+            # Release free pages in small steps so no single lock is long
+            while conn.execute(text("PRAGMA freelist_count")).scalar():
+                conn.execute(text("PRAGMA incremental_vacuum(256)"))
+            report['vacuum'] = 'incremental'
+        elif page_count and freelist / page_count >= full_vacuum_ratio:
+            conn.execute(text("VACUUM"))
+            report['vacuum'] = 'full'
+
+    return report
+
+
+def run_retention(days=None, archive_dir=None, bind=None):
+    """Archive every retained table, then compact the live database"""
+    archived = {
+        table_name: archive_table(table_name, days=days, archive_dir=archive_dir, bind=bind)
+        for table_name in ARCHIVED_TABLES
+    }
+    compaction = compact_database(bind=bind)
+    print(f"Retention run archived {archived}, compaction {compaction}")
+    return {'archived': archived, 'compaction': compaction}
+
+
+async def retention_loop(interval_hours=None):
+    """Run retention periodically in a worker thread"""
+    interval_hours = interval_hours or RETENTION_INTERVAL_HOURS
+    while True:
+        try:
+            await asyncio.to_thread(run_retention)
+        except Exception as e:
+            print(f"Retention run failed: {e}")
+        await asyncio.sleep(interval_hours * 3600)
+
+
+class _IdRanges:
+    """
+    Set of integer ids stored as sorted, disjoint [first, last] runs.
+
+    Archived ids are mostly consecutive, so a partition's ids take a handful
+    of runs instead of one set entry per row.
+    """
+
+    def __init__(self):
+        self.firsts = []
+        self.lasts = []
+
+    def add(self, id_):
+        """Add an id; returns False if it was already present"""
+        # Ids usually arrive in ascending order, so try the last run first
+        if not self.firsts or id_ > self.lasts[-1]:
+            k = len(self.firsts)
+        else:
+            k = bisect.bisect_right(self.firsts, id_)
+            if k and id_ <= self.lasts[k - 1]:
+                return False
+
+        joins_left = k > 0 and self.lasts[k - 1] == id_ - 1
+        joins_right = k < len(self.firsts) and self.firsts[k] == id_ + 1
+        if joins_left and joins_right:
+            self.lasts[k - 1] = self.lasts[k]
+            del self.firsts[k], self.lasts[k]
+        elif joins_left:
+            self.lasts[k - 1] = id_
+        elif joins_right:
+            self.firsts[k] = id_
+        else:
+            self.firsts.insert(k, id_)
+            self.lasts.insert(k, id_)
+        return True
+
+
+class ArchiveReader:
+    """
+    Read-only access to archived rows.
+
+    Partitions are selected by month from the requested time range, and rows
+    duplicated by an interrupted archive run are yielded once.
+    """
+
+    def __init__(self, archive_dir=None):
+        self.archive_dir = archive_dir or ARCHIVE_DIR
+
+    def partitions(self, table_name, start=None, end=None):
+        """List partition files for a table overlapping [start, end]"""
+        table_dir = os.path.join(self.archive_dir, table_name)
+        if not os.path.isdir(table_dir):
+            return []
+
+        start_month = start.strftime('%Y-%m') if start else None
+        end_month = end.strftime('%Y-%m') if end else None
+        paths = []
+        for name in sorted(os.listdir(table_dir)):
+            month = name.split('.', 1)[0]
+            if month != 'undated':
+                if start_month and month < start_month:
+                    continue
+                if end_month and month > end_month:
+                    continue
+            paths.append(os.path.join(table_dir, name))
+        return paths
+
+    def iter_rows(self, table_name, start=None, end=None, session_id=None):
+        """
+        Iterate archived rows of a table.
+
+        Args:
+            table_name: One of ARCHIVED_TABLES
+            start: Optional inclusive lower bound on the row timestamp
+            end: Optional exclusive upper bound on the row timestamp
+            session_id: Optional session filter
+
+        Yields:
+            Row dictionaries as they were stored in the live table
+        """
+        _, age_column = ARCHIVED_TABLES[table_name]
+        start_iso = start.isoformat() if start else None
+        end_iso = end.isoformat() if end else None
+
+        for path in self.partitions(table_name, start, end):
+            seen = _IdRanges()
+            with _open_for_read(path) as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    row = json.loads(line)
+                    if not seen.add(row['id']):
+                        continue
+
+                    if session_id is not None and row.get('session_id') != session_id:
+                        continue
+                    stamp = row.get(age_column.name)
+                    if start_iso and (stamp is None or stamp < start_iso):
+                        continue
+                    if end_iso and (stamp is None or stamp >= end_iso):
+                        continue
+                    yield row
+
+    def get_session(self, session_id):
+        """Return all archived assessments and chat messages for a session"""
+        return {
+            table_name: list(self.iter_rows(table_name, session_id=session_id))
+            for table_name in ARCHIVED_TABLES
+        }
+
+
+if __name__ == "__main__":
+    run_retention()
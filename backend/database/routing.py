@@ -0,0 +1,187 @@
+"""
+Read/Write Routing
+Sends writes to the primary and read-only sessions to caught-up replicas
+"""
+import asyncio
+import itertools
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+
+class RoutingSession(Session):
+    """
+    Session that can read from a replica but always writes to the primary.
+
+    A session is bound to a replica only when created through
+    ReplicaSet.read_session(). DML statements and ORM flushes go to the
+    primary, and once a session has flushed it stays on the primary so it
+    reads its own writes (e.g. db.refresh after commit).
+    """
+
+    def __init__(self, *args, replica=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replica = replica
+        self.pinned_to_primary = False
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        primary = super().get_bind(mapper=mapper, clause=clause, **kwargs)
+        if self.replica is None or self.pinned_to_primary:
+            return primary
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.pinned_to_primary = True
+            return primary
+        return self.replica.engine
+
+
+class Replica:
+    """
+    One read replica and how far it is known to be caught up.
+
+    `caught_up_to` is a wall-clock time: every write committed on the primary
+    before it is visible on the replica. Locally synced SQLite copies know it
+    exactly (the start of their last sync); PostgreSQL standbys measure it
+    from the replay timestamp; anything else assumes `max_lag`.
+    """
+
+    def __init__(self, url, max_lag, local_sync=False):
+        self.url = url
+        self.max_lag = max_lag
+        self.local_sync = local_sync
+        self.engine = create_engine(url, connect_args={"check_same_thread": False} if url.startswith("sqlite") else {})
+        self.synced_at = None
+        self.measured_lag = None
+
+    @property
+    def caught_up_to(self):
+        if self.local_sync:
+            return self.synced_at or 0.0
+        lag = self.max_lag if self.measured_lag is None else self.measured_lag
+        return time.time() - lag
+
+    def status(self):
+        return {
+            'url': self.engine.url.render_as_string(hide_password=True),
+            'local_sync': self.local_sync,
+            'lag_seconds': round(max(0.0, time.time() - self.caught_up_to), 3)
+        }
+
+
+class ReplicaSet:
+    """
+    Replica selection with read-your-writes for recently written keys.
+
+    Writers call record_write(key) (a chat/assessment session id); a read
+    session for that key only uses a replica caught up past the write and
+    falls back to the primary otherwise.
+    """
+
+    def __init__(self, primary_engine, session_factory, replica_urls, max_lag=2.0, write_window=300.0):
+        """
+        Args:
+            primary_engine: Engine all writes go to
+            session_factory: sessionmaker producing RoutingSession bound to the primary
+            replica_urls: Database URLs of the read replicas
+            max_lag: Assumed lag (seconds) of replicas whose lag can't be measured
+            write_window: How long writes are remembered; replicas further behind are skipped
+        """
+        self.primary = primary_engine
+        self.session_factory = session_factory
+        self.write_window = write_window
+        primary_is_sqlite = primary_engine.url.get_backend_name() == 'sqlite'
+        self.replicas = [
+            Replica(url, max_lag, local_sync=primary_is_sqlite and url.startswith('sqlite'))
+            for url in replica_urls
+        ]
+        self._round_robin = itertools.count()
+        self._writes = OrderedDict()
+        self._writes_lock = threading.Lock()
+        self.primary_fallbacks = 0
+
+    def record_write(self, key, at=None):
+        """Remember that `key` was written just now (call after commit)"""
+        if not self.replicas or key is None:
+            return
+        at = time.time() if at is None else at
+        with self._writes_lock:
+            self._writes[key] = at
+            self._writes.move_to_end(key)
+            horizon = at - self.write_window
+            while self._writes and next(iter(self._writes.values())) < horizon:
+                self._writes.popitem(last=False)
+
+    def last_write(self, key):
+        with self._writes_lock:
+            return self._writes.get(key)
+
+    def choose(self, key=None):
+        """
+        Pick a replica for a read, or None for the primary.
+
+        Replicas must be caught up past the key's last write (read-your-writes)
+        and within the write window (older writes are no longer tracked).
+        """
+        if not self.replicas:
+            return None
+        required = max(self.last_write(key) or 0.0, time.time() - self.write_window)
+        eligible = [replica for replica in self.replicas if replica.caught_up_to >= required]
+        if not eligible:
+            self.primary_fallbacks += 1
+            return None
+        return eligible[next(self._round_robin) % len(eligible)]
+
+    def read_session(self, key=None):
+        """Session for read-only work, on a caught-up replica when one is available"""
+        return self.session_factory(replica=self.choose(key))
+
+    def sync_local_replicas(self):
+        """Copy the SQLite primary into each local replica file with the online backup API"""
+        for replica in self.replicas:
+            if not replica.local_sync:
+                continue
+            started = time.time()
+            source = sqlite3.connect(self.primary.url.database)
+            target = sqlite3.connect(replica.engine.url.database, timeout=30)
+            try:
+                # One step: the replica file switches to the new copy atomically
+                source.backup(target)
+            finally:
+                target.close()
+                source.close()
+            replica.synced_at = started
+
+    def measure_lag(self):
+        """Refresh measured lag for PostgreSQL standbys"""
+        for replica in self.replicas:
+            if replica.local_sync or replica.engine.url.get_backend_name() != 'postgresql':
+                continue
+            try:
+                with replica.engine.connect() as connection:
+                    lag = connection.execute(text(
+                        "SELECT EXTRACT(EPOCH FROM (now() - pg_last_xact_replay_timestamp()))"
+                    )).scalar()
+                replica.measured_lag = None if lag is None else max(0.0, float(lag))
+            except Exception as e:
+                replica.measured_lag = None
+                print(f"Replica lag check failed for {replica.status()['url']}: {e}")
+
+    async def maintain(self, interval):
+        """Periodically sync local replicas and measure remote replica lag"""
+        while True:
+            try:
+                await asyncio.to_thread(self.sync_local_replicas)
+                await asyncio.to_thread(self.measure_lag)
+            except Exception as e:
+                print(f"Replica maintenance failed: {e}")
+            await asyncio.sleep(interval)
+
+    def status(self):
+        return {
+            'replicas': [replica.status() for replica in self.replicas],
+            'primary_fallbacks': self.primary_fallbacks,
+            'tracked_writes': len(self._writes)
+        }
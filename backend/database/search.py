@@ -0,0 +1,194 @@
+"""
+Chat Transcript Search
+Full-text index over chat_messages and ranked, paginated queries against it
+"""
+import re
+from sqlalchemy import text, bindparam, DateTime
+
+# SQLite keeps an external-content FTS5 table in step with chat_messages via
+# triggers, so the text is stored once and the index holds only postings.
+# session_id is indexed too (with zero rank weight) so a session filter
+# intersects postings instead of ranking every match of a common word.
+# Mark categories keep Devanagari vowel signs inside their words.
+FTS_TABLE = 'chat_messages_fts'
+
+SQLITE_INDEX_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        message, session_id, content='chat_messages', content_rowid='id',
+        tokenize="unicode61 remove_diacritics 2 categories 'L* N* Co M*'"
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS chat_messages_fts_insert AFTER INSERT ON chat_messages BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, message, session_id) VALUES (new.id, new.message, new.session_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS chat_messages_fts_delete AFTER DELETE ON chat_messages BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, message, session_id)
+        VALUES ('delete', old.id, old.message, old.session_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS chat_messages_fts_update AFTER UPDATE OF message, session_id ON chat_messages BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, message, session_id)
+        VALUES ('delete', old.id, old.message, old.session_id);
+        INSERT INTO {FTS_TABLE}(rowid, message, session_id) VALUES (new.id, new.message, new.session_id);
+    END""",
+]
+SQLITE_RANK = 'bm25(1.0, 0.0)'
+
+# PostgreSQL uses an expression GIN index; queries repeat the same expression
+POSTGRES_DOCUMENT = "to_tsvector('simple', coalesce(m.message, ''))"
+POSTGRES_INDEX_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_chat_messages_message_fts ON chat_messages "
+    "USING GIN (to_tsvector('simple', coalesce(message, '')))",
+]
+
+SORT_ORDERS = ('rank', 'newest')
+SNIPPET_START = '<mark>'
+SNIPPET_END = '</mark>'
+
+_TERM = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def ensure_search_index(bind):
+    """
+    Create the full-text index and its sync triggers if missing.
+
+    A newly created SQLite index is filled from the existing messages once.
+
+    Returns:
+        True if the index was created by this call
+    """
+    if bind.dialect.name == 'sqlite':
+        with bind.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': FTS_TABLE}
+            ).first()
+            for statement in SQLITE_INDEX_DDL:
+                conn.execute(text(statement))
+            if not exists:
+                conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('rank', :rank)"),
+                             {'rank': SQLITE_RANK})
+                conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+        if not exists:
+            print(f"Created full-text index {FTS_TABLE}")
+        return not exists
+
+    if bind.dialect.name == 'postgresql':
+        with bind.begin() as conn:
+            for statement in POSTGRES_INDEX_DDL:
+                conn.execute(text(statement))
+        return False
+
+    print(f"Warning: full-text search is not supported on {bind.dialect.name}")
+    return False
+
+
+def optimize_search_index(conn):
+    """Merge the SQLite index's segments into one (run during compaction)"""
+    exists = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': FTS_TABLE}
+    ).first()
+    if exists:
+        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"))
+    return bool(exists)
+
+
+def fts_query(query):
+    """
+    Turn user input into a safe FTS5 query.
+
+    Quoted text is matched as a phrase, other words must all appear, and a
+    trailing * on a word matches it as a prefix. FTS5 operators in the input
+    are treated as plain words.
+
+    Returns:
+        The FTS5 query string, or None if the input has no terms
+    """
+    terms = []
+    for phrase, word in _TERM.findall(query):
+        prefix = bool(word) and word.endswith('*')
+        term = (phrase or word.rstrip('*')).strip()
+        if term:
+            terms.append(_fts_phrase(term) + ('*' if prefix else ''))
+    return f"message : ({' '.join(terms)})" if terms else None
+
+
+def _fts_phrase(value):
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _filters(session_id, sender, start, end):
+    clauses, params = [], {}
+    if session_id:
+        clauses.append("m.session_id = :session_id")
+        params['session_id'] = session_id
+    if sender:
+        clauses.append("m.sender = :sender")
+        params['sender'] = sender
+    if start:
+        clauses.append("m.timestamp >= :start")
+        params['start'] = start
+    if end:
+        clauses.append("m.timestamp < :end")
+        params['end'] = end
+    return ''.join(f" AND {clause}" for clause in clauses), params
+
+
+def search_messages(db, query, session_id=None, sender=None, start=None, end=None,
+                    sort='rank', limit=20, offset=0):
+    """
+    Find chat messages matching a full-text query.
+
+    Args:
+        db: Database session
+        query: Search text (see fts_query for the syntax)
+        session_id: Only messages from this chat session
+        sender: Only 'user' or 'bot' messages
+        start: Only messages at or after this time
+        end: Only messages before this time
+        sort: 'rank' (best match first) or 'newest'
+        limit: Page size
+        offset: Matches to skip
+
+    Returns:
+        (rows, has_more) where rows are dicts with id, session_id, sender,
+        intent, timestamp, message, snippet and score (higher is better)
+    """
+    filters, params = _filters(session_id, sender, start, end)
+    params.update(limit=limit + 1, offset=offset)
+
+    if db.get_bind().dialect.name == 'postgresql':
+        params['query'] = query
+        order = "score DESC, m.id DESC" if sort == 'rank' else "m.id DESC"
+        statement = f"""
+            SELECT m.id, m.session_id, m.sender, m.intent, m.timestamp, m.message,
+                   ts_headline('simple', m.message, q, 'StartSel={SNIPPET_START}, StopSel={SNIPPET_END}, MaxFragments=1') AS snippet,
+                   ts_rank_cd({POSTGRES_DOCUMENT}, q) AS score
+            FROM chat_messages m, websearch_to_tsquery('simple', :query) q
+            WHERE {POSTGRES_DOCUMENT} @@ q{filters}
+            ORDER BY {order}
+            LIMIT :limit OFFSET :offset
+        """
+    else:
+        params['query'] = fts_query(query)
+        if params['query'] is None:
+            return [], False
+        if session_id and re.search(r'\w', session_id):
+            # Narrows the match to the session's tokens; the join filter stays exact
+            params['query'] += f" AND session_id : {_fts_phrase(session_id)}"
+        # FTS5 walks its postings in rowid order, so "newest" stops after one page
+        order = f"{FTS_TABLE}.rank" if sort == 'rank' else f"{FTS_TABLE}.rowid DESC"
+        statement = f"""
+            SELECT m.id, m.session_id, m.sender, m.intent, m.timestamp, m.message,
+                   snippet({FTS_TABLE}, 0, '{SNIPPET_START}', '{SNIPPET_END}', '…', 16) AS snippet,
+                   -{FTS_TABLE}.rank AS score
+            FROM {FTS_TABLE} JOIN chat_messages m ON m.id = {FTS_TABLE}.rowid
+            WHERE {FTS_TABLE} MATCH :query{filters}
+            ORDER BY {order}
+            LIMIT :limit OFFSET :offset
+        """
+
+    statement = text(statement)
+    for name in ('start', 'end'):
+        if name in params:
+            statement = statement.bindparams(bindparam(name, type_=DateTime(timezone=True)))
+    statement = statement.columns(timestamp=DateTime(timezone=True))
+    rows = [dict(row._mapping) for row in db.execute(statement, params)]
+    return rows[:limit], len(rows) > limit
@@ -0,0 +1,504 @@
+"""
+Recorded Traffic Replay
+Extracts anonymized conversations from chat_messages, replays them against the
+app over WebSockets and compares latency and responses between runs
+
+    python replay.py extract -o replay.ndjson.gz --since 2025-01-01
+    python replay.py run replay.ndjson.gz --speed 10 -o results.json
+    python replay.py compare baseline.json results.json
+"""
+import argparse
+import asyncio
+import gzip
+import heapq
+import json
+import os
+import re
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+REPLAY_FORMAT = 'ayursutra-replay'
+REPLAY_VERSION = 1
+RESULTS_FORMAT = 'ayursutra-replay-results'
+
+# Think time between a user's messages is capped so idle sessions don't stall a run
+DEFAULT_MAX_GAP = 30.0
+DEFAULT_REPLY_TIMEOUT = 10.0
+DEFAULT_MAX_CONCURRENCY = 200
+PERCENTILES = (50, 90, 95, 99)
+
+# Personal data is replaced by placeholders of the same kind, so messages keep
+# their shape (length, word count) without identifying anyone
+ANONYMIZERS = [
+    (re.compile(r'\b[\w.+-]+@[\w-]+\.[\w.-]+\b'), '<email>'),
+    (re.compile(r'\b(?:https?://|www\.)\S+', re.IGNORECASE), '<url>'),
+    (re.compile(r'(?<!\w)\+?\d[\d\s-]{7,}\d\b'), '<phone>'),
+    (re.compile(r'\b\d{5,}\b'), '<number>'),
+    (re.compile(r"(?i:\b(my name is|call me)\s+)[\w'-]+(?:\s+[A-Z][\w'-]*)?"), r'\1 <name>'),
+]
+
+
+def anonymize(text):
+    """Replace emails, URLs, phone numbers, long numbers and introduced names"""
+    for pattern, replacement in ANONYMIZERS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+# ---------------------------------------------------------------- extraction
+
+def _iter_user_messages(since=None, until=None, batch_size=1000):
+    """Yield (session_id, timestamp, message) for user messages, grouped by session in order"""
+    from sqlalchemy import select
+    from database.database import read_session
+    from database.models import ChatMessage
+
+    db = read_session()
+    try:
+        query = select(ChatMessage.session_id, ChatMessage.timestamp, ChatMessage.message).where(
+            ChatMessage.sender == 'user'
+        )
+        if since:
+            query = query.where(ChatMessage.timestamp >= since)
+        if until:
+            query = query.where(ChatMessage.timestamp < until)
+        query = query.order_by(ChatMessage.session_id, ChatMessage.id).execution_options(yield_per=batch_size)
+        for row in db.execute(query):
+            yield row.session_id, row.timestamp, row.message
+    finally:
+        db.close()
+
+
+def _group_sessions(rows, min_messages=1):
+    session_id, messages = None, []
+    for row_session, timestamp, message in rows:
+        if row_session != session_id:
+            if len(messages) >= min_messages:
+                yield messages
+            session_id, messages = row_session, []
+        if message and message.strip():
+            messages.append((timestamp, message))
+    if len(messages) >= min_messages:
+        yield messages
+
+
+def extract(output, since=None, until=None, max_sessions=None, min_messages=1):
+    """
+    Write user conversations from chat_messages as an anonymized replay file.
+
+    The file is gzipped NDJSON: a header line, then one line per session with
+    its start offset from the earliest session (`t`, seconds) and its messages
+    as [seconds since the session's first message, text] pairs. Session ids
+    are replaced by sequence numbers. With max_sessions, the sessions that
+    started earliest are kept, so the file is one contiguous stretch of
+    traffic from `since` rather than whichever session ids sort first.
+
+    Returns:
+        The header written
+    """
+    def replay_session(messages):
+        started = messages[0][0]
+        return started, [
+            [round((timestamp - started).total_seconds(), 3) if timestamp and started else 0.0, anonymize(message)]
+            for timestamp, message in messages
+        ]
+
+    def start_time(session):
+        return session[0] or datetime.min
+
+    # Rows arrive grouped by session id, which says nothing about when a session
+    # ran, so the cut-off is applied by start time over every session
+    sessions = map(replay_session, _group_sessions(_iter_user_messages(since, until), min_messages))
+    if max_sessions:
+        sessions = heapq.nsmallest(max_sessions, sessions, key=start_time)
+    else:
+        sessions = sorted(sessions, key=start_time)
+    first = next((started for started, _ in sessions if started), None)
+    last = max((started for started, _ in sessions if started), default=None)
+    header = {
+        'format': REPLAY_FORMAT,
+        'version': REPLAY_VERSION,
+        'created_at': datetime.now().isoformat(),
+        'sessions': len(sessions),
+        'messages': sum(len(messages) for _, messages in sessions),
+        'start': first.isoformat() if first else None,
+        'end': last.isoformat() if last else None,
+    }
+
+    with gzip.open(output, 'wt', encoding='utf-8') as f:
+        f.write(json.dumps(header) + '\n')
+        for number, (started, messages) in enumerate(sessions, 1):
+            offset = round((started - first).total_seconds(), 3) if started and first else 0.0
+            f.write(json.dumps({'s': number, 't': offset, 'm': messages}, ensure_ascii=False,
+                               separators=(',', ':')) + '\n')
+    print(f"Extracted {header['sessions']} sessions, {header['messages']} messages to {output}")
+    return header
+
+
+def load_replay(path):
+    """Read a replay file; returns (header, sessions)"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+        if header.get('format') != REPLAY_FORMAT:
+            raise ValueError(f"{path} is not a replay file")
+        if header.get('version') != REPLAY_VERSION:
+            raise ValueError(f"Unsupported replay file version {header.get('version')}")
+        sessions = [json.loads(line) for line in f if line.strip()]
+    return header, sessions
+
+
+# ------------------------------------------------------------------- replay
+
+def _intent_responses():
+    """Map every intent response text to its tag, so random response choice still compares equal"""
+    from Training.botmodel import available_languages, load_intents
+    tags = {}
+    for language in available_languages():
+        for intent in load_intents(language)['intents']:
+            for response in intent['responses']:
+                tags[response] = intent['tag']
+    return tags
+
+
+def response_key(frame, intent_responses):
+    """
+    What a reply means, independent of wording chosen at random.
+
+    Questions compare by question id, results by dominant dosha and intent
+    replies by intent tag; other messages compare by text.
+    """
+    frame_type = frame.get('type')
+    if frame_type == 'question':
+        return f"question:{frame.get('question_id')}"
+    if frame_type == 'assessment_complete':
+        return f"assessment_complete:{(frame.get('dosha_results') or {}).get('dominant_dosha')}"
+    if frame_type == 'message':
+        text = frame.get('text', '')
+        tag = intent_responses.get(text)
+        return f"intent:{tag}" if tag else f"message:{text}"
+    return str(frame_type)
+
+
+async def _next_reply(ws, timeout):
+    """Wait for the next reply frame, answering heartbeats and skipping typing indicators"""
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise asyncio.TimeoutError
+        frame = json.loads(await asyncio.wait_for(ws.recv(), remaining))
+        if frame.get('type') == 'ping':
+            await ws.send(json.dumps({'type': 'pong'}))
+        elif frame.get('type') != 'typing':
+            return frame
+
+
+async def _replay_session(session, url, run_id, started, speed, max_gap, reply_timeout,
+                          semaphore, intent_responses, results):
+    import websockets
+
+    await asyncio.sleep(max(0.0, started + session['t'] / speed - time.monotonic()))
+    async with semaphore:
+        uri = f"{url}/ws/chat?session_id={run_id}-{session['s']}"
+        try:
+            async with websockets.connect(uri, max_size=None) as ws:
+                await _next_reply(ws, reply_timeout)  # welcome
+                previous = session['m'][0][0]
+                for index, (offset, message) in enumerate(session['m']):
+                    await asyncio.sleep(min(max(offset - previous, 0.0), max_gap) / speed)
+                    previous = offset
+                    sent = time.perf_counter()
+                    await ws.send(json.dumps({'message': message}))
+                    try:
+                        frame = await _next_reply(ws, reply_timeout)
+                    except asyncio.TimeoutError:
+                        results[f"{session['s']}:{index}"] = [None, 'no_reply']
+                        continue
+                    latency_ms = round((time.perf_counter() - sent) * 1000, 3)
+                    results[f"{session['s']}:{index}"] = [latency_ms, response_key(frame, intent_responses)]
+        except Exception as e:
+            for index in range(len(session['m'])):
+                results.setdefault(f"{session['s']}:{index}", [None, f"error:{type(e).__name__}"])
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def summarize(results, duration):
+    """Latency distribution and outcome counts for a run"""
+    latencies = sorted(latency for latency, _ in results.values() if latency is not None)
+    failures = {}
+    for latency, key in results.values():
+        if latency is None:
+            failures[key] = failures.get(key, 0) + 1
+    summary = {
+        'messages': len(results),
+        'replied': len(latencies),
+        'failures': failures,
+        'duration_seconds': round(duration, 3),
+        'throughput_per_second': round(len(latencies) / duration, 2) if duration else None,
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies), 3) if latencies else None,
+            **{f"p{pct}": _percentile(latencies, pct) for pct in PERCENTILES},
+            'max': latencies[-1] if latencies else None,
+        }
+    }
+    return summary
+
+
+async def replay(path, url, speed=1.0, max_gap=DEFAULT_MAX_GAP, reply_timeout=DEFAULT_REPLY_TIMEOUT,
+                 max_sessions=None, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+    """
+    Replay a recorded file against a running app.
+
+    Sessions start at their recorded offsets and each sends its messages in
+    order, waiting for the reply to one before the next; `speed` divides every
+    wait (10 replays ten times faster, so ten times the arrival rate).
+
+    Returns:
+        Results dict with the run's settings, summary and per-message
+        [latency_ms, response_key] keyed "<session>:<index>"
+    """
+    header, sessions = load_replay(path)
+    if max_sessions:
+        sessions = sessions[:max_sessions]
+    intent_responses = _intent_responses()
+    run_id = f"replay{int(time.time())}"
+    results = {}
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    print(f"Replaying {len(sessions)} sessions against {url} at {speed}x")
+    started = time.monotonic()
+    await asyncio.gather(*(
+        _replay_session(session, url, run_id, started, speed, max_gap, reply_timeout,
+                        semaphore, intent_responses, results)
+        for session in sessions
+    ))
+    duration = time.monotonic() - started
+
+    return {
+        'format': RESULTS_FORMAT,
+        'created_at': datetime.now().isoformat(),
+        'replay_file': os.path.abspath(path),
+        'replay_created_at': header.get('created_at'),
+        'settings': {'speed': speed, 'max_gap': max_gap, 'reply_timeout': reply_timeout,
+                     'sessions': len(sessions), 'url': url},
+        'summary': summarize(results, duration),
+        'responses': results
+    }
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workdir, pacing=False, ready_timeout=120):
+    """
+    Start the app with uvicorn on a free local port and a scratch database.
+
+    Returns:
+        (process, base WebSocket URL, server log path)
+    """
+    port = _free_port()
+    log_path = os.path.join(workdir, 'server.log')
+    env = {
+        **os.environ,
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'replay.db')}",
+        'DATABASE_REPLICA_URLS': '',
+        'CHAT_PACING': '1' if pacing else '0',
+        'STARTUP_METRICS_PATH': os.path.join(workdir, 'startup_metrics.jsonl'),
+        'TRACE_LOG_PATH': os.path.join(workdir, 'traces.jsonl'),
+    }
+    log = open(log_path, 'w')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'app:app', '--host', '127.0.0.1', '--port', str(port)],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    log.close()
+
+    deadline = time.monotonic() + ready_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited during startup, see {log_path}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/ready", timeout=2) as response:
+                if response.status == 200:
+                    return process, f"ws://127.0.0.1:{port}", log_path
+        except OSError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"Server was not ready within {ready_timeout}s, see {log_path}")
+
+
+def stop_server(process):
+    process.send_signal(signal.SIGINT)
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+# --------------------------------------------------------------- comparison
+
+def load_results(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        results = json.load(f)
+    if results.get('format') != RESULTS_FORMAT:
+        raise ValueError(f"{path} is not a replay results file")
+    return results
+
+
+def compare(baseline, current, max_regression=0.10, max_mismatch_rate=0.0, examples=10):
+    """
+    Compare a run with a baseline run of the same replay file.
+
+    Fails when any latency percentile grew by more than `max_regression`
+    (a fraction), or when more than `max_mismatch_rate` of the messages both
+    runs answered got a different response.
+
+    Returns:
+        Report dict with 'passed'
+    """
+    latency = {}
+    regressions = []
+    for name, before in baseline['summary']['latency_ms'].items():
+        after = current['summary']['latency_ms'].get(name)
+        change = (after - before) / before if before and after is not None else None
+        latency[name] = {'baseline': before, 'current': after,
+                         'change': round(change, 4) if change is not None else None}
+        if name != 'max' and change is not None and change > max_regression:
+            regressions.append(name)
+
+    shared = set(baseline['responses']) & set(current['responses'])
+    mismatches = sorted(
+        (key for key in shared if baseline['responses'][key][1] != current['responses'][key][1]),
+        key=lambda key: tuple(int(part) for part in key.split(':'))
+    )
+    mismatch_rate = len(mismatches) / len(shared) if shared else 0.0
+
+    return {
+        'latency_ms': latency,
+        'latency_regressions': regressions,
+        'compared_messages': len(shared),
+        'only_in_baseline': len(set(baseline['responses']) - shared),
+        'only_in_current': len(set(current['responses']) - shared),
+        'mismatches': len(mismatches),
+        'mismatch_rate': round(mismatch_rate, 6),
+        'mismatch_examples': [
+            {'message': key, 'baseline': baseline['responses'][key][1], 'current': current['responses'][key][1]}
+            for key in mismatches[:examples]
+        ],
+        'passed': not regressions and mismatch_rate <= max_mismatch_rate
+    }
+
+
+def print_report(report):
+    print(f"{'latency (ms)':<14}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, row in report['latency_ms'].items():
+        change = f"{row['change']:+.1%}" if row['change'] is not None else '-'
+        flag = '  <-- regression' if name in report['latency_regressions'] else ''
+        print(f"{name:<14}{row['baseline'] or '-':>12}{row['current'] or '-':>12}{change:>10}{flag}")
+    print(f"\nResponses compared: {report['compared_messages']}, mismatched: {report['mismatches']} "
+          f"({report['mismatch_rate']:.2%})")
+    for example in report['mismatch_examples']:
+        print(f"  {example['message']}: {example['baseline']} -> {example['current']}")
+    print("\nPASSED" if report['passed'] else "\nFAILED")
+
+
+# ---------------------------------------------------------------------- CLI
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record, replay and compare real chat traffic")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    extract_parser = commands.add_parser('extract', help="Write anonymized conversations to a replay file")
+    extract_parser.add_argument('-o', '--output', default='replay.ndjson.gz')
+    extract_parser.add_argument('--since', type=datetime.fromisoformat)
+    extract_parser.add_argument('--until', type=datetime.fromisoformat)
+    extract_parser.add_argument('--max-sessions', type=int, help="Keep the sessions that started first")
+    extract_parser.add_argument('--min-messages', type=int, default=1)
+
+    run_parser = commands.add_parser('run', help="Replay a file against the app")
+    run_parser.add_argument('replay_file')
+    run_parser.add_argument('-o', '--output', default=None, help="Results file (default: replay-results-<time>.json)")
+    run_parser.add_argument('--url', help="Running app's WebSocket base URL; omitted starts a local app")
+    run_parser.add_argument('--speed', type=float, default=1.0, help="Time scale; 10 replays 10x faster")
+    run_parser.add_argument('--max-gap', type=float, default=DEFAULT_MAX_GAP,
+                            help="Longest pause between a session's messages, in recorded seconds")
+    run_parser.add_argument('--reply-timeout', type=float, default=DEFAULT_REPLY_TIMEOUT)
+    run_parser.add_argument('--max-sessions', type=int)
+    run_parser.add_argument('--max-concurrency', type=int, default=DEFAULT_MAX_CONCURRENCY)
+    run_parser.add_argument('--pacing', action='store_true', help="Keep the bot's typing pauses in latencies")
+    run_parser.add_argument('--baseline', help="Results file to compare against after the run")
+    run_parser.add_argument('--max-regression', type=float, default=0.10)
+    run_parser.add_argument('--max-mismatch-rate', type=float, default=0.0)
+
+    compare_parser = commands.add_parser('compare', help="Compare two results files")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--max-regression', type=float, default=0.10,
+                                help="Allowed relative growth of any latency percentile")
+    compare_parser.add_argument('--max-mismatch-rate', type=float, default=0.0,
+                                help="Allowed fraction of changed responses")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'extract':
+        extract(args.output, args.since, args.until, args.max_sessions, args.min_messages)
+        return 0
+
+    if args.command == 'compare':
+        report = compare(load_results(args.baseline), load_results(args.current),
+                         args.max_regression, args.max_mismatch_rate)
+        print_report(report)
+        return 0 if report['passed'] else 1
+
+    # The scratch database and server log are kept if the run fails
+    process = None
+    workdir = tempfile.mkdtemp(prefix='replay-')
+    url = args.url
+    if not url:
+        process, url, log_path = start_server(workdir, pacing=args.pacing)
+        print(f"Started app at {url} (log: {log_path})")
+    try:
+        results = asyncio.run(replay(
+            args.replay_file, url, speed=args.speed, max_gap=args.max_gap,
+            reply_timeout=args.reply_timeout, max_sessions=args.max_sessions,
+            max_concurrency=args.max_concurrency
+        ))
+    finally:
+        if process:
+            stop_server(process)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or f"replay-results-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False)
+    print(json.dumps(results['summary'], indent=2))
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        report = compare(load_results(args.baseline), results, args.max_regression, args.max_mismatch_rate)
+        print_report(report)
+        return 0 if report['passed'] else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""
+Admin Endpoints
+On-demand CPU profiles and memory snapshots for diagnosing a live process,
+and background rescoring of stored assessments
+"""
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+from database.rescore import rescore_assessments, rescore_status, RescoreRunning
+from routes.assessment import assessment_cache
+from routes.chat import manager
+from Training.questionnaire import load_questionnaire, QuestionnaireError
+from utils.admin_auth import require_admin
+from utils.profiling import (
+    PROFILE_INTERVAL_MS, PROFILE_MAX_SECONDS,
+    profile_cpu, request_profiles, memory_tracker
+)
+
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+
+@router.post("/profile/cpu", response_class=PlainTextResponse)
+async def cpu_profile(seconds: float = 10, interval_ms: float = PROFILE_INTERVAL_MS):
+    """
+    Sample every thread (event loop and thread pool) for N seconds.
+
+    Returns folded stacks ("thread;frame;frame count" per line) that
+    flamegraph.pl, speedscope or inferno render directly.
+    """
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be in (0, {PROFILE_MAX_SECONDS}]")
+    if interval_ms < 1:
+        raise HTTPException(status_code=400, detail="interval_ms must be at least 1")
+
+    # Runs in a worker thread so the event loop keeps serving (and being sampled)
+    profiler = await asyncio.to_thread(profile_cpu, seconds, interval_ms / 1000)
+    if profiler is None:
+        raise HTTPException(status_code=409, detail="A CPU profile is already running")
+    return PlainTextResponse(profiler.folded(), headers={'X-Profile-Samples': str(profiler.samples)})
+
+
+@router.get("/profile/requests")
+async def list_request_profiles():
+    """Recent per-request profiles captured via the X-Profile header"""
+    return {'profiles': request_profiles.summaries()}
+
+
+@router.get("/profile/requests/{profile_id}", response_class=PlainTextResponse)
+async def get_request_profile(profile_id: int):
+    profile = request_profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile['folded']
+
+
+@router.post("/memory/start")
+async def start_memory_tracing(frames: int = 10):
+    """Start tracemalloc (it slows allocations, so it only runs on request)"""
+    return memory_tracker.start(frames)
+
+
+@router.post("/memory/stop")
+async def stop_memory_tracing():
+    return memory_tracker.stop()
+
+
+@router.get("/memory")
+async def memory_status():
+    """tracemalloc totals plus the sizes of long-lived in-process registries"""
+    return {
+        **memory_tracker.status(),
+        'registries': {
+            'active_connections': len(manager.active_connections),
+            'user_sessions': len(manager.user_sessions)
+        }
+    }
+
+
+@router.post("/memory/snapshot")
+async def memory_snapshot(limit: int = 20):
+    try:
+        snapshot = await asyncio.to_thread(memory_tracker.snapshot, limit)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    snapshot['user_sessions'] = len(manager.user_sessions)
+    return snapshot
+
+
+@router.get("/memory/diff")
+async def memory_diff(base: int, current: int, limit: int = 20, key_type: str = 'lineno'):
+    """Allocation growth between two snapshots, largest first"""
+    if key_type not in ('lineno', 'filename', 'traceback'):
+        raise HTTPException(status_code=400, detail="key_type must be lineno, filename or traceback")
+    try:
+        stats = await asyncio.to_thread(memory_tracker.diff, base, current, limit, key_type)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return {'base': base, 'current': current, 'stats': stats}
+
+
+_rescore_tasks: set = set()
+
+
+def _invalidate_assessments(session_ids):
+    for session_id in session_ids:
+        assessment_cache.invalidate(session_id)
+
+
+async def run_rescore(**kwargs):
+    """Run a rescore in a worker thread; failures are logged and kept in rescore_status"""
+    loop = asyncio.get_running_loop()
+
+    def on_rescored(session_ids):
+        # The response cache belongs to the event loop; chunks are written from the worker thread
+        loop.call_soon_threadsafe(_invalidate_assessments, session_ids)
+
+    try:
+        await asyncio.to_thread(rescore_assessments, on_rescored=on_rescored, **kwargs)
+    except RescoreRunning:
+        pass
+    except Exception as e:
+        print(f"Rescore failed: {e}")
+
+
+def start_rescore(**kwargs):
+    task = asyncio.create_task(run_rescore(**kwargs))
+    _rescore_tasks.add(task)
+    task.add_done_callback(_rescore_tasks.discard)
+    return task
+
+
+@router.post("/rescore", status_code=202)
+async def start_rescore_job(questionnaire_version: Optional[str] = None, dry_run: bool = False,
+                            chunk_size: Optional[int] = None, duty_cycle: Optional[float] = None):
+    """
+    Start rescoring stored assessments with the current weights in the background.
+
+    A dry run only reports how many assessments and sessions would get a
+    different dominant dosha. Poll GET /admin/rescore for progress.
+    """
+    if rescore_status.get('state') == 'running':
+        raise HTTPException(status_code=409, detail="A rescore is already running")
+    if chunk_size is not None and chunk_size < 1:
+        raise HTTPException(status_code=400, detail="chunk_size must be positive")
+    if duty_cycle is not None and not 0 < duty_cycle <= 1:
+        raise HTTPException(status_code=400, detail="duty_cycle must be in (0, 1]")
+    try:
+        questionnaire = load_questionnaire(questionnaire_version)
+    except QuestionnaireError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    rescore_status.clear()
+    rescore_status.update(state='running', dry_run=dry_run, questionnaire_version=questionnaire.version)
+    start_rescore(questionnaire_version=questionnaire.version, dry_run=dry_run,
+                  chunk_size=chunk_size, duty_cycle=duty_cycle)
+    return rescore_status
+
+
+@router.get("/rescore")
+async def rescore_progress():
+    """Progress of the running (or last) rescore in this process"""
+    return rescore_status
@@ -2,20 +2,41 @@
 Assessment API Endpoints
 Handles dosha assessment and results retrieval
 """
-from fastapi import APIRouter, Depends, HTTPException
+import hashlib
+import json
+import os
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
-from database.database import get_db
+from database.database import get_db, read_session, record_write
 from database.models import Assessment
-from Training.prakritimodel import calculate_dosha_scores
 from Training.panchakarma_model import get_panchakarma_recommendations
+from Training.questionnaire import load_questionnaire, weights_questionnaire_version, QuestionnaireError
+from utils.admin_auth import require_admin
+from utils.response_cache import ResponseCache
 from pydantic import BaseModel
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 router = APIRouter()
 
+ASSESSMENT_CACHE_TTL = float(os.getenv("ASSESSMENT_CACHE_TTL", "300"))
+ASSESSMENT_CACHE_MAX_ENTRIES = int(os.getenv("ASSESSMENT_CACHE_MAX_ENTRIES", "10000"))
+# 'rules' (weighted questionnaire) or 'classifier' (trained on confirmed assessments)
+PRAKRITI_SCORER = os.getenv("PRAKRITI_SCORER", "rules")
+SCORERS = ('rules', 'classifier')
+
+# Serialized GET /api/assessment/{session_id} responses, keyed by session id
+assessment_cache = ResponseCache(ASSESSMENT_CACHE_TTL, ASSESSMENT_CACHE_MAX_ENTRIES)
+
 class AssessmentRequest(BaseModel):
     session_id: str
     assessment_data: Dict[str, Any]
+    questionnaire_version: Optional[str] = None
+    scorer: Optional[str] = None  # defaults to PRAKRITI_SCORER
+
+class PrakritiLabel(BaseModel):
+    dosha: str
 
 class AssessmentResponse(BaseModel):
     dosha_results: Dict[str, Any]
@@ -24,12 +45,31 @@ class AssessmentResponse(BaseModel):
 @router.post("/api/assessment/calculate", response_model=AssessmentResponse)
 async def calculate_assessment(request: AssessmentRequest, db: Session = Depends(get_db)):
     """Calculate dosha scores and get recommendations"""
+    # Both bring in numpy, which importing the app shouldn't
+    from Training.outcome_table import score_assessment, load_outcome_table
+    from Training.prakriti_classifier import load_prakriti_classifier
+
+    scorer = request.scorer or PRAKRITI_SCORER
+    if scorer not in SCORERS:
+        raise HTTPException(status_code=400, detail=f"scorer must be one of {', '.join(SCORERS)}")
     try:
-        # Calculate dosha results
-        dosha_results = calculate_dosha_scores(request.assessment_data)
-        
-        # Get Panchakarma recommendations
-        panchakarma_recs = get_panchakarma_recommendations(dosha_results)
+        questionnaire = load_questionnaire(request.questionnaire_version)
+        model_version = None
+        if scorer == 'classifier':
+            classifier = load_prakriti_classifier(questionnaire.version)
+            if classifier is None:
+                raise HTTPException(
+                    status_code=503,
+                    detail=f"No prakriti classifier trained for questionnaire {questionnaire.version}"
+                )
+            dosha_results = classifier.classify(request.assessment_data)
+            model_version = classifier.model_version
+            table = load_outcome_table(questionnaire.version)
+            panchakarma_recs = table.recommendations_for(dosha_results) if table \
+                else get_panchakarma_recommendations(dosha_results)
+        else:
+            # Dosha results and Panchakarma recommendations (precomputed for every answer combination)
+            dosha_results, panchakarma_recs = score_assessment(request.assessment_data, questionnaire.version)
         
         # Save to database
         assessment = Assessment(
@@ -39,49 +79,154 @@ async def calculate_assessment(request: AssessmentRequest, db: Session = Depends
             kapha_score=dosha_results['percentages']['kapha'],
             dominant_dosha=dosha_results['dominant_dosha'],
             secondary_dosha=dosha_results.get('secondary_dosha'),
-            assessment_data=request.assessment_data
+            assessment_data=request.assessment_data,
+            weights_version=questionnaire.weights_version,
+            answer_code=questionnaire.pack_answers(questionnaire.encode_answers(request.assessment_data)),
+            scorer=model_version
         )
         db.add(assessment)
         db.commit()
         db.refresh(assessment)
+        record_write(request.session_id)
+        assessment_cache.invalidate(request.session_id)
         
         return AssessmentResponse(
             dosha_results=dosha_results,
             panchakarma_recs=panchakarma_recs
         )
+    except HTTPException:
+        raise
+    except QuestionnaireError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/api/assessment/{session_id}")
-async def get_assessment(session_id: str, db: Session = Depends(get_db)):
-    """Retrieve assessment results by session ID"""
-    assessment = db.query(Assessment).filter(Assessment.session_id == session_id).order_by(Assessment.created_at.desc()).first()
-    
+@router.put("/api/assessment/{session_id}/prakriti", dependencies=[Depends(require_admin)])
+async def confirm_prakriti(session_id: str, label: PrakritiLabel, db: Session = Depends(get_db)):
+    """Record the practitioner-confirmed prakriti of a session's latest assessment for classifier training"""
+    assessment = db.query(Assessment).filter(
+        Assessment.session_id == session_id
+    ).order_by(Assessment.created_at.desc(), Assessment.id.desc()).first()
+
     if not assessment:
         raise HTTPException(status_code=404, detail="Assessment not found")
-    
-    # Recalculate recommendations
-    panchakarma_recs = get_panchakarma_recommendations({
-        'dominant_dosha': assessment.dominant_dosha,
-        'secondary_dosha': assessment.secondary_dosha,
+    try:
+        doshas = load_questionnaire(weights_questionnaire_version(assessment.weights_version)).doshas
+    except QuestionnaireError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    dosha = label.dosha.strip().lower()
+    if dosha not in doshas:
+        raise HTTPException(status_code=400, detail=f"dosha must be one of {', '.join(doshas)}")
+
+    assessment.confirmed_dosha = dosha
+    db.commit()
+    record_write(session_id)
+
+    return {'id': assessment.id, 'session_id': session_id, 'confirmed_dosha': dosha}
+
+def _load_assessment_response(session_id):
+    """
+    Build the cached response for a session's latest assessment.
+
+    Returns:
+        Dictionary with the JSON body bytes, ETag and Last-Modified values,
+        or None if the session has no assessment
+    """
+    # A replica serves this unless the session wrote more recently than it has caught up
+    db = read_session(session_id)
+    try:
+        assessment = db.query(Assessment).filter(
+            Assessment.session_id == session_id
+        ).order_by(Assessment.created_at.desc(), Assessment.id.desc()).first()
+    finally:
+        db.close()
+
+    if not assessment:
+        return None
+
+    dosha_results = {
         'percentages': {
             'vata': assessment.vata_score,
             'pitta': assessment.pitta_score,
             'kapha': assessment.kapha_score
-        }
-    })
-    
-    return {
-        'dosha_results': {
-            'percentages': {
-                'vata': assessment.vata_score,
-                'pitta': assessment.pitta_score,
-                'kapha': assessment.kapha_score
-            },
-            'dominant_dosha': assessment.dominant_dosha,
-            'secondary_dosha': assessment.secondary_dosha
         },
+        'dominant_dosha': assessment.dominant_dosha,
+        'secondary_dosha': assessment.secondary_dosha
+    }
+    # Rule-scored rows from older weights are rescored until the background job reaches them
+    rescored_on_read = False
+    try:
+        questionnaire = load_questionnaire(weights_questionnaire_version(assessment.weights_version))
+    except QuestionnaireError:
+        questionnaire = None
+    if questionnaire and assessment.scorer is None and assessment.weights_version != questionnaire.weights_version \
+            and isinstance(assessment.assessment_data, dict):
+        from Training.outcome_table import score_assessment
+        rescored, _ = score_assessment(assessment.assessment_data, questionnaire.version)
+        dosha_results = {key: rescored[key] for key in dosha_results}
+        rescored_on_read = True
+
+    # Recalculate recommendations
+    panchakarma_recs = get_panchakarma_recommendations(dosha_results)
+
+    body = {
+        'dosha_results': dosha_results,
         'panchakarma_recs': panchakarma_recs,
         'created_at': assessment.created_at.isoformat()
     }
 
+    # A row rewritten by a rescore was modified when it was rewritten, not when it was created.
+    # A body rescored on read has no stored modification time, so it gets no Last-Modified.
+    # SQLite hands back naive timestamps; they are stored as UTC
+    last_modified = None
+    if not rescored_on_read:
+        last_modified = assessment.updated_at or assessment.created_at
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        last_modified = last_modified.astimezone(timezone.utc).replace(microsecond=0)
+
+    # The tag follows the body, which changes when the row is rescored or the weights change
+    body = json.dumps(body, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return {
+        'body': body,
+        'etag': f'"{assessment.id}-{hashlib.sha256(body).hexdigest()[:16]}"',
+        'last_modified': last_modified
+    }
+
+
+def _not_modified(request: Request, cached):
+    """Evaluate If-None-Match (preferred) or If-Modified-Since against the cached entry"""
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or cached['etag'] in tags or f"W/{cached['etag']}" in tags
+
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since and cached['last_modified'] is not None:
+        try:
+            return cached['last_modified'] <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+@router.get("/api/assessment/{session_id}")
+async def get_assessment(session_id: str, request: Request):
+    """
+    Retrieve assessment results by session ID.
+
+    Responses are cached per session for ASSESSMENT_CACHE_TTL seconds and
+    concurrent misses share one database read. Clients revalidating with
+    If-None-Match / If-Modified-Since get 304 while the result is unchanged.
+    """
+    cached = await assessment_cache.get_or_load(session_id, lambda: _load_assessment_response(session_id))
+
+    if cached is None:
+        raise HTTPException(status_code=404, detail="Assessment not found")
+
+    headers = {'ETag': cached['etag'], 'Cache-Control': 'private, no-cache'}
+    if cached['last_modified'] is not None:
+        headers['Last-Modified'] = format_datetime(cached['last_modified'], usegmt=True)
+    if _not_modified(request, cached):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached['body'], media_type='application/json', headers=headers)
@@ -3,13 +3,26 @@ WebSocket Chat Endpoint
 Handles real-time conversation with AyurSutra Bot
 """
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-import json
 import pickle
 import os
+import random
 import asyncio
+import time
 from datetime import datetime
+from database.database import SessionLocal, record_write
+from database.models import ChatMessage
 from utils.nlp_processor import clean_text, match_intent, extract_dosha_keywords
-from Training.prakritimodel import calculate_dosha_scores
+from utils.keyword_matcher import AnswerMatcher
+from utils.chat_protocol import (
+    negotiate_subprotocol, hello_frame, error_frame, encode_compact, decode_compact, decode_json, is_pong,
+    ProtocolError
+)
+from utils.timer_wheel import TimerWheel
+from utils.language import detect_language, DEFAULT_LANGUAGE, SUPPORTED_LANGUAGES
+from utils.model_cache import ModelCache
+from utils.tracing import tracer, span, current_trace_id
+from Training.prakritimodel import summarize_scores
+from Training.questionnaire import load_questionnaire, QuestionnaireError, UNANSWERED
 from Training.panchakarma_model import get_panchakarma_recommendations
 
 router = APIRouter()
@@ -19,166 +32,423 @@ models_dir = os.path.join(os.path.dirname(__file__), '..', 'Models')
 chatbot_model = None
 intents_data = None
 
-try:
-    with open(os.path.join(models_dir, 'chatbot_model.pkl'), 'rb') as f:
-        chatbot_model = pickle.load(f)
-    with open(os.path.join(models_dir, 'intents.pkl'), 'rb') as f:
-        intents_data = pickle.load(f)
-except:
-    print("Warning: Chatbot models not found. Please train models first.")
-
-# Assessment questions flow
-ASSESSMENT_QUESTIONS = [
-    {
-        'id': 'body_frame',
-        'question': "What best describes your body frame?",
-        'options': ['Thin and light', 'Medium build', 'Heavy and large'],
-        'context': 'physical'
-    },
-    {
-        'id': 'skin_type',
-        'question': "How would you describe your skin?",
-        'options': ['Dry and rough', 'Oily and sensitive', 'Smooth and oily', 'Normal'],
-        'context': 'physical'
-    },
-    {
-        'id': 'hair_texture',
-        'question': "What is your hair texture like?",
-        'options': ['Thin and dry', 'Fine and oily', 'Thick and oily', 'Normal'],
-        'context': 'physical'
-    },
-    {
-        'id': 'appetite',
-        'question': "How would you describe your appetite?",
-        'options': ['Irregular and variable', 'Strong and regular', 'Moderate and steady'],
-        'context': 'digestive'
-    },
-    {
-        'id': 'digestion',
-        'question': "How is your digestion?",
-        'options': ['Irregular', 'Strong and fast', 'Slow'],
-        'context': 'digestive'
-    },
-    {
-        'id': 'energy_level',
-        'question': "What are your energy levels like?",
-        'options': ['Variable and irregular', 'High and consistent', 'Low and steady'],
-        'context': 'lifestyle'
-    },
-    {
-        'id': 'sleep',
-        'question': "How would you describe your sleep?",
-        'options': ['Light and interrupted', 'Moderate', 'Deep and sound'],
-        'context': 'lifestyle'
-    },
-    {
-        'id': 'temperament',
-        'question': "Which best describes your temperament?",
-        'options': ['Anxious and creative', 'Intense and ambitious', 'Calm and stable'],
-        'context': 'mental'
+# 'online' serves the incrementally trained hashed model instead of the TF-IDF pipeline
+CHATBOT_MODEL = os.getenv("CHATBOT_MODEL", "default")
+CHAT_LOG_ENABLED = os.getenv("CHAT_LOG_ENABLED", "1") == "1"
+# Typing pauses before each reply; replay runs turn them off to measure processing
+CHAT_PACING = os.getenv("CHAT_PACING", "1") == "1"
+
+# Adaptive assessment ends as soon as the remaining questions can no longer
+# change the result; ADAPTIVE_REORDER also asks the most decisive question next
+ADAPTIVE_ASSESSMENT = os.getenv("ADAPTIVE_ASSESSMENT", "0") == "1"
+ADAPTIVE_REORDER = os.getenv("ADAPTIVE_REORDER", "0") == "1"
+
+# Heartbeats: a ping is sent after WS_HEARTBEAT_INTERVAL seconds without any
+# client frame and the connection is reaped if no frame arrives within
+# WS_PONG_TIMEOUT. Connections without a chat message for WS_IDLE_TIMEOUT are
+# closed as idle. WS_HEARTBEAT_INTERVAL=0 disables both.
+WS_HEARTBEAT_INTERVAL = float(os.getenv("WS_HEARTBEAT_INTERVAL", "25"))
+WS_PONG_TIMEOUT = float(os.getenv("WS_PONG_TIMEOUT", "10"))
+WS_IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", "1800"))
+WS_HEARTBEAT_TICK = float(os.getenv("WS_HEARTBEAT_TICK", "1"))
+WS_CLOSE_GOING_AWAY = 1001
+WS_CLOSE_TIMEOUT = 5
+
+# Non-English models are loaded on first use and the least recently used are
+# evicted once their estimated size passes the cap; English is always loaded
+CHATBOT_MODEL_CACHE_MB = float(os.getenv("CHATBOT_MODEL_CACHE_MB", "64"))
+
+MODEL_FILES = {
+    'default': 'chatbot_model.pkl',
+    'online': 'chatbot_model_online.pkl'
+}
+# The online trainer replaces its model file in place; the serving process
+# checks the file's mtime at most this often and reloads it when it changed
+ONLINE_MODEL_RELOAD_SECONDS = float(os.getenv("ONLINE_MODEL_RELOAD_SECONDS", "30"))
+
+# Replies when no intent is recognised, per language
+FALLBACK_RESPONSES = {
+    'en': {
+        'complete': "You've completed your assessment! Would you like to see your results again?",
+        'default': "I'm here to help you with your Ayurvedic assessment. Type 'start' to begin!"
     },
-    {
-        'id': 'stress_response',
-        'question': "How do you typically respond to stress?",
-        'options': ['Worried and anxious', 'Irritable and angry', 'Calm and peaceful'],
-        'context': 'mental'
+    'hi': {
+        'complete': "आपका मूल्यांकन पूरा हो गया है! क्या आप अपने परिणाम फिर से देखना चाहेंगे?",
+        'default': "मैं आपके आयुर्वेदिक मूल्यांकन में मदद के लिए यहाँ हूँ। शुरू करने के लिए 'शुरू' लिखें!"
     },
-    {
-        'id': 'weather_preference',
-        'question': "What weather do you prefer?",
-        'options': ['Warm and sunny', 'Cool and moderate', 'Warm and humid'],
-        'context': 'lifestyle'
+    'mr': {
+        'complete': "तुमचे मूल्यांकन पूर्ण झाले आहे! तुम्हाला तुमचे निकाल पुन्हा पहायचे आहेत का?",
+        'default': "तुमच्या आयुर्वेदिक मूल्यांकनासाठी मी मदत करायला इथे आहे. सुरू करण्यासाठी 'सुरू' लिहा!"
     }
-]
+}
+
+# Messages that start the assessment, in every supported language
+START_COMMANDS = {
+    'start', 'begin', 'yes', 'ready', 'let\'s start', 'let\'s begin',
+    'शुरू', 'शुरू करें', 'हाँ', 'हां',
+    'सुरू', 'सुरू करा', 'होय'
+}
+
+
+def load_language_model(language: str):
+    """
+    Load a language's intent classifier and intents for the model cache.
+
+    Models are only trained by the training scripts; a language without one
+    fails to load, and its messages get the fallback responses.
+
+    Returns:
+        ((model, intents), estimated size in bytes)
+
+    Raises:
+        FileNotFoundError: If the language's model or intents haven't been trained
+    """
+    # botmodel pulls in sklearn; unpickling a model needs it anyway, importing the app shouldn't
+    from Training.botmodel import model_files
+    model_name, intents_name = model_files(language)
+    if language == DEFAULT_LANGUAGE:
+        model_name = MODEL_FILES[CHATBOT_MODEL]
+    model_path = os.path.join(models_dir, model_name)
+    intents_path = os.path.join(models_dir, intents_name)
+    if not (os.path.exists(model_path) and os.path.exists(intents_path)):
+        raise FileNotFoundError(f"No trained '{language}' chatbot model; run "
+                                f"`python Training/botmodel.py --language {language}`")
+    with open(model_path, 'rb') as f:
+        model = pickle.load(f)
+    with open(intents_path, 'rb') as f:
+        intents = pickle.load(f)
+    return (model, intents), os.path.getsize(model_path) + os.path.getsize(intents_path)
+
+model_cache = ModelCache(load_language_model, int(CHATBOT_MODEL_CACHE_MB * 1024 * 1024), pinned=(DEFAULT_LANGUAGE,))
+
+_default_model_mtime = None
+_next_reload_check = 0.0
+
+def _default_model_path():
+    return os.path.join(models_dir, MODEL_FILES[CHATBOT_MODEL])
+
+def load_chatbot_models():
+    """Load the English intent classifier and intents (called from the app lifespan)"""
+    global chatbot_model, intents_data, _default_model_mtime
+    try:
+        # Taken before reading, so a file replaced mid-load is reloaded again
+        mtime = os.stat(_default_model_path()).st_mtime_ns
+        (model, intents), size = load_language_model(DEFAULT_LANGUAGE)
+    except Exception:
+        print("Warning: Chatbot models not found. Please train models first.")
+        raise
+    chatbot_model, intents_data, _default_model_mtime = model, intents, mtime
+    model_cache.put(DEFAULT_LANGUAGE, (model, intents), size)
+    return chatbot_model
+
+async def reload_online_model():
+    """With CHATBOT_MODEL=online, reload the model once the trainer has saved a new one"""
+    global _next_reload_check
+    now = time.monotonic()
+    if CHATBOT_MODEL != 'online' or now < _next_reload_check:
+        return
+    _next_reload_check = now + ONLINE_MODEL_RELOAD_SECONDS
+    try:
+        changed = os.stat(_default_model_path()).st_mtime_ns != _default_model_mtime
+    except OSError:
+        return
+    if changed:
+        try:
+            await asyncio.to_thread(load_chatbot_models)
+            print("Reloaded the online chatbot model")
+        except Exception as e:
+            print(f"Failed to reload the online chatbot model: {e}")
+
+def warmup_prediction():
+    """Run one prediction so the first real message doesn't pay for lazy setup"""
+    if chatbot_model is None:
+        raise RuntimeError("Chatbot model is not loaded")
+    return chatbot_model.predict([clean_text("hello")])[0]
+
+# Assessment questions flow, compiled from Training/questionnaires/<version>.json
+default_questionnaire = load_questionnaire()
+ASSESSMENT_QUESTIONS = default_questionnaire.questions
 
 # Map options to dosha values
-OPTION_MAPPING = {
-    'body_frame': {
-        'Thin and light': 'thin',
-        'Medium build': 'medium',
-        'Heavy and large': 'heavy'
-    },
-    'skin_type': {
-        'Dry and rough': 'dry',
-        'Oily and sensitive': 'oily',
-        'Smooth and oily': 'oily',
-        'Normal': 'normal'
-    },
-    'hair_texture': {
-        'Thin and dry': 'thin',
-        'Fine and oily': 'fine',
-        'Thick and oily': 'thick',
-        'Normal': 'normal'
-    },
-    'appetite': {
-        'Irregular and variable': 'irregular',
-        'Strong and regular': 'strong',
-        'Moderate and steady': 'regular'
-    },
-    'digestion': {
-        'Irregular': 'irregular',
-        'Strong and fast': 'strong',
-        'Slow': 'slow'
-    },
-    'energy_level': {
-        'Variable and irregular': 'variable',
-        'High and consistent': 'high',
-        'Low and steady': 'low'
-    },
-    'sleep': {
-        'Light and interrupted': 'light',
-        'Moderate': 'moderate',
-        'Deep and sound': 'deep'
-    },
-    'temperament': {
-        'Anxious and creative': 'anxious',
-        'Intense and ambitious': 'intense',
-        'Calm and stable': 'calm'
-    },
-    'stress_response': {
-        'Worried and anxious': 'worried',
-        'Irritable and angry': 'irritable',
-        'Calm and peaceful': 'calm'
-    },
-    'weather_preference': {
-        'Warm and sunny': 'warm',
-        'Cool and moderate': 'cool',
-        'Warm and humid': 'warm'
+OPTION_MAPPING = default_questionnaire.option_mapping()
+
+# Free-text replies are mapped onto options in one pass per message
+_answer_matchers = {}
+
+def get_answer_matcher(questionnaire):
+    matcher = _answer_matchers.get(questionnaire.version)
+    if matcher is None:
+        matcher = _answer_matchers[questionnaire.version] = AnswerMatcher(questionnaire.option_mapping())
+    return matcher
+
+def option_for_dosha(questionnaire, question_index: int, dosha: str):
+    """The option scoring highest for a dosha, or None if options with different codes tie"""
+    if dosha not in questionnaire.doshas:
+        return None
+    d = questionnaire.doshas.index(dosha)
+    rows = questionnaire.score_rows[question_index]
+    codes = questionnaire.option_codes[question_index]
+    best = max(rows[code][d] for code in codes)
+    best_codes = {code for code in codes if rows[code][d] == best}
+    if not best or len(best_codes) > 1:
+        return None
+    return codes.index(best_codes.pop())
+
+def resolve_answer(questionnaire, question_index: int, user_message: str):
+    """
+    Return the option index a reply selects.
+
+    An exact option wins, then the best free-text match on option words. A
+    reply naming none of them ("I'm always cold") falls back to its dosha
+    keywords: when they all point to one dosha, the option scoring highest
+    for it is chosen.
+    """
+    option_index = questionnaire.option_index[question_index]
+    if user_message in option_index:
+        return option_index[user_message]
+    with span('match_answer'):
+        label = get_answer_matcher(questionnaire).match(questionnaire.questions[question_index]['id'], user_message)
+        if label is not None:
+            return option_index[label]
+        doshas = extract_dosha_keywords(user_message)
+        return option_for_dosha(questionnaire, question_index, doshas[0]) if len(doshas) == 1 else None
+
+def next_question_index(questionnaire, answers: list, question_index: int, totals: list = None) -> int:
+    """Question to ask after `question_index` was answered, or -1 when the assessment is complete"""
+    if not ADAPTIVE_ASSESSMENT:
+        return int(questionnaire.next_question[question_index])
+    if questionnaire.decided_outcome(answers, totals) is not None:
+        return -1
+    if ADAPTIVE_REORDER:
+        next_index = questionnaire.most_informative_question(answers, totals)
+        return -1 if next_index is None else next_index
+    return int(questionnaire.next_question[question_index])
+
+def question_frame(questionnaire, question_index: int, text: str = None, answers: list = None,
+                   totals: list = None) -> dict:
+    """
+    Build the frame that asks a question.
+
+    Progress counts `answers` when given. Once something is answered, the
+    running `totals` are streamed as a provisional result, summarized the
+    same way as the final one.
+    """
+    question = questionnaire.questions[question_index]
+    position = question_index + 1 if answers is None else sum(a != UNANSWERED for a in answers) + 1
+    frame = {
+        'type': 'question',
+        'sender': 'bot',
+        'text': text or question['question'],
+        'question_id': question['id'],
+        'options': question['options'],
+        'progress': {
+            'current': position,
+            'total': questionnaire.size
+        },
+        'timestamp': datetime.now().isoformat()
     }
-}
+    if totals is not None and position > 1:
+        frame['provisional'] = summarize_scores(dict(zip(questionnaire.doshas, totals)))
+    return frame
+
+def revised_question(questionnaire, session: dict, question_id) -> int:
+    """Index of an earlier answered question the client wants to change, or None"""
+    index = questionnaire.question_index.get(question_id) if isinstance(question_id, str) else None
+    if index is None or index == session['current_question'] or session['answers'][index] == UNANSWERED:
+        return None
+    return index
 
 class ConnectionManager:
     def __init__(self):
         self.active_connections: dict[str, WebSocket] = {}
         self.user_sessions: dict[str, dict] = {}
+        self.compact_sessions: set[str] = set()  # connections using the MessagePack protocol
+        # Liveness per connection: last frame, last chat message, outstanding ping, and
+        # the lock that keeps the chat loop and heartbeats from writing at the same time
+        self.connection_state: dict[str, dict] = {}
+        self.timers = TimerWheel(WS_HEARTBEAT_TICK)
+        self.reaped = {'idle': 0, 'heartbeat': 0}
+        self.pings_sent = 0
+        self._closing: set[asyncio.Task] = set()
     
-    async def connect(self, websocket: WebSocket, session_id: str):
-        await websocket.accept()
+    async def connect(self, websocket: WebSocket, session_id: str, questionnaire_version: str,
+                      subprotocol: str = None):
+        await websocket.accept(subprotocol=subprotocol)
         self.active_connections[session_id] = websocket
+        now = time.monotonic()
+        self.connection_state[session_id] = {'last_seen': now, 'last_message': now, 'ping_sent': None,
+                                             'send_lock': asyncio.Lock()}
+        self.timers.schedule(session_id, WS_HEARTBEAT_INTERVAL or WS_IDLE_TIMEOUT)
+        if subprotocol:
+            self.compact_sessions.add(session_id)
+        else:
+            self.compact_sessions.discard(session_id)
         if session_id not in self.user_sessions:
+            questionnaire = load_questionnaire(questionnaire_version)
             self.user_sessions[session_id] = {
+                'questionnaire_version': questionnaire.version,
                 'assessment_data': {},
+                'answers': [UNANSWERED] * questionnaire.size,  # integer answer codes
+                'running_scores': [0] * len(questionnaire.doshas),  # score(answers), kept per answer
                 'current_question': 0,
                 'assessment_complete': False,
                 'dosha_results': None,
                 'panchakarma_recs': None,
-                'has_sent_welcome': False  # Track if welcome message was sent
+                'has_sent_welcome': False,  # Track if welcome message was sent
+                'language': DEFAULT_LANGUAGE
             }
     
-    def disconnect(self, session_id: str):
+    def disconnect(self, session_id: str, websocket: WebSocket = None):
+        """Forget a connection; with `websocket`, only if it is still the session's current one"""
+        if websocket is not None and self.active_connections.get(session_id) is not websocket:
+            return
         if session_id in self.active_connections:
             del self.active_connections[session_id]
+        self.compact_sessions.discard(session_id)
+        self.connection_state.pop(session_id, None)
+        self.timers.cancel(session_id)
+    
+    def is_compact(self, session_id: str) -> bool:
+        return session_id in self.compact_sessions
     
     async def send_personal_message(self, message: dict, session_id: str):
-        if session_id in self.active_connections:
-            await self.active_connections[session_id].send_json(message)
+        websocket = self.active_connections.get(session_id)
+        state = self.connection_state.get(session_id)
+        if websocket is not None and state is not None:
+            # Frames sent while handling a traced turn carry its trace id
+            trace_id = current_trace_id()
+            if trace_id:
+                message = {**message, 'trace_id': trace_id}
+            with span('send', frame=message.get('type')):
+                # The chat loop and the heartbeat task share the socket; one writer at a time
+                async with state['send_lock']:
+                    if session_id in self.compact_sessions:
+                        questionnaire = load_questionnaire(self.user_sessions[session_id]['questionnaire_version'])
+                        await websocket.send_bytes(encode_compact(message, questionnaire))
+                    else:
+                        await websocket.send_json(message)
     
     async def send_typing_indicator(self, session_id: str):
-        if session_id in self.active_connections:
-            await self.active_connections[session_id].send_json({
-                'type': 'typing',
-                'sender': 'bot'
-            })
+        await self.send_personal_message({
+            'type': 'typing',
+            'sender': 'bot'
+        }, session_id)
+    
+    async def receive_frame(self, websocket: WebSocket, session_id: str):
+        """
+        Wait for the next raw client frame (bytes in compact mode, text otherwise).
+
+        Every frame proves the connection is alive; heartbeat replies are
+        consumed here and never reach the chat loop.
+        """
+        while True:
+            if session_id in self.compact_sessions:
+                frame = await websocket.receive_bytes()
+            else:
+                frame = await websocket.receive_text()
+            
+            heartbeat = is_pong(frame)
+            state = self.connection_state.get(session_id)
+            if state is not None and self.active_connections.get(session_id) is websocket:
+                state['last_seen'] = time.monotonic()
+                state['ping_sent'] = None
+                if not heartbeat:
+                    state['last_message'] = state['last_seen']
+            if not heartbeat:
+                return frame
+    
+    async def run_heartbeats(self):
+        """Single task driving heartbeats and reaping for all connections via the timer wheel"""
+        next_tick = time.monotonic()
+        while True:
+            next_tick += self.timers.tick
+            await asyncio.sleep(max(0, next_tick - time.monotonic()))
+            for session_id in self.timers.advance():
+                try:
+                    await self._check_connection(session_id)
+                except Exception as e:
+                    print(f"Heartbeat check failed for {session_id}: {e}")
+    
+    async def _check_connection(self, session_id: str):
+        state = self.connection_state.get(session_id)
+        websocket = self.active_connections.get(session_id)
+        if state is None or websocket is None:
+            return
+        now = time.monotonic()
+        
+        if now - state['last_message'] >= WS_IDLE_TIMEOUT:
+            self._reap(session_id, websocket, 'idle')
+            return
+        
+        if state['ping_sent'] is not None:
+            if now - state['ping_sent'] >= WS_PONG_TIMEOUT:
+                self._reap(session_id, websocket, 'heartbeat')
+                return
+            next_check = state['ping_sent'] + WS_PONG_TIMEOUT
+        elif now - state['last_seen'] >= WS_HEARTBEAT_INTERVAL:
+            if state['send_lock'].locked():
+                # Mid-send from the chat loop; waiting would hold up every other connection's check
+                self.timers.schedule(session_id, self.timers.tick)
+                return
+            try:
+                await self.send_personal_message({'type': 'ping'}, session_id)
+            except Exception:
+                self._reap(session_id, websocket, 'heartbeat')
+                return
+            state['ping_sent'] = now
+            self.pings_sent += 1
+            next_check = now + WS_PONG_TIMEOUT
+        else:
+            next_check = state['last_seen'] + WS_HEARTBEAT_INTERVAL
+        
+        self.timers.schedule(session_id, min(next_check, state['last_message'] + WS_IDLE_TIMEOUT) - now)
+    
+    def _reap(self, session_id: str, websocket: WebSocket, reason: str):
+        """Drop a dead or idle connection now and close its socket in the background"""
+        send_lock = self.connection_state[session_id]['send_lock']
+        self.disconnect(session_id, websocket)
+        self.reaped[reason] += 1
+        task = asyncio.create_task(self._close(websocket, f"{reason} timeout", send_lock))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+    
+    async def _close(self, websocket: WebSocket, reason: str, send_lock: asyncio.Lock):
+        async def close():
+            # The close frame waits for a send the chat loop has in flight
+            async with send_lock:
+                await websocket.close(code=WS_CLOSE_GOING_AWAY, reason=reason)
+        try:
+            await asyncio.wait_for(close(), WS_CLOSE_TIMEOUT)
+        except Exception:
+            pass
+    
+    def connection_stats(self) -> dict:
+        """Open, idle (no chat message for a heartbeat interval) and reaped connection counts"""
+        now = time.monotonic()
+        return {
+            'open': len(self.active_connections),
+            'idle': sum(
+                1 for state in self.connection_state.values()
+                if now - state['last_message'] >= WS_HEARTBEAT_INTERVAL
+            ),
+            'awaiting_pong': sum(1 for state in self.connection_state.values() if state['ping_sent'] is not None),
+            'pings_sent': self.pings_sent,
+            'reaped_idle': self.reaped['idle'],
+            'reaped_heartbeat': self.reaped['heartbeat']
+        }
+    
+    def decode_frame(self, frame, session_id: str) -> dict:
+        """
+        Decode a client frame into a {'message': ...} dict, whichever protocol is in use.
+
+        Raises:
+            ProtocolError: The frame is malformed
+        """
+        if session_id in self.compact_sessions:
+            session = self.user_sessions[session_id]
+            questionnaire = load_questionnaire(session['questionnaire_version'])
+            return decode_compact(frame, questionnaire, session['current_question'])
+        return decode_json(frame)
 
 manager = ConnectionManager()
 
@@ -186,25 +456,68 @@ async def simulate_typing_delay():
     """Simulate bot thinking time"""
     await asyncio.sleep(0.5)
 
+def save_chat_message(session_id: str, message: str, sender: str, intent: str = None):
+    """Persist one chat message; predicted intents are stored unconfirmed"""
+    db = SessionLocal()
+    try:
+        db.add(ChatMessage(session_id=session_id, message=message, sender=sender, intent=intent))
+        db.commit()
+        record_write(session_id)
+    finally:
+        db.close()
+
+async def log_chat_message(session_id: str, message: str, sender: str, intent: str = None):
+    """Log a chat message off the event loop; logging failures never break the chat"""
+    if not CHAT_LOG_ENABLED:
+        return
+    try:
+        with span('db.log_message', sender=sender):
+            await asyncio.to_thread(save_chat_message, session_id, message, sender, intent)
+    except Exception as e:
+        print(f"Failed to log chat message: {e}")
+
+async def predict_intent(user_message: str, session: dict):
+    """Predict the intent of a message in the session's language, remembering the tag for logging"""
+    language = session.get('language', DEFAULT_LANGUAGE)
+    if language == DEFAULT_LANGUAGE:
+        if not (chatbot_model and intents_data):
+            return None
+        await reload_online_model()
+    loaded = model_cache.peek(language)
+    if loaded is None:
+        try:
+            with span('load_model', language=language):
+                loaded = await asyncio.to_thread(model_cache.get, language)
+        except Exception as e:
+            print(f"Failed to load '{language}' chatbot model: {e}")
+            return None
+    model, intents = loaded
+    try:
+        with span('clean_text'):
+            cleaned = clean_text(user_message, language)
+        with span('predict'):
+            intent_tag = model.predict([cleaned])[0]
+    except Exception:
+        return None
+    session['last_intent'] = intent_tag
+    return next((i for i in intents['intents'] if i['tag'] == intent_tag), None)
+
 async def get_bot_response(user_message: str, session: dict, session_id: str) -> str:
     """Get appropriate bot response based on user message and session state"""
+    fallback = FALLBACK_RESPONSES.get(session.get('language'), FALLBACK_RESPONSES[DEFAULT_LANGUAGE])
+    
     # If assessment is complete, handle general conversation
     if session['assessment_complete']:
-        if chatbot_model and intents_data:
-            try:
-                intent_tag = chatbot_model.predict([clean_text(user_message)])[0]
-                intent = next((i for i in intents_data['intents'] if i['tag'] == intent_tag), None)
-                if intent:
-                    import random
-                    return random.choice(intent['responses'])
-            except:
-                pass
-        return "You've completed your assessment! Would you like to see your results again?"
+        intent = await predict_intent(user_message, session)
+        if intent:
+            return random.choice(intent['responses'])
+        return fallback['complete']
     
     # If assessment is in progress, continue with it
-    if session['current_question'] < len(ASSESSMENT_QUESTIONS):
-        current_q = ASSESSMENT_QUESTIONS[session['current_question']]
-        if user_message in current_q['options']:
+    questionnaire = load_questionnaire(session['questionnaire_version'])
+    if session['current_question'] < questionnaire.size:
+        current_q = questionnaire.questions[session['current_question']]
+        if resolve_answer(questionnaire, session['current_question'], user_message) is not None:
             # Valid option selected, handled in main loop
             return None
         else:
@@ -217,18 +530,12 @@ async def get_bot_response(user_message: str, session: dict, session_id: str) ->
         return None  # Will start assessment in main loop
     
     # General conversation before assessment starts
-    if chatbot_model and intents_data:
-        try:
-            intent_tag = chatbot_model.predict([clean_text(user_message)])[0]
-            intent = next((i for i in intents_data['intents'] if i['tag'] == intent_tag), None)
-            if intent:
-                import random
-                return random.choice(intent['responses'])
-        except:
-            pass
+    intent = await predict_intent(user_message, session)
+    if intent:
+        return random.choice(intent['responses'])
     
     # Default response
-    return "I'm here to help you with your Ayurvedic assessment. Type 'start' to begin!"
+    return fallback['default']
 
 @router.websocket("/ws/chat")
 async def websocket_endpoint(websocket: WebSocket):
@@ -236,9 +543,27 @@ async def websocket_endpoint(websocket: WebSocket):
     try:
         # Get session ID from query params or generate one
         session_id = websocket.query_params.get("session_id", f"session_{datetime.now().timestamp()}")
+        questionnaire_version = websocket.query_params.get("questionnaire")
+        # An explicit ?lang= fixes the language; otherwise each message is detected
+        language = websocket.query_params.get("lang")
+        if language is not None and language not in SUPPORTED_LANGUAGES:
+            await websocket.close(code=1008)
+            return
+        try:
+            load_questionnaire(questionnaire_version)
+        except QuestionnaireError:
+            await websocket.close(code=1008)
+            return
         
-        await manager.connect(websocket, session_id)
+        await manager.connect(websocket, session_id, questionnaire_version, negotiate_subprotocol(websocket))
         session = manager.user_sessions[session_id]
+        if language:
+            session['language'] = language
+        questionnaire = load_questionnaire(session['questionnaire_version'])
+        
+        # Compact clients learn which manifest to use before anything else
+        if manager.is_compact(session_id):
+            await manager.send_personal_message(hello_frame(questionnaire), session_id)
         
         # Send welcome message ONLY ONCE
         if not session['has_sent_welcome']:
@@ -251,122 +576,139 @@ async def websocket_endpoint(websocket: WebSocket):
             session['has_sent_welcome'] = True
         
         while True:
-            # Wait for user message
-            data = await websocket.receive_json()
-            print(f"Received data from client: {data}")
-            user_message = data.get('message', '').strip()
-            
-            if not user_message:
-                print("Empty message received, skipping")
-                continue
-            
-            print(f"Processing user message: {user_message}")
-            
-            # Simulate typing
-            await simulate_typing_delay()
-            await manager.send_typing_indicator(session_id)
-            await asyncio.sleep(1)
-            
-            # Check if assessment is in progress
-            if session['current_question'] < len(ASSESSMENT_QUESTIONS):
-                current_q = ASSESSMENT_QUESTIONS[session['current_question']]
+            # Wait for user message; the turn's trace starts once it has arrived, so
+            # time spent waiting on the user is not part of the turn
+            frame = await manager.receive_frame(websocket, session_id)
+            with tracer.trace('chat.turn', session_id=session_id) as trace:
+                with span('decode'):
+                    try:
+                        data = manager.decode_frame(frame, session_id)
+                    except ProtocolError as e:
+                        # A malformed frame is reported; the connection stays open
+                        await manager.send_personal_message(error_frame(e), session_id)
+                        continue
+                user_message = data.get('message', '').strip()
                 
-                # Check if user selected a valid option
-                if user_message in current_q['options']:
-                    # Map answer to dosha value
-                    question_id = current_q['id']
-                    dosha_value = OPTION_MAPPING.get(question_id, {}).get(user_message, user_message.lower())
-                    session['assessment_data'][question_id] = dosha_value
-                    
-                    session['current_question'] += 1
+                if not user_message:
+                    continue
+                
+                if not language:
+                    # Messages without letters keep the conversation's language
+                    session['language'] = detect_language(user_message, session['language'])
+                if trace:
+                    trace.set_attribute('language', session['language'])
+                
+                # Simulate typing
+                if CHAT_PACING:
+                    with span('pacing.typing_delay'):
+                        await simulate_typing_delay()
+                await manager.send_typing_indicator(session_id)
+                if CHAT_PACING:
+                    with span('pacing.sleep'):
+                        await asyncio.sleep(1)
+                
+                # Check if assessment is in progress
+                if session['current_question'] < questionnaire.size:
+                    await log_chat_message(session_id, user_message, 'user')
+                    question_index = session['current_question']
+                    current_q = questionnaire.questions[question_index]
+                    # Clients may name an earlier question to change its answer
+                    revised = revised_question(questionnaire, session, data.get('question_id'))
+                    answering = question_index if revised is None else revised
+                    if trace:
+                        trace.set_attribute('question_id', questionnaire.questions[answering]['id'])
                     
-                    # Check if assessment is complete
-                    if session['current_question'] >= len(ASSESSMENT_QUESTIONS):
-                        # Calculate dosha results
-                        dosha_results = calculate_dosha_scores(session['assessment_data'])
-                        session['dosha_results'] = dosha_results
+                    # Check if user selected a valid option, or described one in free text
+                    option = resolve_answer(questionnaire, answering, user_message)
+                    if option is not None:
+                        # Record the integer answer code and its dosha value
+                        code = questionnaire.option_codes[answering][option]
+                        totals = session['running_scores']
+                        questionnaire.apply_answer(totals, answering, code, session['answers'][answering])
+                        session['answers'][answering] = code
+                        session['assessment_data'][questionnaire.questions[answering]['id']] = \
+                            questionnaire.codes[answering][code]
                         
-                        # Get Panchakarma recommendations
-                        panchakarma_recs = get_panchakarma_recommendations(dosha_results)
-                        session['panchakarma_recs'] = panchakarma_recs
-                        session['assessment_complete'] = True
+                        if revised is None:
+                            next_question = next_question_index(questionnaire, session['answers'], question_index, totals)
+                        elif ADAPTIVE_ASSESSMENT and questionnaire.decided_outcome(session['answers'], totals) is not None:
+                            next_question = -1
+                        else:
+                            # A changed answer keeps the current question open
+                            next_question = question_index
                         
-                        # Send results
-                        await manager.send_personal_message({
-                            'type': 'assessment_complete',
-                            'sender': 'bot',
-                            'dosha_results': dosha_results,
-                            'panchakarma_recs': panchakarma_recs,
-                            'timestamp': datetime.now().isoformat()
-                        }, session_id)
+                        # Check if assessment is complete
+                        if next_question < 0:
+                            session['current_question'] = questionnaire.size
+                            
+                            # The running scores are the final scores
+                            with span('score'):
+                                dosha_results = summarize_scores(dict(zip(questionnaire.doshas, totals)))
+                            session['dosha_results'] = dosha_results
+                            
+                            # Get Panchakarma recommendations
+                            with span('recommendations'):
+                                from Training.outcome_table import load_outcome_table
+                                outcome_table = load_outcome_table(questionnaire.version)
+                                panchakarma_recs = outcome_table.recommendations_for(dosha_results) \
+                                    if outcome_table else get_panchakarma_recommendations(dosha_results)
+                            session['panchakarma_recs'] = panchakarma_recs
+                            session['assessment_complete'] = True
+                            
+                            # Send results
+                            await manager.send_personal_message({
+                                'type': 'assessment_complete',
+                                'sender': 'bot',
+                                'dosha_results': dosha_results,
+                                'panchakarma_recs': panchakarma_recs,
+                                'questions_answered': sum(a != UNANSWERED for a in session['answers']),
+                                'timestamp': datetime.now().isoformat()
+                            }, session_id)
+                        else:
+                            # Ask next question
+                            session['current_question'] = next_question
+                            await manager.send_personal_message(question_frame(
+                                questionnaire, next_question, answers=session['answers'], totals=totals
+                            ), session_id)
                     else:
-                        # Ask next question
-                        next_q = ASSESSMENT_QUESTIONS[session['current_question']]
+                        # Invalid option, re-ask current question
+                        await manager.send_personal_message(question_frame(
+                            questionnaire, question_index,
+                            f"{current_q['question']} Please select one of the options below:",
+                            answers=session['answers'], totals=session['running_scores']
+                        ), session_id)
+                
+                # Check if user wants to start assessment
+                elif user_message.lower() in START_COMMANDS:
+                    # Start assessment
+                    await log_chat_message(session_id, user_message, 'user')
+                    session['current_question'] = 0
+                    session['assessment_data'] = {}
+                    session['answers'] = [UNANSWERED] * questionnaire.size
+                    session['running_scores'] = [0] * len(questionnaire.doshas)
+                    await manager.send_personal_message(question_frame(questionnaire, 0), session_id)
+                
+                else:
+                    # Handle general conversation
+                    bot_response = await get_bot_response(user_message, session, session_id)
+                    await log_chat_message(session_id, user_message, 'user', session.pop('last_intent', None))
+                    
+                    if bot_response:
+                        await log_chat_message(session_id, bot_response, 'bot')
                         await manager.send_personal_message({
-                            'type': 'question',
+                            'type': 'message',
                             'sender': 'bot',
-                            'text': next_q['question'],
-                            'question_id': next_q['id'],
-                            'options': next_q['options'],
-                            'progress': {
-                                'current': session['current_question'] + 1,
-                                'total': len(ASSESSMENT_QUESTIONS)
-                            },
+                            'text': bot_response,
                             'timestamp': datetime.now().isoformat()
                         }, session_id)
-                else:
-                    # Invalid option, re-ask current question
-                    await manager.send_personal_message({
-                        'type': 'question',
-                        'sender': 'bot',
-                        'text': f"{current_q['question']} Please select one of the options below:",
-                        'question_id': current_q['id'],
-                        'options': current_q['options'],
-                        'progress': {
-                            'current': session['current_question'] + 1,
-                            'total': len(ASSESSMENT_QUESTIONS)
-                        },
-                        'timestamp': datetime.now().isoformat()
-                    }, session_id)
-            
-            # Check if user wants to start assessment
-            elif user_message.lower() in ['start', 'begin', 'yes', 'ready', 'let\'s start', 'let\'s begin']:
-                # Start assessment
-                session['current_question'] = 0
-                session['assessment_data'] = {}
-                first_q = ASSESSMENT_QUESTIONS[0]
-                await manager.send_personal_message({
-                    'type': 'question',
-                    'sender': 'bot',
-                    'text': first_q['question'],
-                    'question_id': first_q['id'],
-                    'options': first_q['options'],
-                    'progress': {
-                        'current': 1,
-                        'total': len(ASSESSMENT_QUESTIONS)
-                    },
-                    'timestamp': datetime.now().isoformat()
-                }, session_id)
-            
-            else:
-                # Handle general conversation
-                bot_response = await get_bot_response(user_message, session, session_id)
-                
-                if bot_response:
-                    await manager.send_personal_message({
-                        'type': 'message',
-                        'sender': 'bot',
-                        'text': bot_response,
-                        'timestamp': datetime.now().isoformat()
-                    }, session_id)
     
     except WebSocketDisconnect:
         if session_id:
-            manager.disconnect(session_id)
+            manager.disconnect(session_id, websocket)
     except Exception as e:
         import traceback
         print(f"WebSocket error: {e}")
         print(f"Traceback: {traceback.format_exc()}")
         if session_id:
-            manager.disconnect(session_id)
+            manager.disconnect(session_id, websocket)
 
@@ -0,0 +1,252 @@
+"""
+Assessment Export Endpoint
+Streams the assessments table as NDJSON, CSV or Parquet for research use
+"""
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from database.answer_codes import answer_filter, parse_answer_filters
+from database.database import read_session
+from database.models import Assessment
+from Training.panchakarma_model import get_panchakarma_recommendations
+from Training.questionnaire import load_questionnaire, QuestionnaireError, SECONDARY_THRESHOLD
+from utils.admin_auth import require_admin
+
+router = APIRouter()
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+EXPORT_COLUMNS = [
+    'id', 'session_id', 'created_at', 'vata_score', 'pitta_score', 'kapha_score',
+    'dominant_dosha', 'secondary_dosha', 'assessment_data'
+]
+RECOMMENDATION_COLUMNS = ['primary_therapies', 'secondary_therapies', 'contraindications']
+
+MEDIA_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet'
+}
+
+
+def _recommendation_fields(cache, row):
+    """
+    Recommendation columns for a row.
+
+    Recommendations only depend on the dominant dosha, the secondary dosha and
+    whether the secondary share exceeds SECONDARY_THRESHOLD, so they are computed once per key.
+    """
+    secondary = row['secondary_dosha']
+    secondary_pct = row.get(f"{secondary}_score") or 0
+    key = (row['dominant_dosha'], secondary, secondary_pct > SECONDARY_THRESHOLD)
+
+    fields = cache.get(key)
+    if fields is None:
+        recs = get_panchakarma_recommendations({
+            'dominant_dosha': row['dominant_dosha'],
+            'secondary_dosha': secondary,
+            'percentages': {secondary: secondary_pct} if secondary else {}
+        })
+        fields = cache[key] = {
+            'primary_therapies': list(recs['primary']),
+            'secondary_therapies': list(recs['secondary']),
+            'contraindications': list(recs.get('contraindications', []))
+        }
+    return fields
+
+
+def _iter_rows(start, end, dominant_dosha, include_recommendations, answers=None):
+    """
+    Yield batches of export rows straight from the database cursor.
+
+    yield_per streams results (a server-side cursor where the driver supports
+    it), so only one batch of rows is alive at a time.
+    """
+    db = read_session()
+    try:
+        query = select(*(getattr(Assessment, column) for column in EXPORT_COLUMNS))
+        if start:
+            query = query.where(Assessment.created_at >= start)
+        if end:
+            query = query.where(Assessment.created_at < end)
+        if dominant_dosha:
+            query = query.where(Assessment.dominant_dosha == dominant_dosha)
+        if answers is not None:
+            query = query.where(answers)
+        query = query.order_by(Assessment.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+        recommendation_cache = {}
+        batch = []
+        for result in db.execute(query):
+            row = dict(result._mapping)
+            if include_recommendations and row['dominant_dosha']:
+                row.update(_recommendation_fields(recommendation_cache, row))
+            batch.append(row)
+            if len(batch) >= EXPORT_BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        db.close()
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _stream_ndjson(batches):
+    for batch in batches:
+        yield ''.join(json.dumps(row, default=_json_default) + '\n' for row in batch)
+
+
+def _stream_csv(batches, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for batch in batches:
+        for row in batch:
+            writer.writerow([_csv_value(row.get(column)) for column in columns])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return json.dumps(value)
+    if isinstance(value, list):
+        return '|'.join(value)
+    return '' if value is None else value
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back to the response"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _stream_parquet(batches, columns):
+    """
+    Write one Parquet row group per batch and stream each as soon as it is encoded.
+
+    pyarrow is imported on the first Parquet export, before any row is read.
+
+    Raises:
+        HTTPException: 501 if pyarrow is not installed
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:  # Parquet export is only available with pyarrow installed
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+
+    fields = [
+        ('id', pa.int64()), ('session_id', pa.string()), ('created_at', pa.timestamp('us')),
+        ('vata_score', pa.float64()), ('pitta_score', pa.float64()), ('kapha_score', pa.float64()),
+        ('dominant_dosha', pa.string()), ('secondary_dosha', pa.string()), ('assessment_data', pa.string())
+    ]
+    fields += [(column, pa.list_(pa.string())) for column in columns[len(EXPORT_COLUMNS):]]
+    schema = pa.schema(fields)
+
+    def stream():
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, schema, compression='zstd')
+        for batch in batches:
+            table = pa.Table.from_pydict({
+                name: [
+                    json.dumps(row.get(name)) if name == 'assessment_data' else row.get(name)
+                    for row in batch
+                ]
+                for name, _ in fields
+            }, schema=schema)
+            writer.write_table(table)
+            yield sink.drain()
+        writer.close()
+        yield sink.drain()
+
+    return stream()
+
+
+@router.get("/api/export/assessments", dependencies=[Depends(require_admin)])
+async def export_assessments(format: str = 'ndjson', start: Optional[datetime] = None,
+                             end: Optional[datetime] = None, dominant_dosha: Optional[str] = None,
+                             include_recommendations: bool = False, answer: List[str] = Query(default=[]),
+                             questionnaire_version: Optional[str] = None):
+    """
+    Stream all assessments matching the filters.
+
+    Args:
+        format: 'ndjson', 'csv' or 'parquet'
+        start: Only assessments created at or after this time
+        end: Only assessments created before this time
+        dominant_dosha: Only assessments with this dominant dosha
+        include_recommendations: Add primary/secondary therapies and contraindications
+        answer: Only assessments with this answer, as question_id:answer (repeatable, all must match)
+        questionnaire_version: Questionnaire the answer filters refer to (default if None)
+    """
+    format = format.lower()
+    if format not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format must be 'ndjson', 'csv' or 'parquet'")
+    if dominant_dosha and dominant_dosha not in ('vata', 'pitta', 'kapha'):
+        raise HTTPException(status_code=400, detail="dominant_dosha must be vata, pitta or kapha")
+
+    answers = None
+    if answer:
+        try:
+            questionnaire = load_questionnaire(questionnaire_version)
+            filters = dict(item.split(':', 1) for item in answer)
+            answers = answer_filter(questionnaire, parse_answer_filters(questionnaire, filters))
+        except (ValueError, QuestionnaireError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid answer filter: {e}")
+
+    columns = EXPORT_COLUMNS + (RECOMMENDATION_COLUMNS if include_recommendations else [])
+    batches = _iter_rows(start, end, dominant_dosha, include_recommendations, answers)
+
+    if format == 'ndjson':
+        body = _stream_ndjson(batches)
+    elif format == 'csv':
+        body = _stream_csv(batches, columns)
+    else:
+        body = _stream_parquet(batches, columns)
+
+    filename = f"assessments_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{format}"
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
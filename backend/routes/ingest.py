@@ -0,0 +1,278 @@
+"""
+Bulk Assessment Import
+Streams NDJSON or CSV uploads of keyed-in paper questionnaires into the database
+"""
+import asyncio
+import codecs
+import csv
+import json
+import os
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import insert
+from database.database import SessionLocal, record_write
+from database.models import Assessment
+from Training.prakritimodel import calculate_dosha_scores_batch
+from Training.questionnaire import load_questionnaire, QuestionnaireError, UNANSWERED
+from routes.assessment import assessment_cache
+from utils.admin_auth import require_admin
+
+router = APIRouter()
+
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "1000"))
+INGEST_MAX_ERRORS = int(os.getenv("INGEST_MAX_ERRORS", "1000"))
+INGEST_MAX_RECORD_LENGTH = int(os.getenv("INGEST_MAX_RECORD_LENGTH", str(64 * 1024)))
+
+# Row fields that are not question answers
+META_FIELDS = {'session_id', 'created_at', 'questionnaire_version', 'confirmed_dosha'}
+
+
+class RowError(ValueError):
+    """A single uploaded row failed validation"""
+
+
+async def _iter_lines(request: Request):
+    """Yield complete text lines from the request body as it streams in"""
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    pending = ''
+    async for chunk in request.stream():
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split('\n')
+        for line in lines:
+            yield line + '\n'
+        if len(pending) > INGEST_MAX_RECORD_LENGTH:
+            raise HTTPException(status_code=413, detail="Record exceeds maximum length")
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+async def _iter_ndjson_records(request: Request):
+    """Yield (row_number, record) pairs; unparseable lines yield a RowError"""
+    row_number = 0
+    async for line in _iter_lines(request):
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("expected a JSON object")
+            yield row_number, record
+        except ValueError as e:
+            yield row_number, RowError(f"invalid JSON: {e}")
+
+
+async def _iter_csv_records(request: Request):
+    """
+    Yield (row_number, record) pairs from a CSV body with a header row.
+
+    Lines are buffered until their quotes balance, so quoted fields may span
+    lines and chunk boundaries.
+    """
+    header = None
+    record_text = ''
+    row_number = 0
+    async for line in _iter_lines(request):
+        record_text += line
+        if record_text.count('"') % 2:
+            if len(record_text) > INGEST_MAX_RECORD_LENGTH:
+                raise HTTPException(status_code=413, detail="Record exceeds maximum length")
+            continue
+        text, record_text = record_text, ''
+        if not text.strip():
+            continue
+
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+
+        row_number += 1
+        if len(values) != len(header):
+            yield row_number, RowError(f"expected {len(header)} columns, got {len(values)}")
+            continue
+        yield row_number, {name: value for name, value in zip(header, values) if value != ''}
+
+    if record_text.strip():
+        yield row_number + 1, RowError("unterminated quoted field")
+
+
+def _parse_record(record, default_version, allow_partial):
+    """
+    Validate one uploaded record.
+
+    Answers may be either at the top level or under 'assessment_data', and may
+    be option labels or option codes in any case.
+
+    Returns:
+        Tuple of (questionnaire, integer answers, row values for the Assessment insert)
+    """
+    session_id = record.get('session_id')
+    if not session_id:
+        raise RowError("missing session_id")
+
+    try:
+        questionnaire = load_questionnaire(record.get('questionnaire_version') or default_version)
+    except QuestionnaireError as e:
+        raise RowError(str(e))
+
+    answers_in = record.get('assessment_data')
+    if answers_in is None:
+        answers_in = {k: v for k, v in record.items() if k not in META_FIELDS}
+    if not isinstance(answers_in, dict):
+        raise RowError("assessment_data must be an object")
+
+    answers = [UNANSWERED] * questionnaire.size
+    for question_id, answer in answers_in.items():
+        i = questionnaire.question_index.get(question_id)
+        if i is None:
+            raise RowError(f"unknown question '{question_id}'")
+        code = questionnaire.parse_answer(i, answer)
+        if code is None:
+            raise RowError(f"invalid answer {answer!r} for '{question_id}'")
+        answers[i] = code
+
+    if not allow_partial:
+        missing = [questionnaire.questions[i]['id'] for i, code in enumerate(answers) if code == UNANSWERED]
+        if missing:
+            raise RowError(f"missing answers for {', '.join(missing)}")
+
+    # Practitioner-confirmed prakriti, the training label for the prakriti classifier
+    confirmed_dosha = str(record.get('confirmed_dosha') or '').strip().lower() or None
+    if confirmed_dosha is not None and confirmed_dosha not in questionnaire.doshas:
+        raise RowError(f"invalid confirmed_dosha {record['confirmed_dosha']!r}")
+
+    values = {
+        'session_id': str(session_id),
+        'assessment_data': questionnaire.decode_answers(answers),
+        'weights_version': questionnaire.weights_version,
+        'answer_code': questionnaire.pack_answers(answers),
+        'confirmed_dosha': confirmed_dosha
+    }
+    if record.get('created_at'):
+        try:
+            values['created_at'] = datetime.fromisoformat(str(record['created_at']))
+        except ValueError:
+            raise RowError(f"invalid created_at {record['created_at']!r}")
+
+    return questionnaire, answers, values
+
+
+def _insert_batch(batch):
+    """Score a batch per questionnaire version and insert it in one transaction"""
+    by_version = {}
+    for _, (questionnaire, answers, values) in batch:
+        by_version.setdefault(questionnaire.version, []).append((answers, values))
+
+    rows = []
+    for version, entries in by_version.items():
+        results = calculate_dosha_scores_batch([answers for answers, _ in entries], version)
+        for (_, values), dosha_results in zip(entries, results):
+            rows.append({
+                **values,
+                'vata_score': dosha_results['percentages']['vata'],
+                'pitta_score': dosha_results['percentages']['pitta'],
+                'kapha_score': dosha_results['percentages']['kapha'],
+                'dominant_dosha': dosha_results['dominant_dosha'],
+                'secondary_dosha': dosha_results['secondary_dosha']
+            })
+
+    # Rows with and without created_at need separate executemany statements
+    db = SessionLocal()
+    try:
+        with_dates = [row for row in rows if 'created_at' in row]
+        without_dates = [row for row in rows if 'created_at' not in row]
+        for group in (with_dates, without_dates):
+            if group:
+                db.execute(insert(Assessment), group)
+        db.commit()
+    finally:
+        db.close()
+    return len(rows)
+
+
+@router.post("/api/assessment/import", dependencies=[Depends(require_admin)])
+async def import_assessments(request: Request, format: str = None,
+                             questionnaire_version: str = None, allow_partial: bool = False):
+    """
+    Import many assessments from an NDJSON or CSV upload.
+
+    The body is parsed as it streams in, valid rows are scored and inserted in
+    batches of INGEST_BATCH_SIZE, and invalid rows are reported by row number
+    (the first INGEST_MAX_ERRORS in detail). Memory use is bounded by the batch
+    size, not the upload size.
+
+    Batches are committed as they fill, so an upload rejected part way through
+    (413, a record over INGEST_MAX_RECORD_LENGTH) keeps the batches before it;
+    the 413 body reports how many rows were imported.
+    """
+    content_type = request.headers.get('content-type', '')
+    format = (format or ('csv' if 'csv' in content_type else 'ndjson')).lower()
+    if format not in ('ndjson', 'csv'):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'csv'")
+    try:
+        load_questionnaire(questionnaire_version)
+    except QuestionnaireError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    records = _iter_csv_records(request) if format == 'csv' else _iter_ndjson_records(request)
+
+    received = imported = failed = 0
+    errors = []
+    batch = []
+
+    def record_error(row_number, message):
+        nonlocal failed
+        failed += 1
+        if len(errors) < INGEST_MAX_ERRORS:
+            errors.append({'row': row_number, 'error': message})
+
+    async def flush(rows):
+        # A failed batch is rolled back as a whole and reported row by row
+        try:
+            inserted = await asyncio.to_thread(_insert_batch, rows)
+        except Exception as e:
+            for row_number, _ in rows:
+                record_error(row_number, f"database error: {e}")
+            return 0
+        for _, (_, _, values) in rows:
+            record_write(values['session_id'])
+            assessment_cache.invalidate(values['session_id'])
+        return inserted
+
+    try:
+        async for row_number, record in records:
+            received += 1
+            if isinstance(record, RowError):
+                record_error(row_number, str(record))
+                continue
+            try:
+                batch.append((row_number, _parse_record(record, questionnaire_version, allow_partial)))
+            except RowError as e:
+                record_error(row_number, str(e))
+                continue
+
+            if len(batch) >= INGEST_BATCH_SIZE:
+                imported += await flush(batch)
+                batch = []
+    except HTTPException as e:
+        # The unflushed batch is dropped; earlier batches are already committed
+        raise HTTPException(status_code=e.status_code, detail={
+            'error': e.detail,
+            'rows_received': received,
+            'rows_imported': imported,
+            'rows_failed': failed,
+            'errors': errors
+        })
+
+    if batch:
+        imported += await flush(batch)
+
+    return {
+        'rows_received': received,
+        'rows_imported': imported,
+        'rows_failed': failed,
+        'errors': errors,
+        'errors_truncated': failed > len(errors)
+    }
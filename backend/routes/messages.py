@@ -0,0 +1,94 @@
+"""
+Chat Message API Endpoints
+Review, search and label logged chat messages
+"""
+import asyncio
+import time
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from database.database import get_db, read_session
+from database.models import ChatMessage
+from database.search import search_messages, SORT_ORDERS
+from utils.admin_auth import require_admin
+from pydantic import BaseModel
+
+router = APIRouter()
+
+SEARCH_MAX_LIMIT = 100
+
+class IntentLabel(BaseModel):
+    intent: str
+
+def _run_search(**kwargs):
+    db = read_session()
+    try:
+        return search_messages(db, **kwargs)
+    finally:
+        db.close()
+
+@router.get("/api/messages/search", dependencies=[Depends(require_admin)])
+async def search_chat_messages(q: str, session_id: Optional[str] = None, sender: Optional[str] = None,
+                               start: Optional[datetime] = None, end: Optional[datetime] = None,
+                               sort: str = 'rank', limit: int = 20, offset: int = 0):
+    """
+    Full-text search over logged chat messages.
+
+    Args:
+        q: Words to find; "quoted text" matches a phrase and word* a prefix
+        session_id: Only messages from this chat session
+        sender: Only 'user' or 'bot' messages
+        start: Only messages at or after this time
+        end: Only messages before this time
+        sort: 'rank' (best match first) or 'newest'
+        limit: Results per page (at most 100)
+        offset: Results to skip
+    """
+    if sort not in SORT_ORDERS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(SORT_ORDERS)}")
+    if not 1 <= limit <= SEARCH_MAX_LIMIT or offset < 0:
+        raise HTTPException(status_code=400, detail=f"limit must be 1-{SEARCH_MAX_LIMIT} and offset non-negative")
+
+    started = time.perf_counter()
+    try:
+        results, has_more = await asyncio.to_thread(
+            _run_search, query=q, session_id=session_id, sender=sender, start=start, end=end,
+            sort=sort, limit=limit, offset=offset
+        )
+    except OperationalError as e:
+        if 'fts5' not in str(e.orig):
+            raise
+        raise HTTPException(status_code=400, detail=f"Invalid search query: {e.orig}")
+
+    return {
+        'query': q,
+        'results': results,
+        'limit': limit,
+        'offset': offset,
+        'has_more': has_more,
+        'took_ms': round((time.perf_counter() - started) * 1000, 2)
+    }
+
+@router.put("/api/messages/{message_id}/intent", dependencies=[Depends(require_admin)])
+async def confirm_intent(message_id: int, label: IntentLabel, db: Session = Depends(get_db)):
+    """
+    Set the confirmed intent of a logged user message for online training.
+
+    Labels feed the model, so this needs the admin token. A relabelled
+    message is queued to be learned again.
+    """
+    message = db.query(ChatMessage).filter(ChatMessage.id == message_id).first()
+
+    if not message:
+        raise HTTPException(status_code=404, detail="Message not found")
+    if message.sender != 'user':
+        raise HTTPException(status_code=400, detail="Only user messages can be labelled")
+
+    message.intent = label.intent
+    message.intent_confirmed = True
+    message.intent_trained = False
+    db.commit()
+
+    return {'id': message.id, 'intent': message.intent, 'intent_confirmed': True}
@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Response
-from utils.pdf_generator import generate_pdf_report
 
 router = APIRouter()
 
 @router.post("/generate")
 async def generate_pdf(data: dict):
+    # reportlab is only imported once the first report is requested
+    from utils.pdf_generator import generate_pdf_report
+
     user_data = data["user_data"]
     dosha_results = data["dosha_results"]
     panchakarma_recs = data["panchakarma_recs"]
@@ -0,0 +1,37 @@
+"""
+Questionnaire Manifest Endpoints
+Serves versioned questionnaires so clients can cache them and use compact chat frames
+"""
+from fastapi import APIRouter, HTTPException, Request, Response
+from Training.questionnaire import (
+    load_questionnaire, available_versions, QuestionnaireError, DEFAULT_QUESTIONNAIRE_VERSION
+)
+
+router = APIRouter()
+
+MANIFEST_CACHE_CONTROL = "public, max-age=3600"
+
+@router.get("/api/questionnaires")
+async def list_questionnaires():
+    """List available questionnaire versions"""
+    return {
+        'default': DEFAULT_QUESTIONNAIRE_VERSION,
+        'versions': available_versions()
+    }
+
+@router.get("/api/questionnaires/{version}")
+async def get_questionnaire_manifest(version: str, request: Request):
+    """Return a questionnaire manifest, honouring If-None-Match"""
+    try:
+        questionnaire = load_questionnaire(version)
+    except QuestionnaireError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    headers = {
+        'ETag': questionnaire.manifest_etag,
+        'Cache-Control': MANIFEST_CACHE_CONTROL
+    }
+    if questionnaire.manifest_etag in request.headers.get('if-none-match', ''):
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=questionnaire.manifest_json, media_type="application/json", headers=headers)
@@ -0,0 +1,40 @@
+"""
+Therapy Knowledge Base Endpoints
+Lists the therapy catalogue and answers therapy queries for a dosha mix
+"""
+from typing import Optional
+from fastapi import APIRouter, HTTPException
+from Training.therapy_kb import load_knowledge_base, KnowledgeBaseError
+
+router = APIRouter()
+
+
+def _split(value):
+    return [part.strip() for part in (value or '').split(',') if part.strip()]
+
+
+@router.get("/api/therapies")
+async def list_therapies():
+    """Return every therapy with its details, and the conditions that can be filtered on"""
+    return load_knowledge_base().catalogue()
+
+
+@router.get("/api/therapies/query")
+async def query_therapies(doshas: str, conditions: Optional[str] = None, limit: Optional[int] = None):
+    """
+    Therapies indicated for a dosha mix, and the ones excluded with reasons.
+
+    Args:
+        doshas: Comma-separated doshas, dominant first
+        conditions: Comma-separated condition ids that also contraindicate therapies
+        limit: Keep at most this many primary and secondary therapies
+    """
+    if limit is not None and limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be positive")
+    dosha_list = _split(doshas)
+    if not dosha_list:
+        raise HTTPException(status_code=400, detail="doshas must name at least one dosha")
+    try:
+        return load_knowledge_base().query(dosha_list, _split(conditions), limit)
+    except KnowledgeBaseError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -7,17 +7,26 @@ import os
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(__file__))
 
-print("Training chatbot model...")
-from Training.botmodel import train_chatbot_model
-train_chatbot_model()
+from Training.botmodel import train_chatbot_model, available_languages
+for language in available_languages():
+    print(f"Training chatbot model ({language})...")
+    train_chatbot_model(language=language)
 
 print("\nTraining prakriti model...")
 from Training.prakritimodel import train_prakriti_model
 train_prakriti_model()
 
+print("\nTraining prakriti classifier on confirmed assessments...")
+from Training.prakriti_classifier import train_prakriti_classifier
+train_prakriti_classifier()
+
 print("\nSaving panchakarma recommendations...")
 from Training.panchakarma_model import save_panchakarma_model
 save_panchakarma_model()
 
+print("\nBuilding outcome table...")
+from Training.outcome_table import save_outcome_table
+save_outcome_table()
+
 print("\n✓ All models trained successfully!")
 
@@ -0,0 +1,23 @@
+"""
+Test configuration: point every database and artifact path at a temporary
+directory before any application module is imported
+"""
+import os
+import sys
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix='ayursutra-tests-')
+os.environ.update({
+    'DATABASE_URL': f"sqlite:///{os.path.join(_tmp, 'test.db')}",
+    'ARCHIVE_DIR': os.path.join(_tmp, 'archive'),
+    'RESCORE_CHECKPOINT_DIR': os.path.join(_tmp, 'checkpoints'),
+    'OUTCOME_TABLE_DIR': os.path.join(_tmp, 'models'),
+    'PRAKRITI_CLASSIFIER_DIR': os.path.join(_tmp, 'models'),
+    'TRACE_LOG_PATH': os.path.join(_tmp, 'traces.jsonl'),
+    'STARTUP_METRICS_PATH': os.path.join(_tmp, 'startup_metrics.jsonl'),
+    'TRACING_ENABLED': 'false',
+    'CHAT_PACING': '0',
+    'ADMIN_TOKEN': 'test-admin-token',
+})
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
@@ -0,0 +1,86 @@
+"""An adaptive assessment only ends early when no remaining answers could change its outcome"""
+import itertools
+import random
+
+import pytest
+
+from routes import chat
+from Training.prakritimodel import summarize_scores
+from Training.questionnaire import SECONDARY_THRESHOLD, UNANSWERED, load_questionnaire
+
+
+@pytest.fixture(scope='module')
+def questionnaire():
+    return load_questionnaire('v1')
+
+
+def _outcome(questionnaire, answers):
+    """The outcome of a complete assessment, straight from summarize_scores"""
+    results = summarize_scores(questionnaire.score(answers))
+    secondary = results['secondary_dosha']
+    return results['dominant_dosha'], secondary, results['percentages'][secondary] > SECONDARY_THRESHOLD
+
+
+def _completions(questionnaire, answers):
+    remaining = [i for i, code in enumerate(answers) if code == UNANSWERED]
+    for codes in itertools.product(*(sorted(set(questionnaire.option_codes[i])) for i in remaining)):
+        completed = list(answers)
+        for i, code in zip(remaining, codes):
+            completed[i] = code
+        yield completed
+
+
+def _partial_answers(questionnaire, rng, unanswered):
+    """Answers leaning towards one dosha, like most real respondents, with some left open"""
+    lean = rng.randrange(len(questionnaire.doshas))
+    answers = [
+        max(codes, key=lambda code: questionnaire.score_rows[i][code][lean]) if rng.random() < 0.7
+        else rng.choice(codes)
+        for i, codes in enumerate(questionnaire.option_codes)
+    ]
+    for i in rng.sample(range(questionnaire.size), unanswered):
+        answers[i] = UNANSWERED
+    return answers
+
+
+def test_complete_assessments_are_decided_as_scored(questionnaire):
+    rng = random.Random(7)
+    for _ in range(300):
+        answers = _partial_answers(questionnaire, rng, 0)
+        assert questionnaire.decided_outcome(answers) == _outcome(questionnaire, answers)
+
+
+@pytest.mark.parametrize('unanswered', [1, 2, 3, 4])
+def test_decided_outcome_agrees_with_brute_force(questionnaire, unanswered):
+    rng = random.Random(unanswered)
+    for _ in range(200):
+        answers = _partial_answers(questionnaire, rng, unanswered)
+        outcome = questionnaire.decided_outcome(answers)
+        outcomes = {_outcome(questionnaire, completed) for completed in _completions(questionnaire, answers)}
+        # Decided exactly when every completion ends the same way (v1's bounds are tight)
+        assert outcome == (next(iter(outcomes)) if len(outcomes) == 1 else None)
+        # Running totals give the same answer as summing
+        totals = list(questionnaire.score(answers).values())
+        assert questionnaire.decided_outcome(answers, totals) == outcome
+
+
+def test_most_informative_question_is_unanswered(questionnaire):
+    rng = random.Random(3)
+    for unanswered in range(1, questionnaire.size):
+        answers = _partial_answers(questionnaire, rng, unanswered)
+        assert answers[questionnaire.most_informative_question(answers)] == UNANSWERED
+    assert questionnaire.most_informative_question([0] * questionnaire.size) is None
+
+
+def test_chat_stops_once_decided(questionnaire, monkeypatch):
+    monkeypatch.setattr(chat, 'ADAPTIVE_ASSESSMENT', True)
+    rng = random.Random(11)
+    for _ in range(50):
+        final = _partial_answers(questionnaire, rng, 0)
+        answers = [UNANSWERED] * questionnaire.size
+        question = 0
+        while question >= 0:
+            answers[question] = final[question]
+            question = chat.next_question_index(questionnaire, answers, question)
+        outcomes = {_outcome(questionnaire, completed) for completed in _completions(questionnaire, answers)}
+        assert outcomes == {_outcome(questionnaire, final)}
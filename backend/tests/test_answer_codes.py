@@ -0,0 +1,95 @@
+"""Bit-packed answer codes round-trip, and answer filters select exactly the matching assessments"""
+import random
+
+import pytest
+from sqlalchemy import select
+
+from database.answer_codes import answer_filter, assessments, backfill_answer_codes, parse_answer_filters
+from database.database import Base, SessionLocal, engine
+from database.models import Assessment
+from Training.questionnaire import UNANSWERED, load_questionnaire
+
+
+@pytest.fixture(scope='module')
+def questionnaire():
+    return load_questionnaire('v1')
+
+
+def _random_answers(questionnaire, rng, unanswered=0.2):
+    return [UNANSWERED if rng.random() < unanswered else rng.choice(codes)
+            for codes in questionnaire.option_codes]
+
+
+def test_packing_round_trips(questionnaire):
+    rng = random.Random(1)
+    vectors = [_random_answers(questionnaire, rng) for _ in range(500)]
+    vectors += [[UNANSWERED] * questionnaire.size]
+    packed = questionnaire.pack_answers_batch(vectors)
+    for answers, code in zip(vectors, packed):
+        assert int(code) == questionnaire.pack_answers(answers)
+        assert questionnaire.unpack_answers(int(code)) == answers
+    assert questionnaire.pack_answers([UNANSWERED] * questionnaire.size) == 0
+    assert max(map(int, packed)) < 1 << questionnaire.answer_code_bits
+
+
+def test_answer_mask_matches_exactly_the_filtered_answers(questionnaire):
+    rng = random.Random(2)
+    vectors = [_random_answers(questionnaire, rng) for _ in range(2000)]
+    for _ in range(50):
+        questions = rng.sample(range(questionnaire.size), rng.randint(1, 3))
+        wanted = {i: rng.choice(questionnaire.option_codes[i]) for i in questions}
+        mask, value, low, high = questionnaire.answer_mask(wanted)
+        for answers in vectors:
+            code = questionnaire.pack_answers(answers)
+            matches = all(answers[i] == j for i, j in wanted.items())
+            assert (code & mask == value) == matches
+            if matches:
+                assert low <= code <= high
+
+
+@pytest.fixture
+def stored(questionnaire):
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(3)
+    rows = {}
+    db = SessionLocal()
+    for n in range(60):
+        answers = _random_answers(questionnaire, rng)
+        session_id = f"codes-{n}"
+        rows[session_id] = answers
+        db.add(Assessment(session_id=session_id, assessment_data=questionnaire.decode_answers(answers),
+                          weights_version=questionnaire.weights_version if n % 2 else None))
+    # Another questionnaire's row and a row without usable answers
+    db.add(Assessment(session_id='codes-other', assessment_data={}, weights_version='v9:abc'))
+    db.add(Assessment(session_id='codes-broken', assessment_data=['not', 'a', 'dict']))
+    db.commit()
+    db.close()
+    yield rows
+    db = SessionLocal()
+    db.query(Assessment).delete()
+    db.commit()
+    db.close()
+
+
+def test_backfill_then_filter(questionnaire, stored):
+    counts = backfill_answer_codes(chunk_size=7, pause=0)
+    assert counts == {'updated': 60, 'skipped': 2}
+    assert backfill_answer_codes(chunk_size=7, pause=0) == {'updated': 0, 'skipped': 2}
+
+    with engine.connect() as conn:
+        codes = dict(conn.execute(select(assessments.c.session_id, assessments.c.answer_code)).all())
+    for session_id, answers in stored.items():
+        assert questionnaire.unpack_answers(codes[session_id]) == answers
+
+    filters = {'body_frame': 'Thin and light', 'sleep': questionnaire.codes[6][1]}
+    wanted = parse_answer_filters(questionnaire, filters)
+    with engine.connect() as conn:
+        found = set(conn.execute(select(assessments.c.session_id).where(answer_filter(questionnaire, wanted))).scalars())
+    expected = {session_id for session_id, answers in stored.items()
+                if all(answers[i] == j for i, j in wanted.items())}
+    assert expected and found == expected
+
+    with pytest.raises(ValueError):
+        parse_answer_filters(questionnaire, {'body_frame': 'Enormous'})
+    with pytest.raises(ValueError):
+        parse_answer_filters(questionnaire, {'shoe_size': 'large'})
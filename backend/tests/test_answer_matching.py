@@ -0,0 +1,77 @@
+"""Free-text replies resolve to questionnaire options"""
+import pytest
+
+from routes.chat import resolve_answer
+from Training.questionnaire import load_questionnaire
+from utils import nlp_processor
+from utils.keyword_matcher import AnswerMatcher, KeywordMatcher
+
+
+@pytest.fixture(scope='module')
+def options():
+    return load_questionnaire('v1').option_mapping()
+
+
+@pytest.fixture(scope='module')
+def matcher(options):
+    return AnswerMatcher(options)
+
+
+@pytest.mark.parametrize('question_id, text, code', [
+    ('body_frame', "I'm pretty thin and always cold", 'thin'),
+    ('skin_type', 'my skin is oily', 'oily'),
+    ('weather_preference', 'I like warm weather', 'warm'),
+    ('body_frame', 'Heavy and large', 'heavy'),
+])
+def test_reply_resolves_to_option_code(matcher, options, question_id, text, code):
+    label = matcher.match(question_id, text)
+    assert label is not None
+    assert options[question_id][label] == code
+
+
+def test_tie_between_different_codes_is_ambiguous(matcher):
+    # 'Fine and oily' and 'Thick and oily' score different codes
+    assert matcher.match('hair_texture', 'my hair is oily') is None
+
+
+def test_negated_keyword_does_not_vote(matcher):
+    assert matcher.match('body_frame', 'not thin') is None
+    assert matcher.match('body_frame', "I'm not thin, more of a heavy build") == 'Heavy and large'
+
+
+def test_unknown_question_and_no_match(matcher):
+    assert matcher.match('no_such_question', 'thin') is None
+    assert matcher.match('body_frame', 'purple') is None
+
+
+def test_keyword_matcher_respects_word_boundaries():
+    keywords = KeywordMatcher([('thin', 'thin'), ('he', 'he')])
+    assert keywords.values('nothing to see') == set()
+    assert keywords.values('He is thin') == {'thin', 'he'}
+
+
+def test_dosha_keywords_match_whole_lemmatized_words(monkeypatch):
+    tokenize, stop_words, _ = nlp_processor.load_nlp_resources()
+    # Stand-in for WordNet (not installed everywhere): plural nouns to their lemma
+    monkeypatch.setattr(nlp_processor, '_resources',
+                        (tokenize, stop_words, lambda word: word[:-1] if word.endswith('s') else word))
+    # Substring matching used to find 'thin' in 'nothing' and 'cold' in 'colder'
+    assert nlp_processor.extract_dosha_keywords('nothing feels colder') == []
+    assert nlp_processor.extract_dosha_keywords('my hands are always cold') == ['vata']
+    assert nlp_processor.extract_dosha_keywords('I have intense, sharp moods') == ['pitta']
+    assert nlp_processor.extract_dosha_keywords('my hairs are thicks') == ['kapha']
+    assert nlp_processor.extract_dosha_keywords("I'm not anxious, just calm") == ['kapha']
+
+
+@pytest.mark.parametrize('question_id, text, label', [
+    ('body_frame', "I'm always cold", 'Thin and light'),
+    ('digestion', 'it is quick', 'Irregular'),
+    ('energy_level', 'I am calm most days', 'Low and steady'),
+    ('body_frame', 'cold but calm', None),
+    ('body_frame', 'not cold', None),
+])
+def test_dosha_keywords_answer_when_no_option_words_match(question_id, text, label):
+    questionnaire = load_questionnaire('v1')
+    i = questionnaire.question_index[question_id]
+    option = resolve_answer(questionnaire, i, text)
+    assert (None if option is None else questionnaire.option_labels[i][option]) == label
@@ -0,0 +1,98 @@
+"""Assessment validators (ETag and Last-Modified) follow the response body, including after a background rescore"""
+import time
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from database.database import Base, SessionLocal, engine
+from database.models import Assessment
+from routes import admin, assessment
+from Training.prakritimodel import calculate_dosha_scores
+from Training.questionnaire import load_questionnaire
+
+ADMIN_HEADERS = {'X-Admin-Token': 'test-admin-token'}
+
+
+@pytest.fixture
+def client():
+    Base.metadata.create_all(bind=engine)
+    app = FastAPI()
+    app.include_router(assessment.router)
+    app.include_router(admin.router)
+    with TestClient(app) as client:
+        yield client
+    db = SessionLocal()
+    db.query(Assessment).delete()
+    db.commit()
+    db.close()
+    assessment.assessment_cache.invalidate('etag-session')
+
+
+def _run_rescore(client):
+    assert client.post('/admin/rescore', headers=ADMIN_HEADERS).status_code == 202
+    deadline = time.monotonic() + 10
+    while client.get('/admin/rescore', headers=ADMIN_HEADERS).json()['state'] == 'running':
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    assert client.get('/admin/rescore', headers=ADMIN_HEADERS).json()['updated'] == 1
+
+
+def test_etag_changes_when_a_rescore_rewrites_the_scores(client, monkeypatch):
+    questionnaire = load_questionnaire()
+    answers = {question['id']: questionnaire.codes[i][1] for i, question in enumerate(questionnaire.questions)}
+    # Scores stored under the weights in force when the assessment was taken
+    db = SessionLocal()
+    db.add(Assessment(session_id='etag-session', vata_score=80.0, pitta_score=15.0, kapha_score=5.0,
+                      dominant_dosha='vata', secondary_dosha='pitta', assessment_data=answers,
+                      weights_version=questionnaire.weights_version))
+    db.commit()
+    db.close()
+
+    first = client.get('/api/assessment/etag-session')
+    assert first.status_code == 200
+    etag = first.headers['etag']
+    assert client.get('/api/assessment/etag-session', headers={'If-None-Match': etag}).status_code == 304
+
+    # New weights are deployed and the background job rescores the stored row
+    monkeypatch.setattr(questionnaire, 'weights_version', f"{questionnaire.version}:next")
+    _run_rescore(client)
+
+    second = client.get('/api/assessment/etag-session', headers={'If-None-Match': etag})
+    assert second.status_code == 200
+    assert second.headers['etag'] != etag
+    assert second.json()['dosha_results']['dominant_dosha'] == calculate_dosha_scores(answers)['dominant_dosha']
+
+
+def test_last_modified_moves_to_the_rescore(client, monkeypatch):
+    questionnaire = load_questionnaire()
+    answers = {question['id']: questionnaire.codes[i][1] for i, question in enumerate(questionnaire.questions)}
+    db = SessionLocal()
+    db.add(Assessment(session_id='etag-session', vata_score=80.0, pitta_score=15.0, kapha_score=5.0,
+                      dominant_dosha='vata', secondary_dosha='pitta', assessment_data=answers,
+                      weights_version=questionnaire.weights_version, created_at=datetime(2020, 1, 1)))
+    db.commit()
+    db.close()
+
+    first = client.get('/api/assessment/etag-session')
+    created = first.headers['last-modified']
+    assert created == 'Wed, 01 Jan 2020 00:00:00 GMT'
+    assert client.get('/api/assessment/etag-session', headers={'If-Modified-Since': created}).status_code == 304
+
+    # Rescored on read: no stored modification time, so If-Modified-Since can't match
+    monkeypatch.setattr(questionnaire, 'weights_version', f"{questionnaire.version}:next")
+    assessment.assessment_cache.invalidate('etag-session')
+    on_read = client.get('/api/assessment/etag-session', headers={'If-Modified-Since': created})
+    assert on_read.status_code == 200
+    assert 'last-modified' not in on_read.headers
+
+    # Rescored by the job: Last-Modified is the time of the rewrite
+    _run_rescore(client)
+    rescored = client.get('/api/assessment/etag-session', headers={'If-Modified-Since': created})
+    assert rescored.status_code == 200
+    assert rescored.json()['dosha_results'] == on_read.json()['dosha_results']
+    last_modified = rescored.headers['last-modified']
+    assert last_modified != created
+    assert client.get('/api/assessment/etag-session',
+                      headers={'If-Modified-Since': last_modified}).status_code == 304
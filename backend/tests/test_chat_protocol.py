@@ -0,0 +1,56 @@
+"""Malformed client frames are reported instead of dropping the connection"""
+import msgpack
+import pytest
+from fastapi.testclient import TestClient
+
+from Training.questionnaire import load_questionnaire
+from utils.chat_protocol import COMPACT_SUBPROTOCOL, ProtocolError, decode_compact, decode_json
+
+
+@pytest.fixture(scope='module')
+def questionnaire():
+    return load_questionnaire('v1')
+
+
+@pytest.mark.parametrize('frame', [[1, 2], 'text', 7, {'m': 5}, {'m': ['a']}])
+def test_compact_frame_of_wrong_type_is_a_protocol_error(questionnaire, frame):
+    with pytest.raises(ProtocolError):
+        decode_compact(msgpack.packb(frame), questionnaire, 0)
+
+
+def test_compact_garbage_is_a_protocol_error(questionnaire):
+    with pytest.raises(ProtocolError):
+        decode_compact(b'\xc1', questionnaire, 0)
+
+
+def test_compact_answers_decode(questionnaire):
+    assert decode_compact(msgpack.packb({'a': 0}), questionnaire, 0) == {'message': questionnaire.option_labels[0][0]}
+    assert decode_compact(msgpack.packb({'m': 'hello'}), questionnaire, 0) == {'message': 'hello'}
+
+
+@pytest.mark.parametrize('frame', ['not json', '[1]', '{"message": 3}', '{"message": "x", "question_id": []}'])
+def test_json_frame_of_wrong_shape_is_a_protocol_error(frame):
+    with pytest.raises(ProtocolError):
+        decode_json(frame)
+
+
+def test_connection_survives_malformed_frames():
+    from app import app
+    with TestClient(app) as client:
+        with client.websocket_connect('/ws/chat?session_id=protocol-json') as websocket:
+            assert websocket.receive_json()['type'] == 'message'  # welcome
+            websocket.send_text('[1, 2]')
+            assert websocket.receive_json()['type'] == 'error'
+            websocket.send_json({'message': 'start'})
+            frames = [websocket.receive_json() for _ in range(2)]
+            assert frames[-1]['type'] == 'question'
+
+        with client.websocket_connect('/ws/chat?session_id=protocol-compact',
+                                      subprotocols=[COMPACT_SUBPROTOCOL]) as websocket:
+            assert msgpack.unpackb(websocket.receive_bytes())['t'] == 'h'
+            websocket.receive_bytes()  # welcome
+            websocket.send_bytes(msgpack.packb([1]))
+            assert msgpack.unpackb(websocket.receive_bytes())['t'] == 'e'
+            websocket.send_bytes(msgpack.packb({'m': 'start'}))
+            frames = [msgpack.unpackb(websocket.receive_bytes()) for _ in range(2)]
+            assert frames[-1]['t'] == 'q'
@@ -0,0 +1,37 @@
+"""Chat turns are traced from the arrival of the client frame, without logging its contents"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from database.database import Base, engine
+from routes import chat
+from utils.tracing import Tracer
+
+
+@pytest.fixture
+def traces(monkeypatch):
+    kept = []
+    tracer = Tracer(enabled=True, slow_ms=0, sample_rate=1)
+    monkeypatch.setattr(tracer, '_finish', kept.append)
+    monkeypatch.setattr(chat, 'tracer', tracer)
+    return kept
+
+
+def test_turn_trace_starts_with_decoding_and_messages_are_not_printed(traces, capsys):
+    Base.metadata.create_all(bind=engine)
+    app = FastAPI()
+    app.include_router(chat.router)
+    with TestClient(app).websocket_connect('/ws/chat?session_id=tracing-session') as websocket:
+        websocket.receive_json()  # welcome
+        websocket.send_json({'message': 'my private answer'})
+        frames = [websocket.receive_json() for _ in range(2)]
+    chat.manager.disconnect('tracing-session')
+
+    # An unrecognised answer re-asks the question within the same turn
+    assert [frame['type'] for frame in frames] == ['typing', 'question']
+    assert frames[0]['trace_id'] == frames[1]['trace_id']
+    turn = next(trace for trace in traces if trace.trace_id == frames[1]['trace_id'])
+    assert turn.name == 'chat.turn'
+    assert turn.spans[0]['name'] == 'decode'
+    assert 'receive' not in {span['name'] for span in turn.spans}
+    assert 'private answer' not in capsys.readouterr().out
@@ -0,0 +1,25 @@
+"""Training scripts documented as `python Training/<script>.py` resolve their imports"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+TRAINING_DIR = os.path.join(BACKEND_DIR, 'Training')
+
+# Running a script puts its own directory first on sys.path; emulate that
+# without executing the script's __main__ block (which writes to Models/)
+CHECK = (
+    "import runpy, sys; sys.path[0] = {training_dir!r}; "
+    "runpy.run_path({script!r}, run_name='entry_point_check')"
+)
+
+
+@pytest.mark.parametrize('script', ['prakritimodel.py', 'panchakarma_model.py', 'botmodel.py'])
+def test_script_imports_resolve(script, tmp_path):
+    code = CHECK.format(training_dir=TRAINING_DIR, script=os.path.join(TRAINING_DIR, script))
+    env = {key: value for key, value in os.environ.items() if key != 'PYTHONPATH'}
+    result = subprocess.run([sys.executable, '-c', code], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
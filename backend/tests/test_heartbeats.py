@@ -0,0 +1,73 @@
+"""Heartbeat pings and reaping never write to a socket while the chat loop is sending"""
+import asyncio
+import time
+
+from routes import chat
+
+
+class SlowSocket:
+    """Records frames and fails if two writes overlap"""
+
+    def __init__(self):
+        self.frames = []
+        self.writing = False
+        self.overlapped = False
+
+    async def accept(self, subprotocol=None):
+        pass
+
+    async def _write(self, frame):
+        self.overlapped |= self.writing
+        self.writing = True
+        await asyncio.sleep(0.05)
+        self.writing = False
+        self.frames.append(frame)
+
+    async def send_json(self, message):
+        await self._write(message['type'])
+
+    async def close(self, code=1000, reason=None):
+        await self._write('close')
+
+
+async def _connected(session_id):
+    manager = chat.ConnectionManager()
+    websocket = SlowSocket()
+    await manager.connect(websocket, session_id, None)
+    # The client has been silent for longer than the heartbeat interval
+    manager.connection_state[session_id]['last_seen'] -= chat.WS_HEARTBEAT_INTERVAL + 1
+    return manager, websocket
+
+
+def test_ping_waits_for_a_send_in_flight():
+    async def run():
+        manager, websocket = await _connected('heartbeat-send')
+        reply = asyncio.create_task(manager.send_personal_message({'type': 'message'}, 'heartbeat-send'))
+        await asyncio.sleep(0.01)
+        await manager._check_connection('heartbeat-send')  # deferred, not blocked
+        assert manager.pings_sent == 0
+        await reply
+        await manager._check_connection('heartbeat-send')
+        return manager, websocket
+
+    manager, websocket = asyncio.run(run())
+    assert websocket.frames == ['message', 'ping']
+    assert manager.pings_sent == 1
+    assert not websocket.overlapped
+
+
+def test_reaped_connection_closes_after_the_send_in_flight():
+    async def run():
+        manager, websocket = await _connected('heartbeat-reap')
+        manager.connection_state['heartbeat-reap']['ping_sent'] = time.monotonic() - chat.WS_PONG_TIMEOUT - 1
+        reply = asyncio.create_task(manager.send_personal_message({'type': 'message'}, 'heartbeat-reap'))
+        await asyncio.sleep(0.01)
+        await manager._check_connection('heartbeat-reap')
+        await reply
+        await asyncio.gather(*manager._closing)
+        return manager, websocket
+
+    manager, websocket = asyncio.run(run())
+    assert websocket.frames == ['message', 'close']
+    assert manager.reaped['heartbeat'] == 1
+    assert not websocket.overlapped
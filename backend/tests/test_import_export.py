@@ -0,0 +1,117 @@
+"""Bulk import and export are admin-only, import reports partial commits, and the two round-trip"""
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from database.database import Base, SessionLocal, engine
+from database.models import Assessment
+from routes import export, ingest
+from Training.prakritimodel import calculate_dosha_scores
+from Training.questionnaire import load_questionnaire
+
+ADMIN_HEADERS = {'X-Admin-Token': 'test-admin-token'}
+
+
+@pytest.fixture
+def client():
+    Base.metadata.create_all(bind=engine)
+    app = FastAPI()
+    app.include_router(ingest.router)
+    app.include_router(export.router)
+    yield TestClient(app)
+    db = SessionLocal()
+    db.query(Assessment).delete()
+    db.commit()
+    db.close()
+
+
+def _records(count):
+    questionnaire = load_questionnaire()
+    return [
+        {'session_id': f"import-{n}",
+         **{question['id']: question['options'][n % len(question['options'])]
+            for question in questionnaire.questions}}
+        for n in range(count)
+    ]
+
+
+def _ndjson(records):
+    return ''.join(json.dumps(record) + '\n' for record in records)
+
+
+def test_import_requires_the_admin_token(client):
+    body = _ndjson(_records(1))
+    assert client.post('/api/assessment/import', content=body).status_code == 403
+    assert client.post('/api/assessment/import', content=body,
+                       headers={'X-Admin-Token': 'wrong'}).status_code == 403
+    db = SessionLocal()
+    assert db.query(Assessment).count() == 0
+    db.close()
+
+
+def test_confirmed_prakriti_is_only_imported_by_admins(client):
+    record = {**_records(1)[0], 'confirmed_dosha': 'kapha'}
+    assert client.post('/api/assessment/import', content=_ndjson([record])).status_code == 403
+    db = SessionLocal()
+    assert db.query(Assessment).count() == 0
+
+    response = client.post('/api/assessment/import', content=_ndjson([record]), headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    assert db.query(Assessment).one().confirmed_dosha == 'kapha'
+    db.close()
+
+
+def test_export_requires_the_admin_token(client):
+    client.post('/api/assessment/import', content=_ndjson(_records(1)), headers=ADMIN_HEADERS)
+    for format in ('ndjson', 'csv', 'parquet'):
+        response = client.get('/api/export/assessments', params={'format': format})
+        assert response.status_code == 403
+        assert 'import-0' not in response.text
+
+
+def test_imported_assessments_come_back_out_of_the_export(client):
+    records = _records(5)
+    response = client.post('/api/assessment/import', content=_ndjson(records), headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    assert response.json()['rows_imported'] == 5
+
+    exported = client.get('/api/export/assessments', headers=ADMIN_HEADERS)
+    assert exported.status_code == 200
+    rows = {row['session_id']: row for row in map(json.loads, exported.text.splitlines())}
+    assert set(rows) == {record['session_id'] for record in records}
+    questionnaire = load_questionnaire()
+    for record in records:
+        answers = {k: v for k, v in record.items() if k != 'session_id'}
+        codes = [questionnaire.parse_answer(i, answers[question['id']])
+                 for i, question in enumerate(questionnaire.questions)]
+        row = rows[record['session_id']]
+        assert row['assessment_data'] == questionnaire.decode_answers(codes)
+        expected = calculate_dosha_scores(row['assessment_data'])
+        assert row['dominant_dosha'] == expected['dominant_dosha']
+        assert row['vata_score'] == pytest.approx(expected['percentages']['vata'])
+
+    # The exported NDJSON is itself a valid import
+    db = SessionLocal()
+    db.query(Assessment).delete()
+    db.commit()
+    db.close()
+    reimported = client.post('/api/assessment/import', content=exported.text, headers=ADMIN_HEADERS)
+    assert reimported.json()['rows_imported'] == 5
+
+
+def test_oversized_record_reports_the_batches_already_committed(client, monkeypatch):
+    monkeypatch.setattr(ingest, 'INGEST_BATCH_SIZE', 2)
+    monkeypatch.setattr(ingest, 'INGEST_MAX_RECORD_LENGTH', 4096)
+    body = _ndjson(_records(3)) + '{"session_id": "' + 'x' * 8192
+
+    response = client.post('/api/assessment/import', content=body, headers=ADMIN_HEADERS)
+    assert response.status_code == 413
+    detail = response.json()['detail']
+    assert detail['rows_received'] == 3
+    assert detail['rows_imported'] == 2
+
+    db = SessionLocal()
+    assert db.query(Assessment).count() == 2
+    db.close()
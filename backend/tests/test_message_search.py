@@ -0,0 +1,44 @@
+"""Chat message search is admin-only and finds logged messages by their words"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from database.database import Base, SessionLocal, engine
+from database.models import ChatMessage
+from database.search import ensure_search_index
+from routes import messages
+
+ADMIN_HEADERS = {'X-Admin-Token': 'test-admin-token'}
+
+
+@pytest.fixture
+def client():
+    Base.metadata.create_all(bind=engine)
+    ensure_search_index(engine)
+    db = SessionLocal()
+    db.add_all([
+        ChatMessage(session_id='search-a', message='My digestion is irregular after dinner', sender='user'),
+        ChatMessage(session_id='search-b', message='I sleep lightly and wake at night', sender='user'),
+    ])
+    db.commit()
+    db.close()
+    app = FastAPI()
+    app.include_router(messages.router)
+    yield TestClient(app)
+    db = SessionLocal()
+    db.query(ChatMessage).delete()
+    db.commit()
+    db.close()
+
+
+@pytest.mark.parametrize('headers', [{}, {'X-Admin-Token': 'wrong'}])
+def test_search_requires_the_admin_token(client, headers):
+    response = client.get('/api/messages/search', params={'q': 'digestion'}, headers=headers)
+    assert response.status_code == 403
+    assert 'irregular' not in response.text
+
+
+def test_admin_search_finds_messages(client):
+    response = client.get('/api/messages/search', params={'q': 'digest*'}, headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    assert [row['session_id'] for row in response.json()['results']] == ['search-a']
@@ -0,0 +1,106 @@
+"""ModelCache loads each language once, outside its lock, and never blocks peek; untrained languages are never fitted"""
+import os
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils.model_cache import ModelCache
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def test_peek_does_not_wait_for_a_load():
+    started, release = threading.Event(), threading.Event()
+
+    def loader(language):
+        started.set()
+        release.wait(5)
+        return language.upper(), 1
+
+    cache = ModelCache(loader, max_bytes=10, pinned=('en',))
+    cache.put('en', 'EN', 1)
+    with ThreadPoolExecutor(1) as pool:
+        loading = pool.submit(cache.get, 'hi')
+        assert started.wait(5)
+        # Another thread is inside the loader; reads must still answer immediately
+        assert cache.peek('en') == 'EN'
+        assert cache.peek('hi') is None
+        release.set()
+        assert loading.result(5) == 'HI'
+    assert cache.peek('hi') == 'HI'
+
+
+def test_concurrent_misses_load_once():
+    release = threading.Event()
+    calls = []
+
+    def loader(language):
+        calls.append(language)
+        release.wait(5)
+        return language.upper(), 1
+
+    cache = ModelCache(loader, max_bytes=10)
+    with ThreadPoolExecutor(4) as pool:
+        results = [pool.submit(cache.get, 'mr') for _ in range(4)]
+        release.set()
+        assert [r.result(5) for r in results] == ['MR'] * 4
+    assert calls == ['mr']
+    assert cache.stats()['misses'] == 1
+
+
+def test_failed_load_reaches_waiters_and_is_retried():
+    attempts = []
+
+    def loader(language):
+        attempts.append(language)
+        if len(attempts) == 1:
+            raise FileNotFoundError(language)
+        return language.upper(), 1
+
+    cache = ModelCache(loader, max_bytes=10)
+    with pytest.raises(FileNotFoundError):
+        cache.get('hi')
+    assert cache.get('hi') == 'HI'
+    assert not cache._loading
+
+
+def test_evicts_least_recently_peeked():
+    cache = ModelCache(lambda language: (language.upper(), 4), max_bytes=10, pinned=('en',))
+    cache.put('en', 'EN', 2)
+    cache.get('hi')
+    cache.get('mr')
+    cache.peek('hi')
+    cache.get('ta')
+    assert cache.stats()['languages'] == ['en', 'hi', 'ta']
+    assert cache.stats()['evictions'] == 1
+
+
+def test_importing_the_app_skips_sklearn():
+    code = "import sys; import app; print(any(m.startswith('sklearn') for m in sys.modules))"
+    result = subprocess.run([sys.executable, '-c', code], cwd=BACKEND_DIR,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == 'False'
+
+
+def test_untrained_language_falls_back_without_training(tmp_path, monkeypatch, capsys):
+    import asyncio
+    from routes import chat
+    from Training import botmodel
+
+    def no_training(*args, **kwargs):
+        raise AssertionError("the server must not train models")
+
+    monkeypatch.setattr(chat, 'models_dir', str(tmp_path))
+    monkeypatch.setattr(chat, 'model_cache', ModelCache(chat.load_language_model, 1 << 20, pinned=('en',)))
+    monkeypatch.setattr(botmodel, 'default_pipeline', no_training)
+
+    with pytest.raises(FileNotFoundError, match='botmodel.py --language hi'):
+        chat.load_language_model('hi')
+    session = {'language': 'hi', 'assessment_complete': True}
+    assert asyncio.run(chat.predict_intent('नमस्ते', session)) is None
+    assert "Failed to load 'hi' chatbot model" in capsys.readouterr().out
+    assert asyncio.run(chat.get_bot_response('नमस्ते', session, 's')) == chat.FALLBACK_RESPONSES['hi']['complete']
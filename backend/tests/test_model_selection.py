@@ -0,0 +1,70 @@
+"""Intent model selection times only the candidates that can still win"""
+import os
+import pickle
+import warnings
+
+from sklearn.base import clone
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.model_selection import GridSearchCV, StratifiedKFold
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.pipeline import Pipeline
+from sklearn.svm import LinearSVC
+
+from Training import botmodel
+
+SEARCH_SPACE = [
+    {
+        'vectorizer': [TfidfVectorizer()],
+        'vectorizer__max_features': [20, 100, None],
+        'classifier': [MultinomialNB()],
+        'classifier__alpha': [0.01, 0.1, 1.0, 5.0]
+    },
+    {
+        'vectorizer': [TfidfVectorizer()],
+        'classifier': [LinearSVC()],
+        'classifier__C': [0.1, 1.0]
+    },
+]
+
+
+def _fake_latency(model, texts=None, samples=None):
+    """Deterministic latencies: linear SVMs blow the budget, everything else is distinct and fast"""
+    slow = isinstance(model.named_steps['classifier'], LinearSVC)
+    p50 = (5.0 if slow else 0.5) + len(repr(model)) / 1e4
+    return p50, p50 * 1.5
+
+
+def test_pruned_selection_matches_an_exhaustive_one(monkeypatch):
+    monkeypatch.setattr(botmodel, 'SEARCH_SPACE', SEARCH_SPACE)
+    monkeypatch.setattr(botmodel, 'measure_predict_latency', _fake_latency)
+    X, y = botmodel.prepare_training_data(botmodel.load_intents())
+    budget, tolerance = 2.0, 0.02
+
+    model, report = botmodel.select_model(X, y, latency_budget_ms=budget, accuracy_tolerance=tolerance, n_jobs=1)
+
+    # Same cross-validation, then every candidate timed and compared
+    search = GridSearchCV(
+        Pipeline([('vectorizer', TfidfVectorizer()), ('classifier', MultinomialNB())]), SEARCH_SPACE,
+        cv=StratifiedKFold(n_splits=report['cv_folds'], shuffle=True, random_state=42),
+        scoring='accuracy', refit=False
+    ).fit(X, y)
+    candidates = []
+    for params, accuracy in zip(search.cv_results_['params'], search.cv_results_['mean_test_score']):
+        p50, p95 = _fake_latency(clone(search.estimator).set_params(**clone(params, safe=False)))
+        candidates.append((params, accuracy, p50, p95))
+    within_budget = [c for c in candidates if c[3] <= budget]
+    best = max(c[1] for c in within_budget)
+    expected = min((c for c in within_budget if c[1] >= best - tolerance), key=lambda c: (c[2], -c[1]))
+
+    assert report['selected']['params'] == botmodel._describe_params(expected[0])
+    assert report['candidates'] == len(candidates)
+    assert report['timed_candidates'] < report['candidates']
+    assert model.named_steps['vectorizer'].get_params()['max_features'] == expected[0]['vectorizer__max_features']
+
+
+def test_shipped_model_uses_the_current_step_names():
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')  # pickled by whichever scikit-learn trained it
+        with open(os.path.join(os.path.dirname(botmodel.__file__), '..', 'Models', 'chatbot_model.pkl'), 'rb') as f:
+            model = pickle.load(f)
+    assert list(model.named_steps) == list(botmodel.default_pipeline().named_steps)
@@ -0,0 +1,92 @@
+"""The online trainer learns every confirmed label exactly once, and the server picks it up"""
+import asyncio
+import os
+import shutil
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from database.database import Base, SessionLocal, engine
+from database.models import ChatMessage
+from routes import chat, messages
+from Training import botmodel, online_trainer
+from utils.model_cache import ModelCache
+
+ADMIN_HEADERS = {'X-Admin-Token': 'test-admin-token'}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    Base.metadata.create_all(bind=engine)
+    model_path = str(tmp_path / 'chatbot_model_online.pkl')
+    monkeypatch.setattr(botmodel, 'online_model_path', lambda: model_path)
+    monkeypatch.setattr(online_trainer, 'online_model_path', lambda: model_path)
+    app = FastAPI()
+    app.include_router(messages.router)
+    yield TestClient(app)
+    db = SessionLocal()
+    db.query(ChatMessage).delete()
+    db.commit()
+    db.close()
+
+
+def _log_messages(texts):
+    db = SessionLocal()
+    rows = [ChatMessage(session_id='s', message=text, sender='user', intent='greeting') for text in texts]
+    db.add_all(rows)
+    db.commit()
+    ids = [row.id for row in rows]
+    db.close()
+    return ids
+
+
+def test_confirming_needs_admin_token(client):
+    [message_id] = _log_messages(['hello there'])
+    assert client.put(f"/api/messages/{message_id}/intent", json={'intent': 'greeting'}).status_code == 403
+
+
+def test_late_confirmed_label_is_learned(client):
+    first, second, third = _log_messages(['hello there', 'hi friend', 'good morning'])
+    for message_id in (first, third):
+        assert client.put(f"/api/messages/{message_id}/intent", json={'intent': 'greeting'},
+                          headers=ADMIN_HEADERS).status_code == 200
+    assert online_trainer.train_incremental() == 2
+
+    # Confirmed after a newer message was trained: a high-water mark would skip it
+    client.put(f"/api/messages/{second}/intent", json={'intent': 'greeting'}, headers=ADMIN_HEADERS)
+    assert online_trainer.train_incremental() == 1
+    assert online_trainer.train_incremental() == 0
+
+    # Relabelling queues the message again
+    client.put(f"/api/messages/{first}/intent", json={'intent': 'goodbye'}, headers=ADMIN_HEADERS)
+    assert online_trainer.train_incremental() == 1
+
+
+def test_predicted_intents_are_not_learned(client):
+    _log_messages(['hello there', 'hi friend'])
+    assert online_trainer.train_incremental() == 0
+
+
+def test_serving_process_reloads_the_trained_model(client, tmp_path, monkeypatch):
+    shutil.copy(os.path.join(chat.models_dir, 'intents.pkl'), tmp_path / 'intents.pkl')
+    monkeypatch.setattr(chat, 'models_dir', str(tmp_path))
+    monkeypatch.setattr(chat, 'CHATBOT_MODEL', 'online')
+    monkeypatch.setattr(chat, 'ONLINE_MODEL_RELOAD_SECONDS', 0)
+    monkeypatch.setattr(chat, 'model_cache', ModelCache(chat.load_language_model, 1 << 30, pinned=('en',)))
+    for name in ('chatbot_model', 'intents_data', '_default_model_mtime', '_next_reload_check'):
+        monkeypatch.setattr(chat, name, getattr(chat, name))
+
+    botmodel.train_online_model()
+    served = chat.load_chatbot_models()
+    [message_id] = _log_messages(['namaste friend'])
+    client.put(f"/api/messages/{message_id}/intent", json={'intent': 'greeting'}, headers=ADMIN_HEADERS)
+    assert online_trainer.train_incremental() == 1
+    # The trainer replaced the file; make sure its mtime moved even on coarse clocks
+    stat = os.stat(tmp_path / 'chatbot_model_online.pkl')
+    os.utime(tmp_path / 'chatbot_model_online.pkl', ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    asyncio.run(chat.predict_intent('hello', {'language': 'en'}))
+    assert chat.chatbot_model is not served
+    assert chat.chatbot_model.samples_seen == served.samples_seen + 1
+    assert chat.model_cache.peek('en')[0] is chat.chatbot_model
@@ -0,0 +1,81 @@
+"""The outcome table gives exactly what scoring each assessment directly gives"""
+import os
+
+import numpy as np
+import pytest
+
+from Training import outcome_table
+from Training.outcome_table import load_outcome_table, save_outcome_table, score_assessment
+from Training.panchakarma_model import get_panchakarma_recommendations
+from Training.prakritimodel import calculate_dosha_scores
+from Training.questionnaire import load_questionnaire, UNANSWERED
+
+
+@pytest.fixture(scope='module')
+def questionnaire():
+    return load_questionnaire()
+
+
+@pytest.fixture(scope='module')
+def table(questionnaire):
+    save_outcome_table(questionnaire.version)
+    return load_outcome_table(questionnaire.version)
+
+
+def random_answers(questionnaire, rows, offered_only, seed=0):
+    """Random answer vectors with some questions unanswered, optionally using unoffered codes"""
+    rng = np.random.default_rng(seed)
+    choices = questionnaire.option_codes if offered_only else [range(len(codes)) for codes in questionnaire.codes]
+    return np.stack([
+        rng.choice(np.array(list(codes) + [UNANSWERED]), size=rows) for codes in choices
+    ], axis=1)
+
+
+def test_lookup_matches_direct_scoring(questionnaire, table):
+    for answers in random_answers(questionnaire, 500, offered_only=True).tolist():
+        expected = calculate_dosha_scores(questionnaire.decode_answers(answers))
+        dosha_results, recommendations = table.lookup(answers)
+        assert dosha_results == expected
+        assert recommendations == get_panchakarma_recommendations(expected)
+        assert table.recommendations_for(expected) == recommendations
+
+
+def test_score_assessment_matches_direct_scoring(questionnaire):
+    # Unoffered codes fall outside the table and are scored directly
+    for answers in random_answers(questionnaire, 300, offered_only=False, seed=1).tolist():
+        assessment_data = questionnaire.decode_answers(answers)
+        expected = calculate_dosha_scores(assessment_data)
+        assert score_assessment(assessment_data) == (expected, get_panchakarma_recommendations(expected))
+
+
+def test_unknown_answers_are_ignored_like_direct_scoring(questionnaire):
+    first, second = questionnaire.questions[0]['id'], questionnaire.questions[1]['id']
+    assessment_data = {first: 'no-such-answer', second: questionnaire.codes[1][0], 'no_such_question': 'x'}
+    expected = calculate_dosha_scores(assessment_data)
+    assert score_assessment(assessment_data)[0] == expected
+
+
+def test_batch_index_matches_single_index_and_scores(questionnaire, table):
+    answers = random_answers(questionnaire, 2000, offered_only=False, seed=2)
+    indexes = table.index_batch(answers)
+    assert indexes.tolist() == [-1 if index is None else index for index in map(table.index, answers.tolist())]
+    inside = indexes >= 0
+    assert inside.any() and not inside.all()
+    expected = [[result['scores'][dosha] for dosha in questionnaire.doshas]
+                for result in map(calculate_dosha_scores, map(questionnaire.decode_answers, answers[inside].tolist()))]
+    assert table.table['scores'][indexes[inside]].tolist() == expected
+
+
+def test_missing_table_falls_back_to_direct_scoring(questionnaire, tmp_path, monkeypatch):
+    monkeypatch.setattr(outcome_table, 'OUTCOME_TABLE_DIR', str(tmp_path))
+    monkeypatch.setattr(outcome_table, '_tables', {})
+    monkeypatch.setattr(outcome_table, '_missing', set())
+    assert load_outcome_table(questionnaire.version) is None
+    for answers in random_answers(questionnaire, 50, offered_only=True, seed=3).tolist():
+        assessment_data = questionnaire.decode_answers(answers)
+        expected = calculate_dosha_scores(assessment_data)
+        assert score_assessment(assessment_data) == (expected, get_panchakarma_recommendations(expected))
+    # The server never writes the table; one built later is picked up
+    assert os.listdir(tmp_path) == []
+    save_outcome_table(questionnaire.version)
+    assert load_outcome_table(questionnaire.version) is not None
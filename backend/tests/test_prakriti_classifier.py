@@ -0,0 +1,126 @@
+"""The exported prakriti classifier reproduces the linear model it was trained as, and only admins confirm labels"""
+import os
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+from database.database import Base, SessionLocal, engine
+from database.models import Assessment
+from routes import assessment
+from Training.prakriti_classifier import (
+    PrakritiClassifier, encode_features, feature_layout, load_prakriti_classifier, classifier_path,
+    train_prakriti_classifier
+)
+from Training.prakritimodel import calculate_dosha_scores_batch
+from Training.questionnaire import load_questionnaire, UNANSWERED
+
+
+@pytest.fixture(scope='module')
+def questionnaire():
+    return load_questionnaire()
+
+
+def random_answers(questionnaire, rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.stack([
+        rng.choice(np.array(codes + [UNANSWERED]), size=rows) for codes in questionnaire.option_codes
+    ], axis=1)
+
+
+def random_classifier(questionnaire, seed=0):
+    rng = np.random.default_rng(seed)
+    _, widths = feature_layout(questionnaire)
+    coef = rng.normal(size=(len(questionnaire.doshas), int(widths.sum())))
+    intercept = rng.normal(size=len(questionnaire.doshas))
+    return PrakritiClassifier(questionnaire, coef, intercept, {'model_version': 'test'})
+
+
+def test_folded_table_matches_the_linear_model(questionnaire):
+    classifier = random_classifier(questionnaire)
+    answers = random_answers(questionnaire, 1000)
+    logits = encode_features(questionnaire, answers).astype(np.float64) @ classifier.coef.T + classifier.intercept
+    expected = np.exp(logits - logits.max(axis=1, keepdims=True))
+    expected /= expected.sum(axis=1, keepdims=True)
+    np.testing.assert_allclose(classifier.probabilities(answers), expected, rtol=1e-5)
+
+
+def test_classify_matches_classify_batch(questionnaire):
+    classifier = random_classifier(questionnaire, seed=1)
+    answers = random_answers(questionnaire, 200, seed=1)
+    batch = classifier.classify_batch(answers)
+    probabilities = classifier.probabilities(answers)
+    for row, result, p in zip(answers.tolist(), batch, probabilities):
+        assert classifier.classify(questionnaire.decode_answers(row)) == result
+        assert result['dominant_dosha'] == questionnaire.doshas[int(p.argmax())]
+
+
+@pytest.fixture
+def confirmed_assessments(questionnaire):
+    Base.metadata.create_all(bind=engine)
+    # Practitioners agree with the rule-based scorer, so a linear model can learn it exactly
+    answers = random_answers(questionnaire, 2000, seed=3)
+    results = calculate_dosha_scores_batch(answers, questionnaire.version)
+    with engine.begin() as conn:
+        conn.execute(insert(Assessment), [
+            {
+                'session_id': f"confirmed-{i}",
+                'vata_score': result['percentages']['vata'],
+                'pitta_score': result['percentages']['pitta'],
+                'kapha_score': result['percentages']['kapha'],
+                'dominant_dosha': result['dominant_dosha'],
+                'secondary_dosha': result['secondary_dosha'],
+                'assessment_data': questionnaire.decode_answers(row),
+                'weights_version': questionnaire.weights_version,
+                'confirmed_dosha': result['dominant_dosha']
+            }
+            for i, (row, result) in enumerate(zip(answers.tolist(), results))
+        ])
+    yield
+    db = SessionLocal()
+    db.query(Assessment).delete()
+    db.commit()
+    db.close()
+    path = classifier_path(questionnaire.version)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def test_training_learns_the_confirmed_labels(questionnaire, confirmed_assessments):
+    classifier = train_prakriti_classifier(questionnaire.version, epochs=5, chunk_size=500, n_jobs=1)
+    assert classifier.metadata['training_rows'] + classifier.metadata['holdout_rows'] == 2000
+    assert classifier.metadata['holdout_accuracy'] >= 0.8
+
+    loaded = load_prakriti_classifier(questionnaire.version)
+    assert loaded.model_version == classifier.model_version
+    answers = random_answers(questionnaire, 100, seed=4)
+    np.testing.assert_allclose(loaded.probabilities(answers), classifier.probabilities(answers), rtol=1e-6)
+
+
+def test_confirming_prakriti_requires_the_admin_token(questionnaire):
+    Base.metadata.create_all(bind=engine)
+    app = FastAPI()
+    app.include_router(assessment.router)
+    client = TestClient(app)
+    db = SessionLocal()
+    db.add(Assessment(session_id='confirm-session', vata_score=60.0, pitta_score=30.0, kapha_score=10.0,
+                      dominant_dosha='vata', secondary_dosha='pitta', assessment_data={},
+                      weights_version=questionnaire.weights_version))
+    db.commit()
+    try:
+        url = '/api/assessment/confirm-session/prakriti'
+        for headers in ({}, {'X-Admin-Token': 'wrong'}):
+            assert client.put(url, json={'dosha': 'kapha'}, headers=headers).status_code == 403
+        assert db.query(Assessment).one().confirmed_dosha is None
+
+        response = client.put(url, json={'dosha': 'kapha'}, headers={'X-Admin-Token': 'test-admin-token'})
+        assert response.status_code == 200
+        assert response.json()['confirmed_dosha'] == 'kapha'
+        db.expire_all()
+        assert db.query(Assessment).one().confirmed_dosha == 'kapha'
+    finally:
+        db.query(Assessment).delete()
+        db.commit()
+        db.close()
@@ -0,0 +1,105 @@
+"""Admin CPU profiles, memory snapshots and per-request profiles"""
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routes import admin
+from utils import profiling
+
+ADMIN_HEADERS = {'X-Admin-Token': 'test-admin-token'}
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(admin.router)
+    yield TestClient(app)
+    profiling.memory_tracker.stop()
+
+
+def _spin_until(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_admin_endpoints_need_the_token(client):
+    assert client.post('/admin/profile/cpu', params={'seconds': 0.1}).status_code == 403
+    assert client.post('/admin/memory/start').status_code == 403
+    assert client.get('/admin/memory', headers={'X-Admin-Token': 'wrong'}).status_code == 403
+
+
+def test_cpu_profile_samples_worker_threads(client):
+    stop = threading.Event()
+    worker = threading.Thread(target=_spin_until, args=(stop,), name='busy-worker')
+    worker.start()
+    try:
+        response = client.post('/admin/profile/cpu', params={'seconds': 0.3, 'interval_ms': 5},
+                               headers=ADMIN_HEADERS)
+    finally:
+        stop.set()
+        worker.join()
+
+    assert response.status_code == 200
+    assert int(response.headers['x-profile-samples']) > 0
+    busy = [line for line in response.text.splitlines() if line.startswith('busy-worker;')]
+    assert busy and all('_spin_until' in line for line in busy)
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in response.text.splitlines())
+
+
+def test_cpu_profile_rejects_bad_arguments_and_overlap(client):
+    assert client.post('/admin/profile/cpu', params={'seconds': 0}, headers=ADMIN_HEADERS).status_code == 400
+    assert client.post('/admin/profile/cpu', params={'seconds': 1, 'interval_ms': 0.5},
+                       headers=ADMIN_HEADERS).status_code == 400
+    with profiling._cpu_profile_lock:
+        assert client.post('/admin/profile/cpu', params={'seconds': 0.1},
+                           headers=ADMIN_HEADERS).status_code == 409
+
+
+def test_memory_snapshots_diff_allocation_growth(client):
+    assert client.post('/admin/memory/snapshot', headers=ADMIN_HEADERS).status_code == 409
+    assert client.post('/admin/memory/start', headers=ADMIN_HEADERS).json()['tracing'] is True
+
+    base = client.post('/admin/memory/snapshot', headers=ADMIN_HEADERS).json()['id']
+    retained = [bytearray(1024) for _ in range(2000)]
+    current = client.post('/admin/memory/snapshot', headers=ADMIN_HEADERS).json()['id']
+    assert client.get('/admin/memory', headers=ADMIN_HEADERS).json()['snapshots'] == [base, current]
+
+    diff = client.get('/admin/memory/diff', params={'base': base, 'current': current},
+                      headers=ADMIN_HEADERS).json()['stats']
+    growth = [stat for stat in diff if stat['location'].startswith(__file__)]
+    assert growth and growth[0]['size_diff_bytes'] >= 1024 * len(retained)
+
+    assert client.get('/admin/memory/diff', params={'base': base, 'current': 99},
+                      headers=ADMIN_HEADERS).status_code == 404
+    assert client.get('/admin/memory/diff', params={'base': base, 'current': current, 'key_type': 'x'},
+                      headers=ADMIN_HEADERS).status_code == 400
+    assert client.post('/admin/memory/stop', headers=ADMIN_HEADERS).json() == {
+        'tracing': False, 'traced_bytes': 0, 'peak_bytes': 0, 'snapshots': []
+    }
+
+
+def test_sampled_requests_are_profiled_and_listed(client, monkeypatch):
+    monkeypatch.setattr(profiling, 'PROFILE_SAMPLE_RATE', 1.0)
+    app = FastAPI()
+    app.middleware('http')(profiling.profile_request_middleware)
+    app.include_router(admin.router)
+
+    @app.get('/slow')
+    def slow():
+        time.sleep(0.05)
+        return {}
+
+    app_client = TestClient(app)
+    assert 'x-profile-id' not in app_client.get('/slow').headers
+    assert 'x-profile-id' not in app_client.get('/slow', headers={'X-Profile': 'wrong'}).headers
+
+    profile_id = int(app_client.get('/slow', headers={'X-Profile': 'test-admin-token'}).headers['x-profile-id'])
+    summaries = app_client.get('/admin/profile/requests', headers=ADMIN_HEADERS).json()['profiles']
+    assert summaries[0]['id'] == profile_id and summaries[0]['path'] == '/slow'
+    assert summaries[0]['duration'] >= 0.05
+    folded = app_client.get(f'/admin/profile/requests/{profile_id}', headers=ADMIN_HEADERS)
+    assert 'slow (test_profiling.py' in folded.text
+    assert app_client.get('/admin/profile/requests/0', headers=ADMIN_HEADERS).status_code == 404
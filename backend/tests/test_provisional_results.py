@@ -0,0 +1,49 @@
+"""Provisional results streamed with each question match scoring the answers given so far"""
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from database.database import Base, engine
+from routes import chat
+from Training.prakritimodel import calculate_dosha_scores, summarize_scores
+from Training.questionnaire import UNANSWERED, load_questionnaire
+
+
+def _reply(websocket):
+    frame = websocket.receive_json()
+    while frame['type'] == 'typing':
+        frame = websocket.receive_json()
+    return frame
+
+
+def test_provisional_results_lead_to_the_final_result():
+    Base.metadata.create_all(bind=engine)
+    questionnaire = load_questionnaire()
+    picks = [i % len(question['options']) for i, question in enumerate(questionnaire.questions)]
+    app = FastAPI()
+    app.include_router(chat.router)
+
+    with TestClient(app).websocket_connect('/ws/chat?session_id=provisional-session') as websocket:
+        websocket.receive_json()  # welcome
+        answers = [UNANSWERED] * questionnaire.size
+        provisional = None
+        for i, question in enumerate(questionnaire.questions):
+            websocket.send_json({'message': question['options'][picks[i]]})
+            frame = _reply(websocket)
+            answers[i] = questionnaire.option_codes[i][picks[i]]
+            if i == 0:
+                # Changing an earlier answer re-streams the totals without moving on
+                websocket.send_json({'message': question['options'][picks[i] - 1], 'question_id': question['id']})
+                frame = _reply(websocket)
+                answers[0] = questionnaire.option_codes[0][picks[0] - 1]
+                assert frame['question_id'] == questionnaire.questions[1]['id']
+            if frame['type'] == 'question':
+                provisional = frame['provisional']
+                assert provisional == summarize_scores(questionnaire.score(answers))
+        complete = frame
+    chat.manager.disconnect('provisional-session')
+    chat.manager.user_sessions.pop('provisional-session', None)
+
+    assert complete['type'] == 'assessment_complete'
+    final = calculate_dosha_scores(questionnaire.decode_answers(answers))
+    assert complete['dosha_results'] == final
+    assert provisional is not None
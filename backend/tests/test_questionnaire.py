@@ -0,0 +1,74 @@
+"""Questionnaire definitions compile to the legacy weights and only load from their own directory"""
+import json
+import os
+import pickle
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routes import questionnaire as questionnaire_routes
+from Training import questionnaire as questionnaire_module
+from Training.questionnaire import QuestionnaireError, UNANSWERED, load_questionnaire
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Models')
+
+
+def test_v1_reproduces_the_legacy_weights():
+    with open(os.path.join(MODELS_DIR, 'prakriti_weights.pkl'), 'rb') as f:
+        legacy = pickle.load(f)
+    compiled = load_questionnaire('v1').to_legacy_weights()
+    for dosha, questions in compiled.items():
+        for question_id, codes in questions.items():
+            for code, weight in codes.items():
+                assert legacy[dosha][question_id].get(code, 0) == weight
+
+
+def test_answers_round_trip_through_codes_and_packing():
+    questionnaire = load_questionnaire('v1')
+    answers = [codes[-1] for codes in questionnaire.option_codes]
+    answers[2] = UNANSWERED
+    assessment_data = questionnaire.decode_answers(answers)
+    assert questionnaire.encode_answers(assessment_data) == answers
+    assert questionnaire.unpack_answers(questionnaire.pack_answers(answers)) == answers
+    assert questionnaire.score(answers) == dict(zip(questionnaire.doshas, questionnaire.score_batch([answers])[0]))
+
+
+@pytest.mark.parametrize('version', ['../questionnaires/v1', '../../backend/Training/questionnaires/v1',
+                                     'v1/../v1', '/etc/passwd', 7])
+def test_versions_are_names_not_paths(version):
+    with pytest.raises(QuestionnaireError):
+        load_questionnaire(version)
+
+
+@pytest.fixture
+def questionnaire_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(questionnaire_module, 'QUESTIONNAIRE_DIR', str(tmp_path))
+    monkeypatch.setattr(questionnaire_module, '_compiled', {})
+    return tmp_path
+
+
+@pytest.mark.parametrize('content', [
+    '{not json',
+    '["a list"]',
+    json.dumps({'version': 'broken', 'doshas': ['vata'], 'questions': ['not a question']}),
+    json.dumps({'version': 'other', 'doshas': ['vata'], 'questions': [
+        {'id': 'q', 'question': 'Q?', 'options': [{'label': 'A', 'code': 'a'}], 'scores': {'a': {'vata': 1}}}
+    ]}),
+    json.dumps({'version': 'broken', 'doshas': ['vata'], 'questions': [
+        {'id': 'q', 'question': 'Q?', 'options': [{'label': 'A', 'code': 'b'}], 'scores': {'a': {'vata': 1}}}
+    ]}),
+])
+def test_unreadable_definitions_raise_questionnaire_errors(questionnaire_dir, content):
+    (questionnaire_dir / 'broken.json').write_text(content, encoding='utf-8')
+    with pytest.raises(QuestionnaireError):
+        load_questionnaire('broken')
+
+
+def test_manifest_route_answers_404_for_bad_versions(questionnaire_dir):
+    (questionnaire_dir / 'broken.json').write_text('{not json', encoding='utf-8')
+    app = FastAPI()
+    app.include_router(questionnaire_routes.router)
+    client = TestClient(app)
+    assert client.get('/api/questionnaires/broken').status_code == 404
+    assert client.get('/api/questionnaires/..%2F..%2Fpackage').status_code == 404
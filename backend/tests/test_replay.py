@@ -0,0 +1,39 @@
+"""Replay extraction caps sessions by when they ran, not by session id"""
+from datetime import datetime, timedelta
+
+import pytest
+
+import replay
+from database.database import Base, SessionLocal, engine
+from database.models import ChatMessage
+
+
+@pytest.fixture
+def chat_log():
+    Base.metadata.create_all(bind=engine)
+    yield
+    db = SessionLocal()
+    db.query(ChatMessage).delete()
+    db.commit()
+    db.close()
+
+
+def test_max_sessions_keeps_the_earliest_sessions(chat_log, tmp_path):
+    start = datetime(2025, 1, 1, 9)
+    # Session ids sort in the opposite order to when the sessions started
+    db = SessionLocal()
+    db.add_all([
+        ChatMessage(session_id=f"session-{9 - hour}", sender='user', message=f"hello {hour}",
+                    timestamp=start + timedelta(hours=hour))
+        for hour in range(10)
+    ])
+    db.commit()
+    db.close()
+
+    output = str(tmp_path / 'replay.ndjson.gz')
+    header = replay.extract(output, max_sessions=3)
+    _, sessions = replay.load_replay(output)
+
+    assert header['start'] == start.isoformat()
+    assert [session['m'][0][1] for session in sessions] == ['hello 0', 'hello 1', 'hello 2']
+    assert [session['t'] for session in sessions] == [0.0, 3600.0, 7200.0]
@@ -0,0 +1,95 @@
+"""Reads go to caught-up replicas, writes to the primary, and each session reads its own writes"""
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database.database import Base
+from database.models import Assessment
+from database.routing import ReplicaSet, RoutingSession
+
+
+@pytest.fixture
+def replicas(tmp_path):
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    Base.metadata.create_all(bind=primary)
+    factory = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=primary)
+    replicas = ReplicaSet(primary, factory, [f"sqlite:///{tmp_path / 'replica.db'}"])
+    replicas.sync_local_replicas()
+    yield replicas
+    for replica in replicas.replicas:
+        replica.engine.dispose()
+    primary.dispose()
+
+
+def _write(replicas, session_id):
+    db = replicas.session_factory()
+    db.add(Assessment(session_id=session_id, dominant_dosha='vata'))
+    db.commit()
+    db.close()
+    replicas.record_write(session_id)
+
+
+def _sessions(db):
+    return {row.session_id for row in db.query(Assessment)}
+
+
+def test_session_reads_its_own_writes_from_the_primary(replicas):
+    _write(replicas, 'synced')
+    replicas.sync_local_replicas()
+    _write(replicas, 'recent')
+
+    # Another session's reads are served by the replica, which hasn't seen the write yet
+    db = replicas.read_session('someone-else')
+    assert db.replica is replicas.replicas[0]
+    assert _sessions(db) == {'synced'}
+    db.close()
+
+    db = replicas.read_session('recent')
+    assert db.replica is None
+    assert _sessions(db) == {'synced', 'recent'}
+    db.close()
+    assert replicas.primary_fallbacks == 1
+
+    # After the next sync the replica is past the write and serves that session too
+    replicas.sync_local_replicas()
+    db = replicas.read_session('recent')
+    assert db.replica is replicas.replicas[0]
+    assert _sessions(db) == {'synced', 'recent'}
+    db.close()
+
+
+def test_writes_through_a_read_session_go_to_the_primary(replicas):
+    db = replicas.read_session()
+    assert db.replica is not None
+    db.add(Assessment(session_id='written-on-read-session', dominant_dosha='pitta'))
+    db.commit()
+    assert db.pinned_to_primary
+    assert _sessions(db) == {'written-on-read-session'}
+    db.close()
+
+    replica_db = replicas.session_factory(replica=replicas.replicas[0])
+    assert _sessions(replica_db) == set()
+    replica_db.close()
+
+
+def test_unmeasured_replicas_are_assumed_max_lag_behind(tmp_path):
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    factory = sessionmaker(class_=RoutingSession, bind=primary)
+    # A non-SQLite primary: the SQLite replica can't be synced locally, so its lag is assumed
+    primary.url = primary.url.set(drivername='postgresql')
+    replicas = ReplicaSet(primary, factory, [f"sqlite:///{tmp_path / 'replica.db'}"], max_lag=2.0, write_window=60)
+    assert not replicas.replicas[0].local_sync
+
+    now = time.time()
+    replicas.record_write('just-now', at=now)
+    replicas.record_write('a-while-ago', at=now - 5)
+    assert replicas.choose('just-now') is None
+    assert replicas.choose('a-while-ago') is replicas.replicas[0]
+    assert replicas.choose() is replicas.replicas[0]
+
+    # Writes older than the window are forgotten
+    replicas.record_write('later', at=now + 120)
+    assert replicas.last_write('just-now') is None
+    assert replicas.status()['tracked_writes'] == 1
@@ -0,0 +1,43 @@
+"""ResponseCache keeps no per-key state after invalidation and never caches stale loads"""
+import asyncio
+import threading
+
+from utils.response_cache import ResponseCache
+
+
+def test_invalidation_keeps_no_per_key_state():
+    async def run():
+        cache = ResponseCache(ttl=60, max_entries=10)
+        for i in range(1000):
+            await cache.get_or_load(f"session-{i}", lambda: 'body')
+            cache.invalidate(f"session-{i}")
+        return cache
+
+    cache = asyncio.run(run())
+    assert cache.stats()['entries'] == 0
+    assert not cache._inflight and not cache._stale
+
+
+def test_load_running_during_invalidation_is_not_cached():
+    release = threading.Event()
+
+    async def run():
+        cache = ResponseCache(ttl=60, max_entries=10)
+        loads = []
+
+        def slow_loader():
+            loads.append(1)
+            release.wait(5)
+            return 'stale'
+
+        first = asyncio.ensure_future(cache.get_or_load('k', slow_loader))
+        await asyncio.sleep(0.05)
+        cache.invalidate('k')  # the data changed while the load was running
+        release.set()
+        assert await first == 'stale'
+        assert await cache.get_or_load('k', lambda: 'fresh') == 'fresh'
+        assert await cache.get_or_load('k', lambda: 'unused') == 'fresh'
+        return cache
+
+    cache = asyncio.run(run())
+    assert not cache._stale
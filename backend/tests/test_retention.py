@@ -0,0 +1,113 @@
+"""Archival keeps live writers unblocked and archived rows unique"""
+import gzip
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event, insert, select, func
+
+from database.database import Base
+from database.models import ChatMessage
+from database import retention
+
+
+def _engine(tmp_path):
+    """SQLite engine with real transactions: reads take the shared lock until the transaction ends"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'retention.db'}", connect_args={'timeout': 1})
+
+    @event.listens_for(engine, 'connect')
+    def _connect(dbapi_connection, _):
+        dbapi_connection.isolation_level = None  # let SQLAlchemy emit BEGIN itself
+
+    @event.listens_for(engine, 'begin')
+    def _begin(conn):
+        conn.exec_driver_sql('BEGIN')
+
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def test_id_ranges_dedupe():
+    ids = retention._IdRanges()
+    order = [5, 6, 7, 1, 3, 2, 10, 6, 1, 9, 8, 4]
+    added = [value for value in order if ids.add(value)]
+    assert added == [5, 6, 7, 1, 3, 2, 10, 9, 8, 4]
+    assert (ids.firsts, ids.lasts) == ([1], [10])
+
+
+def test_no_transaction_open_while_archiving(tmp_path, monkeypatch):
+    engine = _engine(tmp_path)
+    old = datetime.utcnow() - timedelta(days=400)
+    with engine.begin() as conn:
+        conn.execute(insert(ChatMessage), [
+            {'session_id': 's', 'message': f'm{i}', 'sender': 'user', 'timestamp': old} for i in range(10)
+        ])
+
+    append_rows = retention._append_rows
+    writes = []
+
+    def append_while_writing(*args):
+        # A writer must be able to commit while the archive file is written
+        def write():
+            with engine.begin() as conn:
+                conn.execute(insert(ChatMessage), {'session_id': 'live', 'message': 'x', 'sender': 'user'})
+            writes.append(True)
+        thread = threading.Thread(target=write)
+        thread.start()
+        thread.join()
+        return append_rows(*args)
+
+    monkeypatch.setattr(retention, '_append_rows', append_while_writing)
+    archived = retention.archive_table('chat_messages', days=30, chunk_size=4,
+                                       archive_dir=str(tmp_path / 'archive'), bind=engine, pause=0)
+    assert archived == 10
+    assert len(writes) == 3
+    with engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(ChatMessage.__table__)).scalar() == 3
+
+
+def test_reader_drops_rows_duplicated_by_interrupted_run(tmp_path):
+    table_dir = tmp_path / 'chat_messages'
+    os.makedirs(table_dir)
+    rows = [{'id': i, 'session_id': 's', 'timestamp': '2024-01-02T00:00:00'} for i in (1, 2, 3)]
+    with gzip.open(table_dir / '2024-01.ndjson.gz', 'wt', encoding='utf-8') as f:
+        for row in rows + rows[1:] + [{'id': 7, 'session_id': 's', 'timestamp': '2024-01-03T00:00:00'}]:
+            f.write(json.dumps(row) + '\n')
+
+    reader = retention.ArchiveReader(str(tmp_path))
+    assert [row['id'] for row in reader.iter_rows('chat_messages')] == [1, 2, 3, 7]
+
+
+class _RecordingBind:
+    """Stands in for an engine of another dialect, recording the SQL compaction would run"""
+
+    def __init__(self, dialect):
+        self.dialect = type('Dialect', (), {'name': dialect})()
+        self.statements = []
+
+    def connect(self):
+        return self
+
+    def execution_options(self, **options):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, statement):
+        self.statements.append(str(statement))
+
+
+def test_compaction_statement_follows_the_dialect():
+    postgres, mysql, other = _RecordingBind('postgresql'), _RecordingBind('mysql'), _RecordingBind('mssql')
+    assert retention.compact_database(bind=postgres)['vacuum'] == 'vacuum_analyze'
+    assert all(statement.startswith('VACUUM ANALYZE ') for statement in postgres.statements)
+    assert retention.compact_database(bind=mysql)['vacuum'] == 'optimize_table'
+    assert all(statement.startswith('OPTIMIZE TABLE ') for statement in mysql.statements)
+    assert retention.compact_database(bind=other) == {'analyzed': False, 'vacuum': None,
+                                                      'search_index_optimized': False}
+    assert other.statements == []
@@ -0,0 +1,66 @@
+"""Importing the app stays light, and /ready only goes green after warmup"""
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from utils.startup import StartupState
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+HEAVY_MODULES = ('numpy', 'msgpack', 'pyarrow', 'sklearn', 'reportlab', 'nltk')
+
+
+def test_importing_the_app_defers_heavy_modules():
+    code = ("import sys, app; "
+            f"print(sorted({{name.split('.')[0] for name in sys.modules}} & set({HEAVY_MODULES!r})))")
+    result = subprocess.run([sys.executable, '-c', code], cwd=BACKEND_DIR,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == '[]'
+
+
+def test_ready_is_503_until_warmup_has_run(monkeypatch):
+    import app as app_module
+    from routes import chat
+
+    entered, release, stop = threading.Event(), threading.Event(), threading.Event()
+    warmup_prediction = chat.warmup_prediction
+
+    def slow_warmup():
+        entered.set()
+        release.wait(10)
+        return warmup_prediction()
+
+    monkeypatch.setattr(chat, 'warmup_prediction', slow_warmup)
+    monkeypatch.setattr(app_module, 'startup_state', StartupState())
+
+    def serve():
+        with TestClient(app_module.app):
+            stop.wait(10)
+
+    server = threading.Thread(target=serve)
+    server.start()
+    try:
+        # Requests outside the TestClient context don't run the lifespan themselves
+        client = TestClient(app_module.app)
+        assert entered.wait(10)
+        response = client.get('/ready')
+        assert response.status_code == 503
+        assert response.json()['status'] == 'starting'
+        assert client.get('/health').status_code == 200
+
+        release.set()
+        for _ in range(200):
+            if app_module.startup_state.ready:
+                break
+            time.sleep(0.05)
+        response = client.get('/ready')
+        assert response.status_code == 200
+        assert 'warmup_prediction' in response.json()['timings']
+    finally:
+        release.set()
+        stop.set()
+        server.join(10)
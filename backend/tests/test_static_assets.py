@@ -0,0 +1,58 @@
+"""The built frontend is served precompressed by Accept-Encoding, and only over HTTP"""
+import pytest
+from starlette.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from utils.static_assets import FrontendAssets, accepted_encodings
+
+BUNDLE = 'assets/app-abcd1234.js'
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('gzip, br', {'gzip', 'br'}),
+    ('gzip;q=0.5, br;q=0', {'gzip'}),
+    ('*', {'gzip', 'br'}),
+    ('*;q=0', set()),
+    ('gzip;q=0, *', {'br'}),
+    ('*, GZIP;q=0.0', {'br'}),
+    ('br;q=nonsense, *;q=0.1', {'gzip'}),
+    (None, set()),
+])
+def test_accepted_encodings(header, expected):
+    assert accepted_encodings(header) == expected
+
+
+@pytest.fixture
+def client(tmp_path):
+    (tmp_path / 'assets').mkdir()
+    (tmp_path / 'index.html').write_text('<!doctype html><div id="root"></div>')
+    (tmp_path / BUNDLE).write_text('console.log("ayursutra");\n' * 200)
+    frontend = FrontendAssets(str(tmp_path))
+    assert frontend.prepare() == 2
+    return TestClient(frontend)
+
+
+def test_bundle_is_served_gzipped_unless_refused(client):
+    response = client.get(f'/{BUNDLE}', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.headers['cache-control'].endswith('immutable')
+
+    refused = client.get(f'/{BUNDLE}', headers={'Accept-Encoding': 'gzip;q=0, *'})
+    assert 'content-encoding' not in refused.headers
+    assert refused.headers['etag'] != response.headers['etag']
+    assert refused.text == response.text  # the client decodes the gzipped body
+
+    assert client.get(f'/{BUNDLE}', headers={'If-None-Match': refused.headers['etag'],
+                                              'Accept-Encoding': 'identity'}).status_code == 304
+
+
+def test_client_routes_fall_back_to_index(client):
+    assert 'id="root"' in client.get('/assessment/results').text
+    assert client.get('/missing.js').status_code == 404
+    assert client.post('/').status_code == 405
+
+
+def test_websockets_are_refused(client):
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect('/ws/anything'):
+            pass
@@ -0,0 +1,77 @@
+"""Therapy queries drop every contraindicated therapy, matching a direct reading of the catalogue"""
+import itertools
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routes import therapies
+from Training.panchakarma_model import get_panchakarma_recommendations
+from Training.therapy_kb import THERAPY_KB_PATH, KnowledgeBaseError, load_knowledge_base
+
+
+@pytest.fixture(scope='module')
+def definition():
+    with open(THERAPY_KB_PATH, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _expected(definition, doshas, conditions, limit):
+    """The query worked out with lists and sets, straight from the JSON"""
+    entries = [definition['doshas'][dosha] for dosha in doshas]
+    blocked = {item['therapy'] for entry in entries for item in entry.get('contraindications', [])}
+    blocked |= {therapy['name'] for therapy in definition['therapies']
+                if set(therapy.get('contraindicated_conditions', [])) & set(conditions)}
+
+    def pick(key):
+        names = list(dict.fromkeys(name for entry in entries for name in entry[key] if name not in blocked))
+        return names[:limit] if limit else names
+
+    indicated = {name for entry in entries for key in ('primary', 'secondary') for name in entry[key]}
+    return pick('primary'), pick('secondary'), [t['name'] for t in definition['therapies']
+                                                 if t['name'] in indicated & blocked]
+
+
+def test_query_matches_the_catalogue(definition):
+    kb = load_knowledge_base()
+    mixes = [list(mix) for n in (1, 2, 3) for mix in itertools.permutations(kb.doshas, n)]
+    condition_sets = [list(c) for n in range(len(kb.conditions) + 1)
+                      for c in itertools.combinations(kb.conditions, n)]
+    for doshas in mixes:
+        for conditions in condition_sets:
+            for limit in (None, 2):
+                result = kb.query(doshas, conditions, limit)
+                primary, secondary, excluded = _expected(definition, doshas, conditions, limit)
+                assert result['primary'] == primary
+                assert result['secondary'] == secondary
+                assert [item['therapy'] for item in result['excluded']] == excluded
+
+
+def test_excluded_therapies_carry_their_reasons():
+    result = load_knowledge_base().query(['kapha', 'vata'], ['pregnancy'])
+    reasons = {item['therapy']: item['reasons'] for item in result['excluded']}
+    assert 'Vamana' not in result['primary'] + result['secondary']
+    assert {'dosha': 'vata'} in reasons['Vamana']
+    assert {'condition': 'pregnancy', 'label': 'Pregnancy'} in reasons['Vamana']
+
+
+def test_recommendations_apply_condition_contraindications():
+    dosha_results = {'dominant_dosha': 'kapha', 'secondary_dosha': 'pitta', 'percentages': {'pitta': 20.0}}
+    plain = get_panchakarma_recommendations(dosha_results)
+    pregnant = get_panchakarma_recommendations(dosha_results, conditions=['pregnancy', 'elderly'])
+    assert 'Vamana' in plain['primary']
+    assert 'Vamana' not in pregnant['primary'] + pregnant['secondary']
+    assert [detail['name'] for detail in pregnant['therapy_details']] == pregnant['primary']
+
+
+def test_unknown_names_are_rejected():
+    kb = load_knowledge_base()
+    with pytest.raises(KnowledgeBaseError):
+        kb.query(['vata'], ['not-a-condition'])
+    app = FastAPI()
+    app.include_router(therapies.router)
+    client = TestClient(app)
+    assert client.get('/api/therapies/query', params={'doshas': 'vata,ether'}).status_code == 400
+    response = client.get('/api/therapies/query', params={'doshas': 'pitta', 'conditions': 'menstruation'})
+    assert 'Virechana' not in response.json()['primary']
@@ -0,0 +1,15 @@
+"""
+Admin Authentication
+Shared X-Admin-Token check for admin routes and labelling endpoints
+"""
+import hmac
+from fastapi import Header, HTTPException
+from utils.profiling import ADMIN_TOKEN
+
+
+def require_admin(x_admin_token: str = Header(default="")):
+    """Admin routes are hidden (404) unless ADMIN_TOKEN is set, and need it in X-Admin-Token"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
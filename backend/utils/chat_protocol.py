@@ -0,0 +1,155 @@
+"""
+Compact Chat Protocol
+MessagePack frame encoding for clients that cache the questionnaire manifest
+"""
+import json
+from importlib.util import find_spec
+
+# Compact mode is only offered when msgpack is installed; it is imported on the first compact frame
+MSGPACK_AVAILABLE = find_spec('msgpack') is not None
+
+COMPACT_SUBPROTOCOL = "ayursutra.msgpack.v1"
+
+# Frame type codes used on the wire
+FRAME_TYPES = {
+    'hello': 'h',
+    'question': 'q',
+    'typing': 'y',
+    'message': 'm',
+    'assessment_complete': 'c',
+    'ping': 'p',
+    'pong': 'o',
+    'error': 'e',
+}
+
+
+class ProtocolError(ValueError):
+    """A client frame could not be decoded; the connection stays open"""
+
+
+def error_frame(error):
+    """Server frame reporting a malformed client frame"""
+    return {'type': 'error', 'sender': 'bot', 'text': str(error)}
+
+
+def is_pong(frame):
+    """True if a raw client frame is a heartbeat reply ({"type": "pong"} or compact {'t': 'o'})"""
+    try:
+        if isinstance(frame, bytes):
+            if len(frame) >= 16 or not MSGPACK_AVAILABLE:
+                return False
+            import msgpack
+            return msgpack.unpackb(frame, raw=False) == {'t': 'o'}
+        return len(frame) < 64 and '"pong"' in frame and json.loads(frame).get('type') == 'pong'
+    except (ValueError, AttributeError, TypeError):  # msgpack's unpack errors are ValueErrors
+        return False
+
+
+def negotiate_subprotocol(websocket):
+    """Pick the compact subprotocol if the client offered it and msgpack is available"""
+    if not MSGPACK_AVAILABLE:
+        return None
+    offered = websocket.scope.get('subprotocols') or []
+    return COMPACT_SUBPROTOCOL if COMPACT_SUBPROTOCOL in offered else None
+
+
+def hello_frame(questionnaire):
+    """First compact frame: tells the client which manifest (and ETag) to use"""
+    return {'type': 'hello', 'version': questionnaire.version, 'etag': questionnaire.manifest_etag}
+
+
+def encode_compact(message, questionnaire):
+    """
+    Encode a server frame as MessagePack.
+
+    Question frames carry only the question index (and a re-ask flag); the
+    client resolves text, options and progress from the cached manifest.
+    When questions are asked out of order, 'n' carries the progress position.
+    Provisional percentages travel as 's' in dosha order.
+    Timestamps are dropped; a trace id travels as 'i'.
+    """
+    import msgpack
+    frame_type = message.get('type')
+    compact = {'t': FRAME_TYPES.get(frame_type, frame_type)}
+
+    if frame_type == 'hello':
+        compact.update(v=message['version'], e=message['etag'])
+    elif frame_type == 'question':
+        index = questionnaire.question_index[message['question_id']]
+        compact['q'] = index
+        if message['text'] != questionnaire.questions[index]['question']:
+            compact['r'] = 1
+        if message['progress']['current'] != index + 1:
+            compact['n'] = message['progress']['current']
+        if 'provisional' in message:
+            percentages = message['provisional']['percentages']
+            compact['s'] = [percentages[dosha] for dosha in questionnaire.doshas]
+    elif frame_type in ('message', 'error'):
+        compact['x'] = message['text']
+    elif frame_type == 'assessment_complete':
+        compact.update(d=message['dosha_results'], p=message['panchakarma_recs'])
+    elif frame_type != 'typing':
+        compact.update({k: v for k, v in message.items() if k not in ('type', 'timestamp', 'trace_id')})
+
+    if message.get('trace_id'):
+        compact['i'] = message['trace_id']
+
+    return msgpack.packb(compact, use_bin_type=True)
+
+
+def decode_compact(payload, questionnaire, question_index):
+    """
+    Decode a client frame into the {'message': ...} shape of the JSON protocol.
+
+    Clients send {'a': option_index} to answer the current question (with
+    'q': question_index to change an earlier answer) or {'m': text} for free
+    text. Out-of-range answers decode to a non-option message so the current
+    question is asked again.
+
+    Raises:
+        ProtocolError: The payload is not a MessagePack map of the expected types
+    """
+    import msgpack
+    try:
+        frame = msgpack.unpackb(payload, raw=False)
+    except (ValueError, TypeError) as e:  # msgpack's unpack errors are ValueErrors
+        raise ProtocolError(f"invalid MessagePack frame: {e}") from None
+    if not isinstance(frame, dict):
+        raise ProtocolError("frame must be a map")
+    if 'a' in frame:
+        revised = frame.get('q')
+        if isinstance(revised, int) and 0 <= revised < questionnaire.size:
+            question_index = revised
+        labels = questionnaire.option_labels[question_index] if question_index < questionnaire.size else []
+        option = frame['a']
+        if isinstance(option, int) and 0 <= option < len(labels):
+            decoded = {'message': labels[option]}
+            if question_index == revised:
+                decoded['question_id'] = questionnaire.questions[question_index]['id']
+            return decoded
+        return {'message': str(option)}
+    message = frame.get('m', '')
+    if not isinstance(message, str):
+        raise ProtocolError("'m' must be a string")
+    return {'message': message}
+
+
+def decode_json(frame):
+    """
+    Decode and validate a JSON protocol client frame.
+
+    Raises:
+        ProtocolError: The frame is not a JSON object with a string 'message'
+            and an optional string 'question_id'
+    """
+    try:
+        data = json.loads(frame)
+    except (ValueError, TypeError) as e:
+        raise ProtocolError(f"invalid JSON frame: {e}") from None
+    if not isinstance(data, dict):
+        raise ProtocolError("frame must be a JSON object")
+    if not isinstance(data.get('message', ''), str):
+        raise ProtocolError("'message' must be a string")
+    if not isinstance(data.get('question_id'), (str, type(None))):
+        raise ProtocolError("'question_id' must be a string")
+    return data
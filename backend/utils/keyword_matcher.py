@@ -0,0 +1,197 @@
+"""
+Multi-Keyword Matching
+Aho-Corasick automaton for finding many keywords in one pass over the text
+"""
+from collections import deque
+
+# A keyword directly after one of these ("not thin") doesn't count
+NEGATIONS = {'not', 'no', 'never', "isn't", "don't", "n't"}
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton compiled once from a set of keywords.
+
+    Matching is case-insensitive and runs in O(len(text) + matches) however
+    many keywords were compiled in. With `whole_words`, matches that start or
+    end inside a word ('thin' in 'nothing') are discarded.
+    """
+
+    def __init__(self, keywords, whole_words=True):
+        """
+        Args:
+            keywords: Iterable of (keyword, value) pairs; a keyword may carry several values
+            whole_words: Only report matches on word boundaries
+        """
+        self.whole_words = whole_words
+        self._goto = [{}]
+        self._fail = [0]
+        self._outputs = [[]]
+
+        for keyword, value in keywords:
+            self._add(keyword.lower(), value)
+        self._build_failure_links()
+
+    def _add(self, keyword, value):
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            state = next_state
+        self._outputs[state].append((keyword, value))
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                # Inherit outputs of the suffix state so each position is reported once
+                self._outputs[next_state] = self._outputs[next_state] + self._outputs[self._fail[next_state]]
+
+    def find_all(self, text):
+        """
+        Find every keyword occurrence in text.
+
+        Returns:
+            List of (start, end, keyword, value) tuples in order of their end position
+        """
+        text = text.lower()
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        matches = []
+        state = 0
+
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not outputs[state]:
+                continue
+
+            end = position + 1
+            for keyword, value in outputs[state]:
+                start = end - len(keyword)
+                if self.whole_words and not _on_word_boundary(text, start, end):
+                    continue
+                matches.append((start, end, keyword, value))
+
+        return matches
+
+    def values(self, text, skip_negated=False):
+        """Return the set of values whose keywords occur in text (optionally not right after a negation)"""
+        if skip_negated:
+            text = text.lower()
+            return {value for start, _, _, value in self.find_all(text) if not is_negated(text, start)}
+        return {value for _, _, _, value in self.find_all(text)}
+
+
+def _on_word_boundary(text, start, end):
+    before = text[start - 1] if start > 0 else ' '
+    after = text[end] if end < len(text) else ' '
+    return not before.isalnum() and not after.isalnum()
+
+
+def _previous_word(text, start):
+    """The word directly before position `start` (lowercase text), or ''"""
+    end = start
+    while end and not text[end - 1].isalnum():
+        end -= 1
+    begin = end
+    while begin and (text[begin - 1].isalnum() or text[begin - 1] == "'"):
+        begin -= 1
+    return text[begin:end]
+
+
+def is_negated(text, start):
+    """Whether the match at `start` of lowercase text directly follows a negation"""
+    return _previous_word(text, start) in NEGATIONS
+
+
+class AnswerMatcher:
+    """
+    Maps free-text replies to questionnaire options.
+
+    One automaton per question is compiled from the option labels, their
+    answer codes and the distinctive words of each label. A reply is scanned
+    once and every hit votes for the options it belongs to, so "I'm pretty
+    thin and always cold" resolves to 'Thin and light'. A hit directly after
+    a negation ("not thin") does not vote.
+    """
+
+    FULL_LABEL_WEIGHT = 3.0
+    CODE_WEIGHT = 2.0
+    WORD_WEIGHT = 1.0
+    IGNORED_WORDS = {'and', 'or', 'the', 'a'}
+
+    def __init__(self, option_mapping):
+        """
+        Args:
+            option_mapping: Dictionary of question id -> {option label: answer code}
+        """
+        self._matchers = {
+            question_id: KeywordMatcher(self._keywords(options))
+            for question_id, options in option_mapping.items()
+        }
+        self._options = {question_id: dict(options) for question_id, options in option_mapping.items()}
+
+    def _keywords(self, options):
+        votes = {}
+
+        def vote(keyword, label, weight):
+            votes.setdefault(keyword, {})
+            votes[keyword][label] = max(votes[keyword].get(label, 0), weight)
+
+        for label, code in options.items():
+            vote(label.lower(), label, self.FULL_LABEL_WEIGHT)
+            for other_label, other_code in options.items():
+                if other_code == code:
+                    vote(code, other_label, self.CODE_WEIGHT)
+            for word in label.lower().split():
+                if word not in self.IGNORED_WORDS:
+                    vote(word, label, self.WORD_WEIGHT)
+
+        # A keyword shared by several options splits its vote between them
+        return [
+            (keyword, {label: weight / len(labels) for label, weight in labels.items()})
+            for keyword, labels in votes.items()
+        ]
+
+    def match(self, question_id, text):
+        """
+        Resolve a reply to one option label of a question.
+
+        Returns:
+            The best-scoring option label, or None when nothing matched or the
+            top options tie on different answer codes. When the tied options
+            share a code, the first of them is returned, since either gives
+            the same answer.
+        """
+        matcher = self._matchers.get(question_id)
+        if matcher is None:
+            return None
+
+        lowered = text.lower()
+        scores = {}
+        for start, _, _, label_votes in matcher.find_all(lowered):
+            if is_negated(lowered, start):
+                continue
+            for label, weight in label_votes.items():
+                scores[label] = scores.get(label, 0) + weight
+
+        if not scores:
+            return None
+        best = max(scores.values())
+        options = self._options[question_id]
+        tied = [label for label in options if scores.get(label) == best]
+        if len({options[label] for label in tied}) > 1:
+            return None
+        return tied[0]
@@ -0,0 +1,59 @@
+"""
+Language Detection
+Script and marker-word detection for the chat languages (English, Hindi, Marathi)
+"""
+import re
+
+DEFAULT_LANGUAGE = 'en'
+SUPPORTED_LANGUAGES = ('en', 'hi', 'mr')
+
+_DEVANAGARI = re.compile(r'[ऀ-ॿ]')
+_LATIN = re.compile(r'[A-Za-z]')
+_DEVANAGARI_WORD = re.compile(r'[ऀ-ॣ०-ॿ]+')
+
+# Function words that are frequent in one language and rare in the other
+MARKER_WORDS = {
+    'hi': {'है', 'हैं', 'था', 'थी', 'नहीं', 'मुझे', 'मेरा', 'मेरी', 'मेरे', 'क्या', 'कैसे', 'आप',
+           'और', 'बहुत', 'में', 'से', 'को', 'का', 'की', 'के', 'लगती', 'लगता', 'हूँ', 'हूं', 'रहा', 'रही'},
+    'mr': {'आहे', 'आहेत', 'होता', 'होती', 'नाही', 'मला', 'माझा', 'माझी', 'माझे', 'काय', 'कसे', 'तुम्ही',
+           'आणि', 'खूप', 'मध्ये', 'ला', 'चा', 'ची', 'चे', 'लागते', 'लागत', 'येत', 'येतो', 'होय', 'झोप'},
+}
+
+# Stopwords for the Devanagari languages (English uses NLTK's list)
+STOP_WORDS = {
+    'hi': {'है', 'हैं', 'था', 'थी', 'थे', 'और', 'में', 'से', 'को', 'का', 'की', 'के', 'यह', 'वह',
+           'मैं', 'मुझे', 'मेरा', 'मेरी', 'मेरे', 'आप', 'हूँ', 'हूं', 'भी', 'तो', 'ही', 'पर'},
+    'mr': {'आहे', 'आहेत', 'होता', 'होती', 'आणि', 'मध्ये', 'ला', 'चा', 'ची', 'चे', 'हा', 'ही', 'हे',
+           'मी', 'मला', 'माझा', 'माझी', 'माझे', 'तुम्ही', 'पण', 'तर', 'च'},
+}
+
+
+def detect_language(text, default=DEFAULT_LANGUAGE):
+    """
+    Detect the language of a chat message.
+
+    Latin script is English; Devanagari is Hindi or Marathi, decided by
+    marker words (Hindi when undecided). Text with no letters returns
+    `default`, so short replies like "?" keep the conversation's language.
+    """
+    devanagari = len(_DEVANAGARI.findall(text))
+    latin = len(_LATIN.findall(text))
+    if not devanagari and not latin:
+        return default
+    if latin > devanagari:
+        return 'en'
+
+    words = _DEVANAGARI_WORD.findall(text)
+    hindi = sum(word in MARKER_WORDS['hi'] for word in words)
+    marathi = sum(word in MARKER_WORDS['mr'] for word in words)
+    if marathi > hindi:
+        return 'mr'
+    if hindi > marathi:
+        return 'hi'
+    return default if default in ('hi', 'mr') else 'hi'
+
+
+def clean_devanagari(text, language):
+    """Tokenize Devanagari text on word characters and drop the language's stopwords"""
+    stop_words = STOP_WORDS.get(language, set())
+    return ' '.join(word for word in _DEVANAGARI_WORD.findall(text) if word not in stop_words)
@@ -0,0 +1,110 @@
+"""
+Model Caching
+Lazily loaded per-language models with least-recently-used eviction under a memory cap
+"""
+import itertools
+import threading
+from concurrent.futures import Future
+
+
+class ModelCache:
+    """
+    LRU cache of per-language models bounded by their estimated size in bytes.
+
+    `loader(language)` returns `(value, size_bytes)` and runs outside the lock;
+    concurrent misses for a language wait on the first caller's load instead
+    of repeating it, and `peek` never waits at all, so it is safe on the event
+    loop while a worker thread unpickles or fits a model. Pinned languages (the
+    default language, loaded at startup) count toward the cap but are never
+    evicted; the most recently used entry is also kept even if it alone
+    exceeds the cap.
+    """
+
+    def __init__(self, loader, max_bytes, pinned=()):
+        """
+        Args:
+            loader: Callable taking a language code, returning (value, size_bytes)
+            max_bytes: Total estimated size kept before evicting
+            pinned: Languages that are never evicted
+        """
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.pinned = set(pinned)
+        # Entries only change under the lock; reads are single dict lookups
+        self._entries = {}
+        self._used = {}
+        self._tick = itertools.count()
+        self._loading = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def peek(self, language):
+        """Return the cached value for language (marking it used), or None without loading or waiting"""
+        entry = self._entries.get(language)
+        if entry is None:
+            return None
+        self._used[language] = next(self._tick)
+        self.hits += 1
+        return entry[0]
+
+    def get(self, language):
+        """Return the value for language, loading it (and evicting others) on a miss"""
+        value = self.peek(language)
+        if value is not None:
+            return value
+        with self._lock:
+            entry = self._entries.get(language)
+            if entry is not None:
+                return entry[0]
+            future = self._loading.get(language)
+            loading = future is None
+            if loading:
+                future = self._loading[language] = Future()
+                self.misses += 1
+        if not loading:
+            return future.result()
+        try:
+            value, size_bytes = self.loader(language)
+        except BaseException as e:
+            # Waiters see the failure; the next call tries again
+            with self._lock:
+                del self._loading[language]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._store(language, value, size_bytes)
+            del self._loading[language]
+        future.set_result(value)
+        return value
+
+    def put(self, language, value, size_bytes):
+        """Store an already loaded value, e.g. the default model at startup"""
+        with self._lock:
+            self._store(language, value, size_bytes)
+
+    def _store(self, language, value, size_bytes):
+        self._entries[language] = (value, size_bytes)
+        self._used[language] = next(self._tick)
+        for other in sorted(self._entries, key=lambda name: self._used.get(name, -1)):
+            if self.size_bytes() <= self.max_bytes:
+                break
+            if other != language and other not in self.pinned:
+                del self._entries[other]
+                self._used.pop(other, None)
+                self.evictions += 1
+                print(f"Evicted '{other}' model from the cache")
+
+    def size_bytes(self):
+        return sum(size for _, size in list(self._entries.values()))
+
+    def stats(self):
+        return {
+            'languages': list(self._entries),
+            'size_bytes': self.size_bytes(),
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
@@ -1,47 +1,107 @@
 import re
-import nltk
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-import pickle
 import os
+import threading
+import pickle
+from utils.keyword_matcher import KeywordMatcher
+from utils.language import clean_devanagari
+
+# NLTK data is only fetched over the network when explicitly allowed, so
+# offline hosts start with a regex tokenizer instead of hanging on download
+NLTK_AUTO_DOWNLOAD = os.getenv("NLTK_AUTO_DOWNLOAD", "0") == "1"
+
+NLTK_RESOURCES = {
+    'punkt': 'tokenizers/punkt',
+    'stopwords': 'corpora/stopwords',
+    'wordnet': 'corpora/wordnet',
+}
+
+_resources = None
+_resources_lock = threading.Lock()
+
+
+def _has_nltk_data(nltk, name):
+    """Check for an NLTK resource, downloading it only if allowed"""
+    try:
+        nltk.data.find(NLTK_RESOURCES[name])
+        return True
+    except LookupError:
+        if NLTK_AUTO_DOWNLOAD:
+            return bool(nltk.download(name, quiet=True))
+        return False
+
+
+def load_nlp_resources():
+    """
+    Load tokenizer, stopwords and lemmatizer on first use.
+
+    Missing NLTK data degrades to whitespace tokenization without stopword
+    removal or lemmatization rather than failing.
+
+    Returns:
+        Tuple of (tokenize, stop_words, lemmatize)
+    """
+    global _resources
+    if _resources is not None:
+        return _resources
 
-# Download required NLTK data
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt', quiet=True)
+    with _resources_lock:
+        if _resources is not None:
+            return _resources
 
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords', quiet=True)
+        import nltk
 
-try:
-    nltk.data.find('corpora/wordnet')
-except LookupError:
-    nltk.download('wordnet', quiet=True)
+        tokenize = str.split
+        stop_words = set()
+        lemmatize = lambda token: token
+        missing = []
 
-try:
-    nltk.data.find('taggers/averaged_perceptron_tagger')
-except LookupError:
-    nltk.download('averaged_perceptron_tagger', quiet=True)
+        if _has_nltk_data(nltk, 'punkt'):
+            from nltk.tokenize import word_tokenize
+            try:
+                word_tokenize("warm up")
+                tokenize = word_tokenize
+            except LookupError:
+                missing.append('punkt')
+        else:
+            missing.append('punkt')
 
-lemmatizer = WordNetLemmatizer()
-stop_words = set(stopwords.words('english'))
+        if _has_nltk_data(nltk, 'stopwords'):
+            from nltk.corpus import stopwords
+            stop_words = set(stopwords.words('english'))
+        else:
+            missing.append('stopwords')
 
-def clean_text(text):
-    """Clean and preprocess text for NLP"""
+        if _has_nltk_data(nltk, 'wordnet'):
+            from nltk.stem import WordNetLemmatizer
+            lemmatizer = WordNetLemmatizer()
+            lemmatizer.lemmatize("warmup")
+            lemmatize = lemmatizer.lemmatize
+        else:
+            missing.append('wordnet')
+
+        if missing:
+            print(f"Warning: NLTK data not available ({', '.join(missing)}), using basic text processing.")
+
+        _resources = (tokenize, stop_words, lemmatize)
+
+    return _resources
+
+def clean_text(text, language='en'):
+    """Clean and preprocess text for NLP (Hindi and Marathi keep Devanagari words only)"""
+    if language != 'en':
+        return clean_devanagari(text, language)
+    tokenize, stop_words, lemmatize = load_nlp_resources()
     text = text.lower()
     text = re.sub(r'[^a-zA-Z\s]', '', text)
-    tokens = word_tokenize(text)
-    tokens = [lemmatizer.lemmatize(token) for token in tokens if token not in stop_words]
+    tokens = tokenize(text)
+    tokens = [lemmatize(token) for token in tokens if token not in stop_words]
     return ' '.join(tokens)
 
 def extract_keywords(text):
     """Extract keywords from user input"""
+    tokenize, _, _ = load_nlp_resources()
     cleaned = clean_text(text)
-    tokens = word_tokenize(cleaned)
+    tokens = tokenize(cleaned)
     return tokens
 
 def match_intent(user_input, intents_data):
@@ -66,22 +126,29 @@ def match_intent(user_input, intents_data):
     
     return best_match if best_score > 0.3 else None
 
+DOSHA_KEYWORDS = {
+    'vata': ['thin', 'light', 'dry', 'cold', 'irregular', 'anxious', 'creative', 'quick'],
+    'pitta': ['medium', 'warm', 'oily', 'sharp', 'intense', 'ambitious', 'irritable', 'perfectionist'],
+    'kapha': ['heavy', 'thick', 'smooth', 'slow', 'calm', 'stable', 'grounded', 'loving']
+}
+
+# Compiled once; matching is a single pass over the text whatever the keyword count
+dosha_matcher = KeywordMatcher(
+    (keyword, dosha) for dosha, keywords in DOSHA_KEYWORDS.items() for keyword in keywords
+)
+
 def extract_dosha_keywords(text):
-    """Extract dosha-related keywords from text"""
-    dosha_keywords = {
-        'vata': ['thin', 'light', 'dry', 'cold', 'irregular', 'anxious', 'creative', 'quick'],
-        'pitta': ['medium', 'warm', 'oily', 'sharp', 'intense', 'ambitious', 'irritable', 'perfectionist'],
-        'kapha': ['heavy', 'thick', 'smooth', 'slow', 'calm', 'stable', 'grounded', 'loving']
-    }
-    
-    cleaned = clean_text(text)
-    found_doshas = []
-    
-    for dosha, keywords in dosha_keywords.items():
-        for keyword in keywords:
-            if keyword in cleaned:
-                found_doshas.append(dosha)
-                break
-    
-    return found_doshas
+    """
+    Extract dosha-related keywords from text.
+
+    Words are lowercased and lemmatized as in clean_text, but stopwords are
+    kept so that a keyword right after a negation ("not cold") is skipped.
+    Keywords match whole words only: 'thin' does not match inside 'nothing'.
 
+    Returns:
+        Doshas with a keyword in the text, in DOSHA_KEYWORDS order
+    """
+    tokenize, _, lemmatize = load_nlp_resources()
+    words = ' '.join(lemmatize(token) for token in tokenize(re.sub(r"[^a-z'\s]", ' ', text.lower())))
+    found = dosha_matcher.values(words, skip_negated=True)
+    return [dosha for dosha in DOSHA_KEYWORDS if dosha in found]
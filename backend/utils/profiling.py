@@ -0,0 +1,236 @@
+"""
+Production Profiling
+Sampling CPU profiler and tracemalloc snapshots for the admin endpoints
+"""
+import hmac
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict, deque
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+# Fraction of requests carrying the profiling header that are actually profiled
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "120"))
+PROFILE_HEADER = "x-profile"
+MAX_REQUEST_PROFILES = 50
+MAX_MEMORY_SNAPSHOTS = 10
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler covering every thread in the process.
+
+    A daemon thread walks `sys._current_frames()` every `interval` seconds and
+    counts whole stacks, so the event loop thread and the asyncio.to_thread
+    workers are profiled together without instrumenting any code. Nothing
+    runs outside of start()/stop().
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL_MS / 1000):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while True:
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(thread_names.get(thread_id, f"thread-{thread_id}"))
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+            if self._stop.wait(self.interval):
+                break
+
+    def folded(self):
+        """Stacks in the folded format read by flamegraph.pl, speedscope and inferno"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+_cpu_profile_lock = threading.Lock()
+
+
+def profile_cpu(seconds, interval=PROFILE_INTERVAL_MS / 1000):
+    """
+    Sample all threads for `seconds` (blocking; call from a worker thread).
+
+    Returns:
+        SamplingProfiler with the collected stacks, or None if a profile is
+        already running
+    """
+    if not _cpu_profile_lock.acquire(blocking=False):
+        return None
+    try:
+        profiler = SamplingProfiler(interval).start()
+        time.sleep(min(seconds, PROFILE_MAX_SECONDS))
+        return profiler.stop()
+    finally:
+        _cpu_profile_lock.release()
+
+
+class RequestProfiles:
+    """Bounded store of folded stacks captured by per-request profiling"""
+
+    def __init__(self, limit=MAX_REQUEST_PROFILES):
+        self.limit = limit
+        self._profiles = OrderedDict()
+        self._ids = itertools.count(1)
+
+    def add(self, method, path, duration, profiler):
+        profile_id = next(self._ids)
+        self._profiles[profile_id] = {
+            'id': profile_id,
+            'method': method,
+            'path': path,
+            'duration': round(duration, 4),
+            'samples': profiler.samples,
+            'folded': profiler.folded()
+        }
+        while len(self._profiles) > self.limit:
+            self._profiles.popitem(last=False)
+        return profile_id
+
+    def get(self, profile_id):
+        return self._profiles.get(profile_id)
+
+    def summaries(self):
+        return [
+            {k: v for k, v in profile.items() if k != 'folded'}
+            for profile in reversed(self._profiles.values())
+        ]
+
+
+request_profiles = RequestProfiles()
+
+
+def request_profiling_enabled():
+    return bool(ADMIN_TOKEN) and PROFILE_SAMPLE_RATE > 0
+
+
+async def profile_request_middleware(request, call_next):
+    """
+    Profile a sampled fraction of requests sent with `X-Profile: <ADMIN_TOKEN>`.
+
+    Only installed when request_profiling_enabled(), so there is no per-request
+    cost otherwise. The stored profile id is returned in X-Profile-Id.
+    """
+    token = request.headers.get(PROFILE_HEADER)
+    if (not token or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+            or random.random() >= PROFILE_SAMPLE_RATE):
+        return await call_next(request)
+
+    profiler = SamplingProfiler().start()
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        profiler.stop()
+    profile_id = request_profiles.add(
+        request.method, request.url.path, time.perf_counter() - started, profiler
+    )
+    response.headers['X-Profile-Id'] = str(profile_id)
+    return response
+
+
+class MemoryTracker:
+    """tracemalloc lifecycle plus a small ring of numbered snapshots for diffing"""
+
+    def __init__(self, limit=MAX_MEMORY_SNAPSHOTS):
+        self._snapshots = deque(maxlen=limit)
+        self._ids = itertools.count(1)
+
+    def start(self, frames=10):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        return self.status()
+
+    def stop(self):
+        tracemalloc.stop()
+        self._snapshots.clear()
+        return self.status()
+
+    def status(self):
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            'tracing': tracemalloc.is_tracing(),
+            'traced_bytes': current,
+            'peak_bytes': peak,
+            'snapshots': [snapshot_id for snapshot_id, _ in self._snapshots]
+        }
+
+    def snapshot(self, limit=20):
+        """
+        Take a snapshot and return its largest allocation sites.
+
+        Raises:
+            RuntimeError: If tracemalloc has not been started
+        """
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not running")
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        snapshot_id = next(self._ids)
+        self._snapshots.append((snapshot_id, snapshot))
+        return {
+            'id': snapshot_id,
+            'top': [_stat_dict(stat) for stat in snapshot.statistics('lineno')[:limit]]
+        }
+
+    def diff(self, base_id, current_id, limit=20, key_type='lineno'):
+        """
+        Compare two snapshots; the biggest growth comes first.
+
+        Raises:
+            KeyError: If either snapshot id is unknown (or was evicted)
+        """
+        snapshots = dict(self._snapshots)
+        base, current = snapshots[base_id], snapshots[current_id]
+        stats = current.compare_to(base, key_type)
+        return [_stat_dict(stat) for stat in stats[:limit]]
+
+
+def _stat_dict(stat):
+    frame = stat.traceback[0]
+    entry = {
+        'location': f"{frame.filename}:{frame.lineno}",
+        'size_bytes': stat.size,
+        'count': stat.count
+    }
+    if hasattr(stat, 'size_diff'):
+        entry.update(size_diff_bytes=stat.size_diff, count_diff=stat.count_diff)
+    return entry
+
+
+memory_tracker = MemoryTracker()
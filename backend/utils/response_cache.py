@@ -0,0 +1,96 @@
+"""
+Response Caching
+In-process TTL cache with single-flight loading for read-mostly endpoints
+"""
+import asyncio
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    TTL + LRU cache of prepared responses keyed by a string.
+
+    Concurrent misses for the same key share one load: the first caller
+    starts a task running `loader` in a worker thread and later callers await
+    that same task. Invalidating a key marks a load already running for it as
+    stale, so it does not store a result read before the data changed. Only
+    in-flight loads are tracked, so invalidating many keys keeps no state.
+
+    All methods must be called from the event loop thread.
+    """
+
+    def __init__(self, ttl, max_entries):
+        """
+        Args:
+            ttl: Seconds an entry stays fresh
+            max_entries: Entries kept before the least recently used is evicted
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._stale = set()  # in-flight load tasks invalidated while running
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get_or_load(self, key, loader):
+        """
+        Return the cached value for key, loading it with `loader()` on a miss.
+
+        Args:
+            key: Cache key
+            loader: Blocking callable returning the value, or None for "not found"
+                (None is returned to the caller but never cached)
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires, value = entry
+            if expires > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._load(key, loader))
+            self._inflight[key] = task
+        else:
+            self.coalesced += 1
+        # shield: a cancelled request must not cancel the load other callers are waiting on
+        return await asyncio.shield(task)
+
+    async def _load(self, key, loader):
+        task = asyncio.current_task()
+        try:
+            value = await asyncio.to_thread(loader)
+        finally:
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+            stale = task in self._stale
+            self._stale.discard(task)
+
+        if value is not None and not stale:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, key):
+        """Drop a key and make any load already in flight for it uncacheable"""
+        self._entries.pop(key, None)
+        task = self._inflight.pop(key, None)
+        if task is not None:
+            self._stale.add(task)
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced
+        }
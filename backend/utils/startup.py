@@ -0,0 +1,68 @@
+"""
+Startup Warmup and Readiness Tracking
+Runs heavy initialization off the import path and records cold-start timings
+"""
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+
+STARTUP_METRICS_PATH = os.getenv(
+    "STARTUP_METRICS_PATH",
+    os.path.join(os.path.dirname(__file__), '..', 'startup_metrics.jsonl')
+)
+
+
+class StartupState:
+    """Tracks warmup steps, their durations and overall readiness"""
+
+    def __init__(self, started_at=None):
+        self.started_at = started_at or time.perf_counter()
+        self.ready = False
+        self.timings = {}
+        self.errors = {}
+        self.cold_start_seconds = None
+
+    async def run_step(self, name, func, *args):
+        """
+        Run a blocking warmup step in a worker thread and time it.
+
+        Failures are recorded rather than raised so independent steps still
+        complete; readiness is decided by the caller.
+        """
+        step_started = time.perf_counter()
+        try:
+            return await asyncio.to_thread(func, *args)
+        except Exception as e:
+            self.errors[name] = str(e)
+            print(f"Warmup step '{name}' failed: {e}")
+        finally:
+            self.timings[name] = round(time.perf_counter() - step_started, 4)
+
+    def mark_ready(self):
+        """Mark the app ready if no step failed, and record cold-start time"""
+        self.cold_start_seconds = round(time.perf_counter() - self.started_at, 4)
+        self.ready = not self.errors
+        print(f"Startup finished in {self.cold_start_seconds}s (ready={self.ready}) {self.timings}")
+        self._record()
+
+    def _record(self):
+        """Append this cold start to the metrics file so it can be tracked across deploys"""
+        try:
+            with open(STARTUP_METRICS_PATH, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({
+                    'timestamp': datetime.now().isoformat(),
+                    'pid': os.getpid(),
+                    **self.report()
+                }) + '\n')
+        except OSError as e:
+            print(f"Warning: could not record startup metrics: {e}")
+
+    def report(self):
+        return {
+            'ready': self.ready,
+            'cold_start_seconds': self.cold_start_seconds,
+            'timings': self.timings,
+            'errors': self.errors
+        }
@@ -0,0 +1,187 @@
+"""
+Frontend Static Serving
+Serves the built Vite app from precompressed brotli/gzip copies with strong ETags
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, PlainTextResponse, Response
+from starlette.websockets import WebSocketClose
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Opt-in: serve frontend/dist (built with `npm run build`) from the API process
+SERVE_FRONTEND = os.getenv("SERVE_FRONTEND", "0") == "1"
+FRONTEND_DIST = os.getenv(
+    "FRONTEND_DIST",
+    os.path.join(os.path.dirname(__file__), '..', '..', 'frontend', 'dist')
+)
+
+# Smaller files gain nothing from compression once headers are counted
+COMPRESS_MIN_BYTES = 1024
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'application/xml',
+                      'application/manifest+json', 'application/wasm', 'image/svg+xml')
+
+# Vite writes content-hashed bundles as assets/<name>-<hash>.<ext>; they never
+# change under the same URL. Everything else (index.html, public/ files) revalidates.
+HASHED_ASSET = re.compile(r'^assets/.+-[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+$')
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# Preferred first; each maps to the sidecar file suffix and its compressor
+ENCODINGS = {
+    'br': ('.br', lambda data: brotli.compress(data, quality=11) if brotli else None),
+    'gzip': ('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0)),
+}
+
+
+def accepted_encodings(header):
+    """Content codings an Accept-Encoding header allows (q > 0); an explicit q=0 overrides *"""
+    accepted, rejected, wildcard = set(), set(), False
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding == '*':
+            wildcard = q > 0
+        elif coding:
+            (accepted if q > 0 else rejected).add(coding)
+    if wildcard:
+        accepted.update(set(ENCODINGS) - rejected)
+    return accepted
+
+
+class FrontendAssets:
+    """
+    ASGI app serving a built single-page app.
+
+    `prepare()` (run once at startup) indexes the build and writes `.br` and
+    `.gz` copies next to each compressible file, reusing copies that are newer
+    than their source. Requests then only pick a variant by Accept-Encoding
+    and hand the file to FileResponse, which uses the server's pathsend
+    extension when available instead of reading it in Python.
+
+    Paths without a file extension that match no file get index.html so
+    client-side routes survive a reload. Mount it after every API route.
+    """
+
+    def __init__(self, directory=FRONTEND_DIST):
+        self.directory = os.path.realpath(directory)
+        self.assets = {}
+
+    def available(self):
+        return os.path.isfile(os.path.join(self.directory, 'index.html'))
+
+    def prepare(self):
+        """Index the build and precompress it; returns the number of files indexed"""
+        assets = {}
+        compressed = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                if name.endswith(('.br', '.gz')) and os.path.exists(path[:-3]):
+                    continue
+                relpath = os.path.relpath(path, self.directory).replace(os.sep, '/')
+                assets[relpath] = self._index(relpath, path)
+                compressed += len(assets[relpath]['variants'])
+        self.assets = assets
+        print(f"Frontend: {len(assets)} files from {self.directory}, {compressed} precompressed variants"
+              + ("" if brotli else " (install brotli for .br)"))
+        return len(assets)
+
+    def _index(self, relpath, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        stat_result = os.stat(path)
+        media_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        digest = hashlib.sha256(data).hexdigest()[:20]
+        asset = {
+            'path': path,
+            'stat': stat_result,
+            'media_type': media_type,
+            'etag': f'"{digest}"',
+            'cache_control': IMMUTABLE if HASHED_ASSET.match(relpath) else REVALIDATE,
+            'variants': {}
+        }
+        if len(data) < COMPRESS_MIN_BYTES or not media_type.startswith(COMPRESSIBLE_TYPES):
+            return asset
+        for encoding, (suffix, compress) in ENCODINGS.items():
+            variant_path = path + suffix
+            try:
+                if not (os.path.exists(variant_path) and os.stat(variant_path).st_mtime >= stat_result.st_mtime):
+                    body = compress(data)
+                    if body is None:
+                        continue
+                    tmp_path = variant_path + '.tmp'
+                    with open(tmp_path, 'wb') as f:
+                        f.write(body)
+                    os.replace(tmp_path, variant_path)
+                variant_stat = os.stat(variant_path)
+            except OSError as e:
+                print(f"Warning: could not precompress {relpath} ({encoding}): {e}")
+                continue
+            if variant_stat.st_size < stat_result.st_size:
+                asset['variants'][encoding] = {
+                    'path': variant_path,
+                    'stat': variant_stat,
+                    'etag': f'"{digest}-{suffix[1:]}"'
+                }
+        return asset
+
+    def lookup(self, path):
+        """Asset for a URL path, falling back to index.html for extensionless client routes"""
+        relpath = path.lstrip('/') or 'index.html'
+        asset = self.assets.get(relpath) or self.assets.get(relpath.rstrip('/') + '/index.html')
+        if asset is None and '.' not in relpath.rsplit('/', 1)[-1]:
+            asset = self.assets.get('index.html')
+        return asset
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'websocket':
+            # No websocket endpoint lives under the frontend; refuse the handshake
+            await WebSocketClose()(scope, receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+        if scope['method'] not in ('GET', 'HEAD'):
+            await PlainTextResponse('Method Not Allowed', status_code=405, headers={'Allow': 'GET, HEAD'})(
+                scope, receive, send
+            )
+            return
+        asset = self.lookup(scope['path'])
+        if asset is None:
+            await PlainTextResponse('Not Found', status_code=404)(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        accepted = accepted_encodings(request_headers.get('accept-encoding'))
+        encoding = next((e for e in ENCODINGS if e in accepted and e in asset['variants']), None)
+        variant = asset['variants'][encoding] if encoding else asset
+        headers = {'ETag': variant['etag'], 'Cache-Control': asset['cache_control']}
+        if asset['variants']:
+            headers['Vary'] = 'Accept-Encoding'
+
+        if_none_match = request_headers.get('if-none-match')
+        if if_none_match and (if_none_match.strip() == '*' or variant['etag'] in (
+                tag.strip().removeprefix('W/') for tag in if_none_match.split(','))):
+            await Response(status_code=304, headers=headers)(scope, receive, send)
+            return
+
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        await FileResponse(
+            variant['path'], media_type=asset['media_type'], headers=headers, stat_result=variant['stat']
+        )(scope, receive, send)
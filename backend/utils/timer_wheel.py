@@ -0,0 +1,54 @@
+"""
+Timer Wheel
+Hashed timing wheel for tracking many per-connection deadlines with one task
+"""
+import math
+
+
+class TimerWheel:
+    """
+    Hashed timing wheel with `slots` buckets of `tick` seconds each.
+
+    Scheduling, rescheduling and cancelling a key are O(1); advancing one tick
+    only looks at the keys hashed into that bucket. Deadlines further away
+    than one revolution stay in their bucket until their round comes up.
+    Each key has at most one pending deadline.
+    """
+
+    def __init__(self, tick=1.0, slots=256):
+        self.tick = tick
+        self.current = 0
+        self._slots = [set() for _ in range(slots)]
+        self._deadlines = {}
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def schedule(self, key, delay):
+        """(Re)schedule key to expire `delay` seconds from the current tick (at least one tick)"""
+        target = self.current + max(1, math.ceil(delay / self.tick))
+        previous = self._deadlines.get(key)
+        if previous is not None:
+            self._slots[previous % len(self._slots)].discard(key)
+        self._deadlines[key] = target
+        self._slots[target % len(self._slots)].add(key)
+
+    def cancel(self, key):
+        previous = self._deadlines.pop(key, None)
+        if previous is not None:
+            self._slots[previous % len(self._slots)].discard(key)
+
+    def advance(self):
+        """
+        Move to the next tick.
+
+        Returns:
+            List of keys whose deadlines expired (they are no longer scheduled)
+        """
+        self.current += 1
+        slot = self._slots[self.current % len(self._slots)]
+        expired = [key for key in slot if self._deadlines[key] <= self.current]
+        for key in expired:
+            slot.discard(key)
+            del self._deadlines[key]
+        return expired
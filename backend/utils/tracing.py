@@ -0,0 +1,268 @@
+"""
+Chat Turn Tracing
+Lightweight span tracing with tail sampling, JSONL output and optional OTLP export
+"""
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import secrets
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+# Tail sampling: traces slower than this (or that errored) are always kept...
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "2500"))
+# ...and this fraction of the rest
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+TRACE_LOG_PATH = os.getenv(
+    "TRACE_LOG_PATH", os.path.join(os.path.dirname(__file__), '..', 'traces.jsonl')
+)
+TRACE_LOG_MAX_BYTES = int(os.getenv("TRACE_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+TRACE_LOG_BACKUPS = int(os.getenv("TRACE_LOG_BACKUPS", "3"))
+OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "")
+OTEL_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "ayursutra-backend")
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+class Trace:
+    """
+    One traced unit of work (a chat turn) and its flat list of spans.
+
+    Spans nest by the order they are opened, which matches the sequential
+    awaits of a chat turn; asyncio.to_thread copies the context, so spans
+    opened in worker threads land in the same trace.
+    """
+
+    def __init__(self, name, attributes):
+        self.trace_id = secrets.token_hex(16)
+        self.name = name
+        self.attributes = dict(attributes)
+        self.start_time_ns = time.time_ns()
+        self._start = time.perf_counter_ns()
+        self.duration_ns = None
+        self.spans = []
+        self.error = None
+        self._stack = []
+
+    @contextmanager
+    def span(self, name, **attributes):
+        span = {
+            'span_id': secrets.token_hex(8),
+            'parent_id': self._stack[-1] if self._stack else None,
+            'name': name,
+            'start_ns': time.perf_counter_ns() - self._start,
+            'duration_ns': None,
+            'attributes': attributes
+        }
+        self.spans.append(span)
+        self._stack.append(span['span_id'])
+        try:
+            yield span
+        except BaseException as e:
+            span['attributes']['error'] = repr(e)
+            raise
+        finally:
+            span['duration_ns'] = time.perf_counter_ns() - self._start - span['start_ns']
+            self._stack.pop()
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'name': self.name,
+            'start': datetime.fromtimestamp(self.start_time_ns / 1e9, timezone.utc).isoformat(),
+            'duration_ms': round(self.duration_ns / 1e6, 3),
+            'error': self.error,
+            'attributes': self.attributes,
+            'spans': [
+                {
+                    'span_id': span['span_id'],
+                    'parent_id': span['parent_id'],
+                    'name': span['name'],
+                    'start_ms': round(span['start_ns'] / 1e6, 3),
+                    'duration_ms': round((span['duration_ns'] or 0) / 1e6, 3),
+                    **({'attributes': span['attributes']} if span['attributes'] else {})
+                }
+                for span in self.spans
+            ]
+        }
+
+
+class OTLPExporter:
+    """
+    Ships kept traces to an OTLP/HTTP collector as JSON from a background thread.
+
+    Uses only the standard library; the queue is bounded and traces are
+    dropped rather than blocking the chat when the collector is unreachable.
+    """
+
+    BATCH_SIZE = 100
+    FLUSH_INTERVAL = 2.0
+
+    def __init__(self, endpoint, service_name):
+        self.url = endpoint if endpoint.rstrip('/').endswith('/v1/traces') else endpoint.rstrip('/') + '/v1/traces'
+        self.service_name = service_name
+        self._queue = queue.Queue(maxsize=1000)
+        self._thread = None
+        self.dropped = 0
+
+    def submit(self, trace):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="otlp-exporter", daemon=True)
+            self._thread.start()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.FLUSH_INTERVAL
+            while len(batch) < self.BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self._post(batch)
+            except Exception as e:
+                self.dropped += len(batch)
+                print(f"OTLP export failed: {e}")
+
+    def _post(self, traces):
+        body = json.dumps({'resourceSpans': [{
+            'resource': {'attributes': _otlp_attributes({'service.name': self.service_name})},
+            'scopeSpans': [{
+                'scope': {'name': 'ayursutra.chat'},
+                'spans': [span for trace in traces for span in _otlp_spans(trace)]
+            }]
+        }]}).encode('utf-8')
+        request = urllib.request.Request(self.url, data=body, headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=5) as response:
+            response.read()
+
+
+def _otlp_attributes(attributes):
+    return [{'key': key, 'value': {'stringValue': str(value)}} for key, value in attributes.items()]
+
+
+def _otlp_spans(trace):
+    """Root span for the trace plus one OTLP span per recorded span"""
+    root_id = secrets.token_hex(8)
+    spans = [{
+        'traceId': trace.trace_id,
+        'spanId': root_id,
+        'name': trace.name,
+        'kind': 2,
+        'startTimeUnixNano': str(trace.start_time_ns),
+        'endTimeUnixNano': str(trace.start_time_ns + trace.duration_ns),
+        'attributes': _otlp_attributes(trace.attributes),
+        'status': {'code': 2, 'message': trace.error} if trace.error else {}
+    }]
+    for span in trace.spans:
+        start = trace.start_time_ns + span['start_ns']
+        spans.append({
+            'traceId': trace.trace_id,
+            'spanId': span['span_id'],
+            'parentSpanId': span['parent_id'] or root_id,
+            'name': span['name'],
+            'kind': 1,
+            'startTimeUnixNano': str(start),
+            'endTimeUnixNano': str(start + (span['duration_ns'] or 0)),
+            'attributes': _otlp_attributes(span['attributes'])
+        })
+    return spans
+
+
+class Tracer:
+    """Starts traces and decides, once a trace is finished, whether to keep it"""
+
+    def __init__(self, enabled=TRACING_ENABLED, slow_ms=TRACE_SLOW_MS, sample_rate=TRACE_SAMPLE_RATE):
+        self.enabled = enabled
+        self.slow_ns = slow_ms * 1e6
+        self.sample_rate = sample_rate
+        self.kept = 0
+        self.dropped = 0
+        self._log = None
+        self._exporter = OTLPExporter(OTLP_ENDPOINT, OTEL_SERVICE_NAME) if enabled and OTLP_ENDPOINT else None
+
+    def _writer(self):
+        if self._log is None:
+            log = logging.getLogger("ayursutra.traces")
+            log.propagate = False
+            log.setLevel(logging.INFO)
+            handler = RotatingFileHandler(TRACE_LOG_PATH, maxBytes=TRACE_LOG_MAX_BYTES,
+                                          backupCount=TRACE_LOG_BACKUPS, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            log.addHandler(handler)
+            self._log = log
+        return self._log
+
+    @contextmanager
+    def trace(self, name, **attributes):
+        """
+        Trace a block of work; it becomes the current trace for span().
+
+        Yields:
+            The Trace, or None when tracing is disabled
+        """
+        if not self.enabled:
+            yield None
+            return
+
+        trace = Trace(name, attributes)
+        token = _current_trace.set(trace)
+        try:
+            yield trace
+        except BaseException as e:
+            trace.error = repr(e)
+            raise
+        finally:
+            _current_trace.reset(token)
+            trace.duration_ns = time.perf_counter_ns() - trace._start
+            self._finish(trace)
+
+    def _finish(self, trace):
+        keep = (
+            trace.error is not None
+            or trace.duration_ns >= self.slow_ns
+            or random.random() < self.sample_rate
+        )
+        if not keep:
+            self.dropped += 1
+            return
+        self.kept += 1
+        try:
+            self._writer().info(json.dumps(trace.to_dict(), default=str))
+        except Exception as e:
+            print(f"Failed to write trace: {e}")
+        if self._exporter is not None:
+            self._exporter.submit(trace)
+
+
+tracer = Tracer()
+
+
+def current_trace_id():
+    """Trace id of the trace being recorded in this context, if any"""
+    trace = _current_trace.get()
+    return trace.trace_id if trace is not None else None
+
+
+def span(name, **attributes):
+    """Open a span in the current trace; a no-op context outside of a trace"""
+    trace = _current_trace.get()
+    if trace is None:
+        return nullcontext()
+    return trace.span(name, **attributes)
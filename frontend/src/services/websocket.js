@@ -54,6 +54,11 @@ class WebSocketService {
         this.ws.onmessage = (event) => {
           try {
             const data = JSON.parse(event.data)
+            // Answer server heartbeats so the connection isn't reaped as dead
+            if (data.type === 'ping') {
+              this.ws.send(JSON.stringify({ type: 'pong' }))
+              return
+            }
             console.log('Received WebSocket message:', data)
             this.emit('message', data)
           } catch (error) {